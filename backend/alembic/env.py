@@ -19,6 +19,15 @@ if config.config_file_name is not None:
 from app.models.models import Base
 target_metadata = Base.metadata
 
+# Migrate the database the app is configured for (sync driver), not the
+# placeholder URL in alembic.ini
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+
+_url = make_url(settings.DATABASE_URL)
+_url = _url.set(drivername=_url.get_backend_name())
+config.set_main_option("sqlalchemy.url", _url.render_as_string(hide_password=False).replace("%", "%%"))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -43,6 +52,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
     )
 
     with context.begin_transaction():
@@ -64,7 +74,10 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things; batch mode recreates tables
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
@@ -0,0 +1,30 @@
+"""Medication feed import upsert index
+
+Revision ID: 3f6a9b2d5e18
+Revises: 8d4c1a7e2f90
+Create Date: 2026-10-17 16:41:08.230417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6a9b2d5e18'
+down_revision: Union[str, None] = '8d4c1a7e2f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Not unique: existing data may already hold repeats of a key
+    op.create_index(
+        'ix_medications_patient_ndc_filled', 'medications',
+        ['patient_id', 'ndc_number', 'last_filled'], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_medications_patient_ndc_filled', table_name='medications')
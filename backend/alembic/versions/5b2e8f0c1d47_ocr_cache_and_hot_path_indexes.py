@@ -0,0 +1,62 @@
+"""OCR cache table and hot-path indexes
+
+Revision ID: 5b2e8f0c1d47
+Revises: ca79516c9743
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8f0c1d47'
+down_revision: Union[str, None] = 'ca79516c9743'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns); every list endpoint and reconciliation query
+# filters or orders on one of these
+INDEXES = [
+    # Keyset pagination order
+    ('ix_patients_created_at_id', 'patients', ['created_at', 'id']),
+    ('ix_medications_created_at_id', 'medications', ['created_at', 'id']),
+    ('ix_medications_patient_created_at_id', 'medications', ['patient_id', 'created_at', 'id']),
+    ('ix_reconciliations_created_at_id', 'reconciliations', ['created_at', 'id']),
+    ('ix_reconciliations_patient_created_at_id', 'reconciliations', ['patient_id', 'created_at', 'id']),
+    ('ix_reconciliations_status_created_at_id', 'reconciliations', ['status', 'created_at', 'id']),
+    # Active medication lists and provider lookups
+    ('ix_medications_patient_active', 'medications', ['patient_id', 'is_active']),
+    ('ix_reconciliations_provider_id', 'reconciliations', ['provider_id']),
+    # Case-insensitive patient search
+    ('ix_patients_last_first_lower', 'patients', [sa.text('lower(last_name)'), sa.text('lower(first_name)')]),
+    ('ix_patients_first_last_lower', 'patients', [sa.text('lower(first_name)'), sa.text('lower(last_name)')]),
+    ('ix_patients_email_lower', 'patients', [sa.text('lower(email)')]),
+    ('ix_patients_dob_last_lower', 'patients', ['date_of_birth', sa.text('lower(last_name)')]),
+    ('ix_patients_dob_first_lower', 'patients', ['date_of_birth', sa.text('lower(first_name)')]),
+]
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('ocr_cache'):
+        op.create_table(
+            'ocr_cache',
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('ocr_version', sa.String(length=50), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('result', sa.JSON(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.PrimaryKeyConstraint('content_hash', 'ocr_version'),
+        )
+
+    # create_tables() may already have added some of these
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_table('ocr_cache')
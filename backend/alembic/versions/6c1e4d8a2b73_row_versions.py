@@ -0,0 +1,40 @@
+"""Row versions for conditional GETs
+
+Revision ID: 6c1e4d8a2b73
+Revises: 3f6a9b2d5e18
+Create Date: 2026-10-17 19:12:44.501236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c1e4d8a2b73'
+down_revision: Union[str, None] = '3f6a9b2d5e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('patients', 'medications', 'reconciliations')
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        # Databases bootstrapped by create_tables() may have these already
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        # SQLite cannot add a column with a non-constant default, so
+        # updated_at is set by the application and backfilled here
+        if 'updated_at' not in existing:
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+        if 'version' not in existing:
+            op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.execute(f'UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, 'version')
+        op.drop_column(table, 'updated_at')
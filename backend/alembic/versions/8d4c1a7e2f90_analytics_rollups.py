@@ -0,0 +1,51 @@
+"""Analytics rollup table
+
+Revision ID: 8d4c1a7e2f90
+Revises: 5b2e8f0c1d47
+Create Date: 2026-10-17 14:03:22.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4c1a7e2f90'
+down_revision: Union[str, None] = '5b2e8f0c1d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Backfill, one statement per rollup in app/services/analytics.py
+BACKFILL = [
+    "SELECT 'patients', date(created_at), '', count(*), 0 FROM patients GROUP BY date(created_at)",
+    "SELECT 'medication_source', date(created_at), source, count(*), 0 FROM medications "
+    "GROUP BY date(created_at), source",
+    "SELECT 'ocr', date(created_at), '', count(*), sum(ocr_confidence) FROM medications "
+    "WHERE ocr_confidence IS NOT NULL GROUP BY date(created_at)",
+    "SELECT 'reconciliation_status', date(created_at), coalesce(status, ''), count(*), "
+    "coalesce(sum(conflicts_found), 0) FROM reconciliations GROUP BY date(created_at), coalesce(status, '')",
+    "SELECT 'reconciliation_provider', date(created_at), CAST(provider_id AS VARCHAR(100)), count(*), 0 "
+    "FROM reconciliations GROUP BY date(created_at), provider_id",
+]
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('analytics_rollups'):
+        return
+    op.create_table(
+        'analytics_rollups',
+        sa.Column('metric', sa.String(length=50), nullable=False),
+        sa.Column('dimension', sa.String(length=100), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('metric', 'dimension', 'day'),
+    )
+    for select in BACKFILL:
+        op.execute(f"INSERT INTO analytics_rollups (metric, day, dimension, count, total) {select}")
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_rollups')
@@ -0,0 +1,39 @@
+"""Upload blob keys
+
+Revision ID: 9a3f7c2e6b14
+Revises: 6c1e4d8a2b73
+Create Date: 2026-10-17 21:12:44.508163
+
+"""
+import posixpath
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a3f7c2e6b14'
+down_revision: Union[str, None] = '6c1e4d8a2b73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # image_path held "uploads/<name>"; it now holds the blob key "<name>"
+    medications = sa.table('medications', sa.column('image_path', sa.String))
+    bind = op.get_bind()
+    paths = bind.execute(
+        sa.select(medications.c.image_path).where(medications.c.image_path.like('%/%')).distinct()
+    ).scalars().all()
+    for path in paths:
+        bind.execute(
+            medications.update()
+            .where(medications.c.image_path == path)
+            .values(image_path=posixpath.basename(path.replace('\\', '/')))
+        )
+    op.create_index('ix_medications_image_path', 'medications', ['image_path'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_medications_image_path', table_name='medications')
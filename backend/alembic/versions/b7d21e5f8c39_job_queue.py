@@ -0,0 +1,53 @@
+"""Background job queue
+
+Revision ID: b7d21e5f8c39
+Revises: 9a3f7c2e6b14
+Create Date: 2026-10-17 22:31:05.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d21e5f8c39'
+down_revision: Union[str, None] = '9a3f7c2e6b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # create_tables() may already have added it
+    if not sa.inspect(op.get_bind()).has_table('jobs'):
+        op.create_table(
+            'jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=50), nullable=False),
+            sa.Column('payload', sa.JSON(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('priority', sa.Integer(), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('max_attempts', sa.Integer(), nullable=False),
+            sa.Column('run_at', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('worker_id', sa.String(length=100), nullable=True),
+            sa.Column('progress', sa.JSON(), nullable=True),
+            sa.Column('result', sa.JSON(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('provider_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['provider_id'], ['providers.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    op.create_index(
+        'ix_jobs_status_priority_run_at', 'jobs', ['status', sa.text('priority DESC'), 'run_at'], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_priority_run_at', table_name='jobs')
+    op.drop_table('jobs')
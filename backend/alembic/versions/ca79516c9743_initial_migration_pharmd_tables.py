@@ -19,8 +19,87 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    pass
+    # Databases bootstrapped by create_tables() already have these tables;
+    # only create what is missing so they can adopt migrations in place.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'providers' not in existing:
+        op.create_table(
+            'providers',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('email', sa.String(length=100), nullable=False),
+            sa.Column('license_number', sa.String(length=50), nullable=True),
+            sa.Column('specialty', sa.String(length=100), nullable=True),
+            sa.Column('practice_name', sa.String(length=200), nullable=True),
+            sa.Column('hashed_password', sa.String(length=255), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_providers_id', 'providers', ['id'])
+        op.create_index('ix_providers_email', 'providers', ['email'], unique=True)
+
+    if 'patients' not in existing:
+        op.create_table(
+            'patients',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('first_name', sa.String(length=50), nullable=False),
+            sa.Column('last_name', sa.String(length=50), nullable=False),
+            sa.Column('date_of_birth', sa.Date(), nullable=False),
+            sa.Column('phone', sa.String(length=20), nullable=True),
+            sa.Column('email', sa.String(length=100), nullable=True),
+            sa.Column('mrn', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_patients_id', 'patients', ['id'])
+        op.create_index('ix_patients_mrn', 'patients', ['mrn'])
+
+    if 'medications' not in existing:
+        op.create_table(
+            'medications',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('patient_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('generic_name', sa.String(length=200), nullable=True),
+            sa.Column('dosage', sa.String(length=100), nullable=True),
+            sa.Column('frequency', sa.String(length=100), nullable=True),
+            sa.Column('source', sa.String(length=50), nullable=False),
+            sa.Column('ndc_number', sa.String(length=20), nullable=True),
+            sa.Column('last_filled', sa.Date(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('image_path', sa.String(length=500), nullable=True),
+            sa.Column('ocr_confidence', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.ForeignKeyConstraint(['patient_id'], ['patients.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_medications_id', 'medications', ['id'])
+
+    if 'reconciliations' not in existing:
+        op.create_table(
+            'reconciliations',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('patient_id', sa.Integer(), nullable=False),
+            sa.Column('provider_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('total_medications', sa.Integer(), nullable=True),
+            sa.Column('approved_medications', sa.Integer(), nullable=True),
+            sa.Column('conflicts_found', sa.Integer(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['patient_id'], ['patients.id']),
+            sa.ForeignKeyConstraint(['provider_id'], ['providers.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_reconciliations_id', 'reconciliations', ['id'])
 
 
 def downgrade() -> None:
-    pass
+    op.drop_table('reconciliations')
+    op.drop_table('medications')
+    op.drop_table('patients')
+    op.drop_table('providers')
@@ -0,0 +1,178 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
+from app.core.database import get_db
+from app.api.endpoints.auth import get_current_user, Provider
+from app.services.analytics import analytics_cache, rollup_daily, rollup_totals, start_day
+from pydantic import BaseModel
+from datetime import date
+
+router = APIRouter()
+
+# Window for every endpoint; omit for all time
+DAYS = Query(None, ge=1, le=3660, description="Only count rows created in the last N days")
+
+class StatusCount(BaseModel):
+    status: str
+    count: int
+    conflicts: int
+
+class DailyStatusCount(StatusCount):
+    day: date
+
+class ProviderDailyCount(BaseModel):
+    day: date
+    provider_id: int
+    provider_name: str | None
+    count: int
+
+class SourceCount(BaseModel):
+    source: str
+    count: int
+
+class OCRStats(BaseModel):
+    medications: int
+    average_confidence: float | None
+
+class DailyOCRStats(OCRStats):
+    day: date
+
+class AnalyticsSummary(BaseModel):
+    days: int | None
+    start: date | None
+    patients: int
+    medications: int
+    reconciliations: int
+    reconciliations_by_status: List[StatusCount]
+    reconciliations_daily: List[DailyStatusCount]
+    reconciliations_by_provider: List[ProviderDailyCount]
+    medications_by_source: List[SourceCount]
+    ocr: OCRStats
+    ocr_daily: List[DailyOCRStats]
+
+def _average(count: int, total: int) -> float | None:
+    return round(total / count, 1) if count else None
+
+async def _provider_names(db: AsyncSession, provider_ids) -> Dict[int, str]:
+    if not provider_ids:
+        return {}
+    result = await db.execute(select(Provider.id, Provider.name).where(Provider.id.in_(provider_ids)))
+    return dict(result.all())
+
+def _status_rows(totals) -> List[dict]:
+    return [
+        {"status": status, "count": count, "conflicts": conflicts}
+        for status, (count, conflicts) in sorted(totals["reconciliation_status"].items())
+    ]
+
+def _source_rows(totals) -> List[dict]:
+    return [
+        {"source": source, "count": count}
+        for source, (count, _) in sorted(totals["medication_source"].items())
+    ]
+
+def _ocr_stats(totals) -> dict:
+    count, confidence = totals["ocr"].get("", (0, 0))
+    return {"medications": count, "average_confidence": _average(count, confidence)}
+
+async def _provider_rows(db: AsyncSession, daily) -> List[dict]:
+    rows = daily["reconciliation_provider"]
+    names = await _provider_names(db, {int(provider_id) for _, provider_id, _, _ in rows})
+    return [
+        {"day": day, "provider_id": int(provider_id), "provider_name": names.get(int(provider_id)), "count": count}
+        for day, provider_id, count, _ in rows
+    ]
+
+@router.get("/summary", response_model=AnalyticsSummary)
+async def get_summary(
+    days: int | None = DAYS,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Everything the dashboard charts need, from the rollup table.
+
+    Two rollup queries (totals and per-day rows) plus one for provider
+    names, whatever the size of the underlying tables; cached briefly.
+    """
+    cached = analytics_cache.get(("summary", days))
+    if cached is not None:
+        return cached
+
+    since = start_day(days)
+    metrics = ["patients", "medication_source", "ocr", "reconciliation_status", "reconciliation_provider"]
+    totals = await rollup_totals(db, metrics, since)
+    daily = await rollup_daily(db, ["ocr", "reconciliation_status", "reconciliation_provider"], since)
+
+    summary = {
+        "days": days,
+        "start": since,
+        "patients": sum(count for count, _ in totals["patients"].values()),
+        "medications": sum(count for count, _ in totals["medication_source"].values()),
+        "reconciliations": sum(count for count, _ in totals["reconciliation_status"].values()),
+        "reconciliations_by_status": _status_rows(totals),
+        "reconciliations_daily": [
+            {"day": day, "status": status, "count": count, "conflicts": conflicts}
+            for day, status, count, conflicts in daily["reconciliation_status"]
+        ],
+        "reconciliations_by_provider": await _provider_rows(db, daily),
+        "medications_by_source": _source_rows(totals),
+        "ocr": _ocr_stats(totals),
+        "ocr_daily": [
+            {"day": day, "medications": count, "average_confidence": _average(count, confidence)}
+            for day, _, count, confidence in daily["ocr"]
+        ],
+    }
+    return analytics_cache.set(("summary", days), summary)
+
+@router.get("/reconciliations/status", response_model=List[StatusCount])
+async def get_reconciliation_status_counts(
+    days: int | None = DAYS,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Reconciliation counts (and conflicts found) by status"""
+    cached = analytics_cache.get(("status", days))
+    if cached is not None:
+        return cached
+    totals = await rollup_totals(db, ["reconciliation_status"], start_day(days))
+    return analytics_cache.set(("status", days), _status_rows(totals))
+
+@router.get("/reconciliations/providers", response_model=List[ProviderDailyCount])
+async def get_reconciliations_per_provider(
+    days: int | None = DAYS,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Reconciliations started per provider per day"""
+    cached = analytics_cache.get(("providers", days))
+    if cached is not None:
+        return cached
+    daily = await rollup_daily(db, ["reconciliation_provider"], start_day(days))
+    return analytics_cache.set(("providers", days), await _provider_rows(db, daily))
+
+@router.get("/medications/sources", response_model=List[SourceCount])
+async def get_medication_source_counts(
+    days: int | None = DAYS,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Medication counts by source (photo, pharmacy, emr, manual)"""
+    cached = analytics_cache.get(("sources", days))
+    if cached is not None:
+        return cached
+    totals = await rollup_totals(db, ["medication_source"], start_day(days))
+    return analytics_cache.set(("sources", days), _source_rows(totals))
+
+@router.get("/ocr", response_model=OCRStats)
+async def get_ocr_stats(
+    days: int | None = DAYS,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Medications captured by OCR and their average confidence"""
+    cached = analytics_cache.get(("ocr", days))
+    if cached is not None:
+        return cached
+    totals = await rollup_totals(db, ["ocr"], start_day(days))
+    return analytics_cache.set(("ocr", days), _ocr_stats(totals))
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.core.database import get_db
-from app.core.security import create_access_token, verify_password, get_password_hash
+from app.core.security import create_access_token, password_hasher
 from app.models.models import Provider
+from app.services.principal_cache import principal_cache
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -38,10 +40,11 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 @router.post("/register", response_model=UserResponse)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new provider"""
     # Check if user already exists
-    existing_user = db.query(Provider).filter(Provider.email == user.email).first()
+    result = await db.execute(select(Provider).where(Provider.email == user.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -49,7 +52,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new provider
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = Provider(
         name=user.name,
         email=user.email,
@@ -60,48 +63,58 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """Login and get access token"""
-    user = db.query(Provider).filter(Provider.email == form_data.username).first()
+    result = await db.execute(select(Provider).where(Provider.email == form_data.username))
+    user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = False, None
+    if user and user.is_active:
+        verified, new_hash = await password_hasher.verify_and_update(
+            form_data.password, user.hashed_password
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Re-hash with the current cost now that we have the plain password
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.id,
+        expires_delta=access_token_expires,
+        claims={"email": user.email, "name": user.name}
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Dependency to get current user
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        from app.core.security import decode_token
-        email = decode_token(token)
-        if email is None:
-            raise credentials_exception
-    except Exception:
+    # Steady state is two in-memory lookups: token -> id -> provider
+    principal = principal_cache.resolve_token(token)
+    if principal is None:
         raise credentials_exception
     
-    user = db.query(Provider).filter(Provider.email == email).first()
-    if user is None:
+    user = await principal_cache.get_provider(db, principal)
+    if user is None or not user.is_active:
         raise credentials_exception
     
     return user
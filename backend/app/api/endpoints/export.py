@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+from app.api.endpoints.auth import get_current_user, Provider
+from app.services.export import EXPORT_FORMATS, ExportFilters, stream_export
+
+router = APIRouter()
+
+FORMAT = Query("csv", description="csv or ndjson")
+
+def export_filters(
+    patient_id: int | None = None,
+    start: date | None = Query(None, description="Rows created on or after this day (UTC)"),
+    end: date | None = Query(None, description="Rows created on or before this day (UTC)"),
+    reconciliation_status: str | None = Query(None, description="Only patients with a reconciliation in this status"),
+) -> ExportFilters:
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return ExportFilters(patient_id, start, end, reconciliation_status)
+
+def export_response(dataset: str, filters: ExportFilters, format: str) -> StreamingResponse:
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unknown export format. Use format=csv or format=ndjson")
+    filename = f"{dataset}-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        stream_export(dataset, filters, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/patients")
+async def export_patients(
+    format: str = FORMAT,
+    filters: ExportFilters = Depends(export_filters),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Stream patients as CSV or NDJSON"""
+    return export_response("patients", filters, format)
+
+@router.get("/medications")
+async def export_medications(
+    format: str = FORMAT,
+    filters: ExportFilters = Depends(export_filters),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Stream medications, with each patient's MRN, as CSV or NDJSON"""
+    return export_response("medications", filters, format)
+
+@router.get("/reconciliations")
+async def export_reconciliations(
+    format: str = FORMAT,
+    filters: ExportFilters = Depends(export_filters),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Stream reconciliations as CSV or NDJSON; ``reconciliation_status`` filters on their own status"""
+    return export_response("reconciliations", filters, format)
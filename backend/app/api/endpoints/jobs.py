@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from app.core.database import get_db
+from app.api.endpoints.auth import get_current_user, Provider
+from app.models.models import Job
+from pydantic import BaseModel
+
+router = APIRouter()
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    progress: dict | None
+    result: dict | None
+    error: str | None
+    created_at: datetime | None
+    run_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+    class Config:
+        from_attributes = True
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Status, progress and result of a background job you queued"""
+    job = await db.get(Job, job_id)
+    if not job or job.provider_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import date
-from app.core.database import get_db
+import json
+import os
+import tempfile
+from app.core.config import settings
+from app.core.database import get_db, AsyncSessionLocal
 from app.models.models import Medication, Patient
 from app.api.endpoints.auth import get_current_user, Provider
+from app.utils.pagination import paginate, resolve_cursor, set_pagination_headers, InvalidCursor
+from app.utils.serialization import FIELDS, ORJSONResponse, response_columns, rows_response, select_fields
+from app.utils.conditional import is_conditional, is_not_modified, make_validators, not_modified, set_validators
+from app.services.formulary import get_formulary
+from app.services.medication_import import FORMATS, SOURCES, MedicationImporter, detect_format
+from app.services.jobs import enqueue
+from app.services import tasks  # noqa: F401  Registers the medication_import task
+from app.api.endpoints.jobs import JobResponse
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -49,82 +63,226 @@ class MedicationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+MEDICATION_COLUMNS = response_columns(Medication, MedicationResponse)
+
+class FormularyMatchResponse(BaseModel):
+    name: str
+    generic_name: str | None
+    ndc_number: str | None
+    strength: str | None
+    score: float
+
 @router.post("/", response_model=MedicationResponse)
 async def create_medication(
     medication: MedicationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Create a new medication"""
     # Verify patient exists
-    patient = db.query(Patient).filter(Patient.id == medication.patient_id).first()
+    patient = await db.get(Patient, medication.patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
     db_medication = Medication(**medication.dict())
     db.add(db_medication)
-    db.commit()
-    db.refresh(db_medication)
+    await db.commit()
+    await db.refresh(db_medication)
     return db_medication
 
 @router.get("/", response_model=List[MedicationResponse])
 async def list_medications(
+    request: Request,
+    response: Response,
     patient_id: int | None = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    include_total: bool = False,
+    fields: str | None = FIELDS,
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
-    """Get list of medications, optionally filtered by patient"""
-    query = db.query(Medication)
-    if patient_id:
-        query = query.filter(Medication.patient_id == patient_id)
+    """Get list of medications, optionally filtered by patient.
+
+    Paged by cursor like ``GET /patients``; the filter is kept in the cursor.
+    ``fields`` narrows both the response and the SELECT.
+    A patient's list carries an ETag built from one aggregate over that
+    patient's rows, and a matching If-None-Match gets a 304.
+    """
+    try:
+        page_cursor, filters = resolve_cursor(cursor, {"patient_id": patient_id or None})
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    medications = query.offset(skip).limit(limit).all()
-    return medications
+    names, columns = select_fields(MEDICATION_COLUMNS, fields, keys=[Medication.id, Medication.created_at])
+    validators = None
+    if filters.get("patient_id"):
+        # Count and max id catch inserts and deletes; the version sum, any update
+        versions = (await db.execute(
+            select(func.count(), func.max(Medication.id), func.sum(Medication.version), func.max(Medication.updated_at))
+            .where(Medication.patient_id == filters["patient_id"])
+        )).one()
+        validators = make_validators(("medications", request.url.query, *versions[:3]), [versions[3]])
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+    
+    query = select(*columns)
+    if filters.get("patient_id"):
+        query = query.where(Medication.patient_id == filters["patient_id"])
+    
+    page = await paginate(
+        db, query, Medication, limit,
+        cursor=page_cursor, filters=filters, skip=skip, include_total=include_total, scalars=False
+    )
+    set_pagination_headers(request, response, page)
+    if validators:
+        set_validators(response, validators)
+    return rows_response(names, page.items, response)
+
+async def spool_feed(file: UploadFile, directory: str | None = None) -> str:
+    """Copy an uploaded feed to a temporary file, chunk by chunk"""
+    size = 0
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(prefix="feed-", dir=directory, delete=False) as spool:
+        try:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.IMPORT_MAX_FILE_SIZE:
+                    raise HTTPException(status_code=400, detail="File too large")
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            os.unlink(spool.name)
+            raise
+    return spool.name
+
+@router.post("/import")
+async def import_medications(
+    file: UploadFile = File(...),
+    source: str = Query("pharmacy", description="Source for rows that do not name one"),
+    format: str | None = Query(None, description="csv or ndjson; default from the file name"),
+    background: bool = Query(False, description="Queue the import for a worker and return its job"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Bulk import a pharmacy/EMR medication feed (CSV or NDJSON).
+
+    Rows identify the patient by ``patient_id`` or ``mrn``; rows with
+    ``ndc`` and ``last_filled`` update the matching medication instead of
+    adding another. Streams NDJSON: a progress line after each committed
+    batch, then a final line with ``done: true`` and the per-row errors.
+    With ``background=true`` the feed is imported by ``python -m app.worker``
+    instead: answers 202 with the job, whose progress is at ``/jobs/{id}``.
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail="Unknown feed format. Use format=csv or format=ndjson")
+    if source not in SOURCES:
+        raise HTTPException(status_code=400, detail=f"Invalid source. Allowed: {sorted(SOURCES)}")
+
+    if background:
+        path = await spool_feed(file, settings.JOB_FILES_DIR)
+        try:
+            job = await enqueue(
+                db, "medication_import", {"path": os.path.abspath(path), "format": fmt, "source": source},
+                provider_id=current_user.id
+            )
+        except BaseException:
+            os.unlink(path)
+            raise
+        return ORJSONResponse(
+            JobResponse.model_validate(job).model_dump(),
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={"Location": f"{settings.API_V1_STR}/jobs/{job.id}"}
+        )
+
+    # The request body is gone once we stream
+    path = await spool_feed(file)
+
+    async def stream_progress():
+        try:
+            async with AsyncSessionLocal() as db:
+                importer = MedicationImporter(db, source)
+                try:
+                    with open(path, encoding="utf-8-sig", newline="") as feed:
+                        async for progress in importer.run(feed, fmt):
+                            yield json.dumps(progress.to_dict(include_errors=progress.done)) + "\n"
+                except UnicodeDecodeError:
+                    # Batches before the bad bytes are already committed
+                    yield json.dumps({**importer.progress.to_dict(), "done": True, "error": "Feed is not valid UTF-8"}) + "\n"
+        finally:
+            os.unlink(path)
+
+    return StreamingResponse(stream_progress(), media_type="application/x-ndjson")
+
+@router.get("/lookup", response_model=List[FormularyMatchResponse])
+async def lookup_medications(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Autocomplete and fuzzy-match drug names against the local formulary"""
+    return get_formulary().autocomplete(q, limit=limit)
+
+def medication_validators(medication_id: int, version: int, updated_at):
+    return make_validators(("medication", medication_id, version), [updated_at])
 
 @router.get("/{medication_id}", response_model=MedicationResponse)
 async def get_medication(
     medication_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
-    """Get medication by ID"""
-    medication = db.query(Medication).filter(Medication.id == medication_id).first()
+    """Get medication by ID; supports If-None-Match/If-Modified-Since"""
+    if is_conditional(request):
+        row = (await db.execute(
+            select(Medication.version, Medication.updated_at).where(Medication.id == medication_id)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Medication not found")
+        validators = medication_validators(medication_id, row.version, row.updated_at)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+    medication = await db.get(Medication, medication_id)
     if not medication:
         raise HTTPException(status_code=404, detail="Medication not found")
+    set_validators(response, medication_validators(medication_id, medication.version, medication.updated_at))
     return medication
 
 @router.put("/{medication_id}", response_model=MedicationResponse)
 async def update_medication(
     medication_id: int,
     medication_update: MedicationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Update medication information"""
-    medication = db.query(Medication).filter(Medication.id == medication_id).first()
+    medication = await db.get(Medication, medication_id)
     if not medication:
         raise HTTPException(status_code=404, detail="Medication not found")
     
     for field, value in medication_update.dict(exclude_unset=True).items():
         setattr(medication, field, value)
     
-    db.commit()
-    db.refresh(medication)
+    await db.commit()
+    await db.refresh(medication)
     return medication
 
 @router.delete("/{medication_id}")
 async def delete_medication(
     medication_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Delete medication"""
-    medication = db.query(Medication).filter(Medication.id == medication_id).first()
+    medication = await db.get(Medication, medication_id)
     if not medication:
         raise HTTPException(status_code=404, detail="Medication not found")
     
-    db.delete(medication)
-    db.commit()
+    await db.delete(medication)
+    await db.commit()
     return {"message": "Medication deleted successfully"}
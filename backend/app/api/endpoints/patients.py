@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import date
 from app.core.database import get_db
 from app.models.models import Patient
 from app.api.endpoints.auth import get_current_user, Provider
+from app.services.patient_search import search_patients
+from app.utils.pagination import paginate, resolve_cursor, set_pagination_headers, InvalidCursor
+from app.utils.serialization import FIELDS, response_columns, rows_response, select_fields
+from app.utils.conditional import is_conditional, is_not_modified, make_validators, not_modified, set_validators
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -29,72 +34,135 @@ class PatientResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PatientSearchResult(PatientResponse):
+    score: float
+
+PATIENT_COLUMNS = response_columns(Patient, PatientResponse)
+
 @router.post("/", response_model=PatientResponse)
 async def create_patient(
     patient: PatientCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Create a new patient"""
     db_patient = Patient(**patient.dict())
     db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)
+    await db.commit()
+    await db.refresh(db_patient)
     return db_patient
 
 @router.get("/", response_model=List[PatientResponse])
 async def list_patients(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    include_total: bool = False,
+    fields: str | None = FIELDS,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Get list of patients, oldest first.
+
+    Follow ``X-Next-Cursor`` / ``X-Prev-Cursor`` (or the ``Link`` header)
+    to page; ``skip`` is kept for older clients. ``fields`` narrows both
+    the response and the SELECT.
+    """
+    try:
+        page_cursor, filters = resolve_cursor(cursor, {})
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    names, columns = select_fields(PATIENT_COLUMNS, fields, keys=[Patient.id, Patient.created_at])
+    page = await paginate(
+        db, select(*columns), Patient, limit,
+        cursor=page_cursor, filters=filters, skip=skip, include_total=include_total, scalars=False
+    )
+    set_pagination_headers(request, response, page)
+    return rows_response(names, page.items, response)
+
+@router.get("/search", response_model=List[PatientSearchResult])
+async def search_patients_endpoint(
+    q: str = Query("", max_length=100),
+    dob: date | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
-    """Get list of patients"""
-    patients = db.query(Patient).offset(skip).limit(limit).all()
-    return patients
+    """Search patients by name prefix, exact MRN or email, best match first.
+
+    ``q`` may be "smi", "john smi", "Smith, John", an MRN or an email, and
+    may include a date of birth ("smith 1950-02-14"); ``dob`` narrows the
+    same way.
+    """
+    if not q.strip() and dob is None:
+        raise HTTPException(status_code=400, detail="Provide a search term or date of birth")
+    
+    matches = await search_patients(db, q, date_of_birth=dob, limit=limit)
+    return [
+        PatientSearchResult(**PatientResponse.model_validate(m.patient).model_dump(), score=m.score)
+        for m in matches
+    ]
+
+def patient_validators(patient_id: int, version: int, updated_at):
+    return make_validators(("patient", patient_id, version), [updated_at])
 
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
-    """Get a single patient by ID"""
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    """Get a single patient by ID; supports If-None-Match/If-Modified-Since"""
+    if is_conditional(request):
+        row = (await db.execute(
+            select(Patient.version, Patient.updated_at).where(Patient.id == patient_id)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        validators = patient_validators(patient_id, row.version, row.updated_at)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+    patient = await db.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
+    set_validators(response, patient_validators(patient_id, patient.version, patient.updated_at))
     return patient
 
 @router.put("/{patient_id}", response_model=PatientResponse)
 async def update_patient(
     patient_id: int,
     patient_update: PatientCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Update a patient"""
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = await db.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
     for key, value in patient_update.dict(exclude_unset=True).items():
         setattr(patient, key, value)
     
-    db.commit()
-    db.refresh(patient)
+    await db.commit()
+    await db.refresh(patient)
     return patient
 
 @router.delete("/{patient_id}")
 async def delete_patient(
     patient_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Delete a patient"""
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = await db.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    db.delete(patient)
-    db.commit()
+    await db.delete(patient)
+    await db.commit()
     return {"message": "Patient deleted successfully"}
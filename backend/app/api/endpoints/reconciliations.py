@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, func, null
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.core.database import get_db
 from app.models.models import Reconciliation, Patient, Medication
 from app.api.endpoints.auth import get_current_user, Provider
-from pydantic import BaseModel
-from datetime import datetime
+from app.services.conflicts import conflict_engine
+from app.utils.pagination import paginate, resolve_cursor, set_pagination_headers, InvalidCursor
+from app.utils.serialization import FIELDS, response_columns, rows_response, select_fields
+from app.utils.conditional import is_conditional, is_not_modified, make_validators, not_modified, set_validators
+from pydantic import BaseModel, Field
+from datetime import datetime, time
 
 router = APIRouter()
 
@@ -14,10 +19,11 @@ class ReconciliationCreate(BaseModel):
     notes: str | None = None
 
 class ReconciliationUpdate(BaseModel):
+    # conflicts_found is kept up to date by the server, not set by clients;
+    # which medications were approved is only known to the reviewer
     status: str | None = None
     notes: str | None = None
-    approved_medications: int | None = None
-    conflicts_found: int | None = None
+    approved_medications: int | None = Field(None, ge=0)
 
 class ReconciliationResponse(BaseModel):
     id: int
@@ -34,141 +40,292 @@ class ReconciliationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ReconciliationListItem(ReconciliationResponse):
+    patient_name: str | None = None
+    provider_name: str | None = None
+
+class ConflictResponse(BaseModel):
+    type: str
+    drug: str
+    medication_ids: List[int]
+    sources: List[str]
+    detail: str
+
 class ReconciliationSummary(BaseModel):
     reconciliation: ReconciliationResponse
     patient_name: str
     provider_name: str
     medications: List[dict]
+    conflicts: List[ConflictResponse] = []
 
 @router.post("/", response_model=ReconciliationResponse)
 async def create_reconciliation(
     reconciliation: ReconciliationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Start a new medication reconciliation"""
     # Verify patient exists
-    patient = db.query(Patient).filter(Patient.id == reconciliation.patient_id).first()
+    patient = await db.get(Patient, reconciliation.patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
     # Count patient's active medications
-    total_meds = db.query(Medication).filter(
-        Medication.patient_id == reconciliation.patient_id,
-        Medication.is_active == True
-    ).count()
+    total_meds = await db.scalar(
+        select(func.count(Medication.id)).where(
+            Medication.patient_id == reconciliation.patient_id,
+            Medication.is_active == True
+        )
+    )
+    
+    conflicts = await conflict_engine.get_conflicts(db, reconciliation.patient_id)
     
     db_reconciliation = Reconciliation(
         patient_id=reconciliation.patient_id,
         provider_id=current_user.id,
         total_medications=total_meds,
+        conflicts_found=len(conflicts),
         notes=reconciliation.notes
     )
     
     db.add(db_reconciliation)
-    db.commit()
-    db.refresh(db_reconciliation)
+    await db.commit()
+    await db.refresh(db_reconciliation)
     return db_reconciliation
 
-@router.get("/", response_model=List[ReconciliationResponse])
+# Column projections used instead of loading ORM objects and relationships
+RECONCILIATION_COLUMNS = list(Reconciliation.__table__.c)
+PATIENT_NAME = (Patient.first_name + " " + Patient.last_name).label("patient_name")
+PROVIDER_NAME = Provider.name.label("provider_name")
+LIST_COLUMNS = response_columns(
+    Reconciliation, ReconciliationListItem,
+    patient_name=null().label("patient_name"), provider_name=null().label("provider_name")
+)
+NAMED_LIST_COLUMNS = response_columns(
+    Reconciliation, ReconciliationListItem, patient_name=PATIENT_NAME, provider_name=PROVIDER_NAME
+)
+DETAIL_MEDICATION_COLUMNS = [
+    Medication.id.label("medication_id"),
+    Medication.name.label("medication_name"),
+    Medication.dosage.label("medication_dosage"),
+    Medication.frequency.label("medication_frequency"),
+    Medication.source.label("medication_source"),
+    Medication.version.label("medication_version"),
+    Medication.updated_at.label("medication_updated_at"),
+]
+PATIENT_VERSION_COLUMNS = [Patient.version.label("patient_version"), Patient.updated_at.label("patient_updated_at")]
+# What the detail view is built from, aggregated over the active medications
+DETAIL_VERSION_COLUMNS = [
+    Reconciliation.version, Reconciliation.updated_at, *PATIENT_VERSION_COLUMNS,
+    func.count(Medication.id), func.max(Medication.id),
+    func.coalesce(func.sum(Medication.version), 0), func.max(Medication.updated_at),
+]
+
+def detail_validators(reconciliation_id: int, version, updated_at, patient_version, patient_updated_at,
+                      medication_count, medication_max_id, medication_versions, medication_updated_at):
+    # Stale-fill conflicts depend on today's date as well as the rows
+    today = datetime.utcnow().date()
+    parts = ("reconciliation", reconciliation_id, version, patient_version, medication_count,
+             medication_max_id, medication_versions, today)
+    return make_validators(parts, [updated_at, patient_updated_at, medication_updated_at, datetime.combine(today, time.min)])
+
+@router.get("/", response_model=List[ReconciliationListItem])
 async def list_reconciliations(
+    request: Request,
+    response: Response,
     status: str | None = None,
     patient_id: int | None = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    include_total: bool = False,
+    include_names: bool = False,
+    fields: str | None = FIELDS,
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
-    """Get list of reconciliations"""
-    query = db.query(Reconciliation)
+    """Get list of reconciliations.
+
+    Paged by cursor like ``GET /patients``; filters are kept in the cursor.
+    ``include_names`` adds ``patient_name``/``provider_name`` from the same
+    query. ``fields`` narrows both the response and the SELECT.
+    """
+    try:
+        page_cursor, filters = resolve_cursor(
+            cursor, {"status": status or None, "patient_id": patient_id or None}
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if status:
-        query = query.filter(Reconciliation.status == status)
-    if patient_id:
-        query = query.filter(Reconciliation.patient_id == patient_id)
+    names, columns = select_fields(
+        NAMED_LIST_COLUMNS if include_names else LIST_COLUMNS, fields,
+        keys=[Reconciliation.id, Reconciliation.created_at]
+    )
+    query = select(*columns)
+    if include_names:
+        query = (
+            query
+            .join(Patient, Patient.id == Reconciliation.patient_id)
+            .join(Provider, Provider.id == Reconciliation.provider_id)
+        )
+    
+    if filters.get("status"):
+        query = query.where(Reconciliation.status == filters["status"])
+    if filters.get("patient_id"):
+        query = query.where(Reconciliation.patient_id == filters["patient_id"])
     
-    reconciliations = query.offset(skip).limit(limit).all()
-    return reconciliations
+    page = await paginate(
+        db, query, Reconciliation, limit,
+        cursor=page_cursor, filters=filters, skip=skip, include_total=include_total, scalars=False
+    )
+    set_pagination_headers(request, response, page)
+    return rows_response(names, page.items, response)
 
 @router.get("/{reconciliation_id}", response_model=ReconciliationSummary)
 async def get_reconciliation(
     reconciliation_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
-    """Get reconciliation details with patient and medication info"""
-    reconciliation = db.query(Reconciliation).filter(
-        Reconciliation.id == reconciliation_id
-    ).first()
+    """Get reconciliation details with patient and medication info.
+
+    Supports If-None-Match/If-Modified-Since, answered from the versions
+    of the reconciliation, its patient and the patient's medications. An
+    open reconciliation reports its current ``conflicts_found``.
+    """
+    if is_conditional(request):
+        versions = (await db.execute(
+            select(*DETAIL_VERSION_COLUMNS)
+            .join(Patient, Patient.id == Reconciliation.patient_id)
+            .outerjoin(Medication, (Medication.patient_id == Reconciliation.patient_id) & (Medication.is_active == True))
+            .where(Reconciliation.id == reconciliation_id)
+            .group_by(Reconciliation.id, Patient.id)
+        )).first()
+        if versions is None:
+            raise HTTPException(status_code=404, detail="Reconciliation not found")
+        validators = detail_validators(reconciliation_id, *versions)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
+    # One round trip: the reconciliation, both names and the patient's
+    # active medications (one row each, or a single row of NULLs)
+    result = await db.execute(
+        select(*RECONCILIATION_COLUMNS, PATIENT_NAME, PROVIDER_NAME, *PATIENT_VERSION_COLUMNS, *DETAIL_MEDICATION_COLUMNS)
+        .join(Patient, Patient.id == Reconciliation.patient_id)
+        .join(Provider, Provider.id == Reconciliation.provider_id)
+        .outerjoin(Medication, (Medication.patient_id == Reconciliation.patient_id) & (Medication.is_active == True))
+        .where(Reconciliation.id == reconciliation_id)
+        .order_by(Medication.id)
+    )
+    rows = result.all()
     
-    if not reconciliation:
+    if not rows:
         raise HTTPException(status_code=404, detail="Reconciliation not found")
     
-    # Get patient and medications
-    patient = reconciliation.patient
-    medications = db.query(Medication).filter(
-        Medication.patient_id == reconciliation.patient_id,
-        Medication.is_active == True
-    ).all()
-    
+    first = rows[0]
+    # Cached per patient; only medications changed since are reloaded
+    conflicts = await conflict_engine.get_conflicts(db, first.patient_id)
+    listed = [row for row in rows if row.medication_id is not None]
+    set_validators(response, detail_validators(
+        reconciliation_id, first.version, first.updated_at, first.patient_version, first.patient_updated_at,
+        len(listed), max((row.medication_id for row in listed), default=None),
+        sum(row.medication_version for row in listed),
+        max((row.medication_updated_at for row in listed if row.medication_updated_at), default=None)
+    ))
+    reconciliation = {column.name: getattr(first, column.name) for column in RECONCILIATION_COLUMNS}
+    if reconciliation["status"] != "completed":
+        reconciliation["conflicts_found"] = len(conflicts)
     return {
         "reconciliation": reconciliation,
-        "patient_name": f"{patient.first_name} {patient.last_name}",
-        "provider_name": reconciliation.provider.name,
+        "patient_name": first.patient_name,
+        "provider_name": first.provider_name,
         "medications": [
             {
-                "id": med.id,
-                "name": med.name,
-                "dosage": med.dosage,
-                "frequency": med.frequency,
-                "source": med.source
-            } for med in medications
-        ]
+                "id": row.medication_id,
+                "name": row.medication_name,
+                "dosage": row.medication_dosage,
+                "frequency": row.medication_frequency,
+                "source": row.medication_source
+            } for row in rows if row.medication_id is not None
+        ],
+        "conflicts": [conflict.to_dict() for conflict in conflicts]
     }
 
+@router.get("/{reconciliation_id}/conflicts", response_model=List[ConflictResponse])
+async def get_reconciliation_conflicts(
+    reconciliation_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Duplicates, dose/frequency discrepancies and stale fills in the
+    patient's active medications, grouped by drug identity.
+
+    Only medications changed since the last call are reloaded.
+    """
+    patient_id = await db.scalar(select(Reconciliation.patient_id).where(Reconciliation.id == reconciliation_id))
+    
+    if patient_id is None:
+        raise HTTPException(status_code=404, detail="Reconciliation not found")
+    
+    conflicts = await conflict_engine.get_conflicts(db, patient_id)
+    return [conflict.to_dict() for conflict in conflicts]
+
+async def refresh_conflict_count(db: AsyncSession, reconciliation: Reconciliation):
+    """Store the patient's current conflict count on a reconciliation being written"""
+    conflicts = await conflict_engine.get_conflicts(db, reconciliation.patient_id)
+    if reconciliation.conflicts_found != len(conflicts):
+        reconciliation.conflicts_found = len(conflicts)
+
 @router.put("/{reconciliation_id}", response_model=ReconciliationResponse)
 async def update_reconciliation(
     reconciliation_id: int,
     reconciliation_update: ReconciliationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
-    """Update reconciliation status and details"""
-    reconciliation = db.query(Reconciliation).filter(
-        Reconciliation.id == reconciliation_id
-    ).first()
+    """Update reconciliation status and details.
+
+    ``conflicts_found`` is brought up to date while the reconciliation is
+    open, and kept as it was at completion afterwards.
+    """
+    reconciliation = await db.get(Reconciliation, reconciliation_id)
     
     if not reconciliation:
         raise HTTPException(status_code=404, detail="Reconciliation not found")
     
+    was_completed = reconciliation.status == "completed"
     for field, value in reconciliation_update.dict(exclude_unset=True).items():
         setattr(reconciliation, field, value)
     
     # If status is being set to completed, set completion time
     if reconciliation_update.status == "completed":
         reconciliation.completed_at = datetime.utcnow()
+    if not was_completed:
+        await refresh_conflict_count(db, reconciliation)
     
-    db.commit()
-    db.refresh(reconciliation)
+    await db.commit()
+    await db.refresh(reconciliation)
     return reconciliation
 
 @router.post("/{reconciliation_id}/complete")
 async def complete_reconciliation(
     reconciliation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Provider = Depends(get_current_user)
 ):
     """Mark reconciliation as completed"""
-    reconciliation = db.query(Reconciliation).filter(
-        Reconciliation.id == reconciliation_id
-    ).first()
+    reconciliation = await db.get(Reconciliation, reconciliation_id)
     
     if not reconciliation:
         raise HTTPException(status_code=404, detail="Reconciliation not found")
     
+    if reconciliation.status != "completed":
+        await refresh_conflict_count(db, reconciliation)
     reconciliation.status = "completed"
     reconciliation.completed_at = datetime.utcnow()
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Reconciliation completed successfully"}
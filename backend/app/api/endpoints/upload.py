@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-import os
-import uuid
-from PIL import Image
-import pytesseract
-from app.core.database import get_db
+import asyncio
+import json
+import mimetypes
+from app.core.database import get_db, AsyncSessionLocal
 from app.core.config import settings
-from app.models.models import Medication, Patient
+from app.models.models import Job, Medication, Patient
 from app.api.endpoints.auth import get_current_user, Provider
+from app.services.ocr import process_medication_image, get_ocr_version
+from app.services.ocr_cache import ocr_cache
+from app.services.ocr_executor import ocr_executor, OCRQueueFull
+from app.services.jobs import QUEUED, RUNNING, SUCCEEDED, FAILED
+from app.services.blob_store import blob_store, is_valid_key
+from app.services.image_derivatives import MEDIA_TYPE, VARIANTS, ensure_derivatives
+from app.utils.uploads import (
+    stream_upload_to_disk, discard_upload, immutable_file_validators, serve_file,
+    UploadTooLarge, UnsupportedImageType
+)
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -17,169 +27,347 @@ class OCRResult(BaseModel):
     text: str
     confidence: int
     suggested_medications: List[dict]
+    lines: List[dict] = []
 
-class ImageUploadResponse(BaseModel):
+class OCRJobResponse(BaseModel):
+    job_id: str
+    status: str
     filename: str
     file_path: str
+    thumbnail_path: str
+    preview_path: str
     ocr_result: OCRResult | None = None
+    error: str | None = None
 
-@router.post("/image", response_model=ImageUploadResponse)
-async def upload_image(
-    file: UploadFile = File(...),
-    patient_id: int | None = None,
-    db: Session = Depends(get_db),
-    current_user: Provider = Depends(get_current_user)
-):
-    """Upload and process medication image with OCR"""
-    
-    # Validate file type
-    if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
+def image_paths(filename: str) -> dict:
+    """Where the original and its derivatives are served"""
+    return {
+        "file_path": f"{settings.API_V1_STR}/upload/images/{filename}",
+        "thumbnail_path": f"{settings.API_V1_STR}/upload/images/{filename}/thumb",
+        "preview_path": f"{settings.API_V1_STR}/upload/images/{filename}/preview",
+    }
+
+# Job statuses as this API has always reported them
+OCR_STATUSES = {QUEUED: "pending", RUNNING: "pending", SUCCEEDED: "completed", FAILED: "failed"}
+
+def job_to_response(job: Job) -> dict:
+    """Build the public view of an OCR job"""
+    return {
+        "job_id": str(job.id),
+        "status": OCR_STATUSES[job.status],
+        "filename": job.payload["filename"],
+        **image_paths(job.payload["filename"]),
+        "ocr_result": job.result,
+        "error": job.error
+    }
+
+def queue_full_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="OCR queue is full, try again shortly",
+        headers={"Retry-After": str(settings.OCR_RETRY_AFTER)}
+    )
+
+async def stage_upload(file: UploadFile, ocr_version: str, db: AsyncSession) -> dict:
+    """Store an uploaded image and look up its cached OCR result.
+
+    Returns the blob key as ``filename``, a local ``file_path`` to OCR and
+    the ``cached`` OCR result (or None).
+    Identical content is stored once, keyed by its SHA-256.
+    """
+    # Stream to disk, hashing and sniffing the real image type as we go
+    try:
+        upload = await stream_upload_to_disk(
+            file,
+            blob_store.staging_dir,
+            max_size=settings.MAX_FILE_SIZE,
+            allowed_types=settings.ALLOWED_IMAGE_TYPES,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE
+        )
+    except UnsupportedImageType:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed types: {settings.ALLOWED_IMAGE_TYPES}"
         )
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
-    
-    # Save uploaded file
-    try:
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) > settings.MAX_FILE_SIZE:
-                raise HTTPException(status_code=400, detail="File too large")
-            buffer.write(content)
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail="File too large")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-    
-    # Process with OCR
-    ocr_result = None
+
+    cached = await ocr_cache.get(db, upload.content_hash, ocr_version)
+    # Keep the cached result's key, so its medications share one blob; the
+    # store drops the duplicate (or restores a collected blob)
+    key = cached["filename"] if cached else f"{upload.content_hash}{upload.extension}"
     try:
-        ocr_result = await process_medication_image(file_path)
+        created = await blob_store.put_file(upload.temp_path, key)
     except Exception as e:
-        print(f"OCR processing failed: {str(e)}")
-        # Continue without OCR if it fails
-    
-    # If patient_id provided, create medication entries
-    if patient_id and ocr_result:
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        await discard_upload(upload)
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    if created:
+        # Once per stored blob; a failure here is retried when one is requested
+        await ensure_derivatives(key)
+    return {
+        "content_hash": upload.content_hash,
+        "filename": key,
+        "file_path": await blob_store.local_path(key),
+        "cached": cached["result"] if cached else None
+    }
+
+async def cache_ocr_result(staged: dict, ocr_version: str, result: dict):
+    async with AsyncSessionLocal() as db:
+        await ocr_cache.put(db, staged["content_hash"], ocr_version, staged["filename"], result)
+
+@router.post("/image", response_model=OCRJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_image(
+    response: Response,
+    file: UploadFile = File(...),
+    patient_id: int | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Upload a medication image and queue it for OCR.
+
+    Returns a job id immediately; poll ``GET /upload/jobs/{job_id}`` for
+    the OCR result. Images that were already processed are answered from
+    the OCR cache with a completed job and no new file.
+    """
+
+    # Reject early rather than accepting a file we cannot process
+    if ocr_executor.is_full():
+        raise queue_full_exception()
+
+    ocr_version = get_ocr_version()
+    staged = await stage_upload(file, ocr_version, db)
+
+    patient = None
+    if patient_id:
+        patient = await db.get(Patient, patient_id)
+
+    if staged["cached"]:
         if patient:
             await create_medications_from_ocr(
-                patient_id, ocr_result, file_path, db
+                patient.id, OCRResult(**staged["cached"]), staged["filename"]
+            )
+        job = await ocr_executor.add_completed(
+            staged["cached"],
+            provider_id=current_user.id,
+            context={"filename": staged["filename"]}
+        )
+        response.status_code = status.HTTP_200_OK
+        return job_to_response(job)
+
+    # Cache the result and, if a patient was given, create medication entries
+    async def on_complete(result: dict):
+        await cache_ocr_result(staged, ocr_version, result)
+        if patient:
+            await create_medications_from_ocr(
+                patient.id, OCRResult(**result), staged["filename"]
             )
-    
-    return {
-        "filename": unique_filename,
-        "file_path": f"/uploads/{unique_filename}",
-        "ocr_result": ocr_result
-    }
 
-async def process_medication_image(file_path: str) -> OCRResult:
-    """Process image with OCR to extract medication information"""
+    # Queue OCR in the process pool
     try:
-        # Open and preprocess image
-        image = Image.open(file_path)
-        
-        # Convert to grayscale for better OCR
-        if image.mode != 'L':
-            image = image.convert('L')
-        
-        # Extract text using Tesseract
-        extracted_text = pytesseract.image_to_string(image)
-        
-        # Get confidence score
-        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-        confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-        avg_confidence = sum(confidences) // len(confidences) if confidences else 0
-        
-        # Parse medications from text
-        suggested_medications = parse_medications_from_text(extracted_text)
-        
-        return OCRResult(
-            text=extracted_text.strip(),
-            confidence=avg_confidence,
-            suggested_medications=suggested_medications
+        job = await ocr_executor.submit(
+            process_medication_image,
+            staged["file_path"],
+            provider_id=current_user.id,
+            context={"filename": staged["filename"]},
+            on_complete=on_complete
         )
-        
-    except Exception as e:
-        raise Exception(f"OCR processing failed: {str(e)}")
+    except OCRQueueFull:
+        # The blob stays for blob GC: an identical upload may already have
+        # been handed the same key
+        raise queue_full_exception()
 
-def parse_medications_from_text(text: str) -> List[dict]:
-    """Parse medication information from OCR text"""
-    medications = []
-    lines = text.split('\n')
-    
-    # Simple parsing logic - look for medication patterns
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Look for patterns like "Drug Name 100mg"
-        words = line.split()
-        if len(words) >= 2:
-            # Check if line contains dosage indicators
-            dosage_indicators = ['mg', 'ml', 'tablet', 'capsule', 'once', 'twice', 'daily']
-            if any(indicator in line.lower() for indicator in dosage_indicators):
-                medications.append({
-                    "name": words[0],
-                    "dosage": extract_dosage(line),
-                    "frequency": extract_frequency(line),
-                    "raw_text": line
-                })
-    
-    return medications
+    return job_to_response(job)
 
-def extract_dosage(text: str) -> str:
-    """Extract dosage from text"""
-    import re
-    dosage_pattern = r'(\d+\.?\d*\s*(mg|ml|g|mcg))'
-    match = re.search(dosage_pattern, text.lower())
-    return match.group(1) if match else ""
-
-def extract_frequency(text: str) -> str:
-    """Extract frequency from text"""
-    text_lower = text.lower()
-    if 'once' in text_lower and 'daily' in text_lower:
-        return "Once daily"
-    elif 'twice' in text_lower and 'daily' in text_lower:
-        return "Twice daily"
-    elif 'three times' in text_lower or 'tid' in text_lower:
-        return "Three times daily"
-    elif 'four times' in text_lower or 'qid' in text_lower:
-        return "Four times daily"
-    return ""
+@router.post("/images")
+async def upload_images(
+    files: List[UploadFile] = File(...),
+    patient_id: int | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
+):
+    """Upload several medication images and OCR them concurrently.
 
-async def create_medications_from_ocr(
-    patient_id: int, 
-    ocr_result: OCRResult, 
-    image_path: str, 
-    db: Session
+    Streams NDJSON: one line per image as soon as its OCR finishes (in
+    completion order, tagged with its ``index``), then a final summary line.
+    Medications for ``patient_id`` are created in a single transaction once
+    every image is done. A batch needing more OCR runs than the queue has
+    free slots is rejected with 429, like a single upload on a full queue.
+    """
+    if len(files) > settings.MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. At most {settings.MAX_BATCH_FILES} per request"
+        )
+
+    if ocr_executor.is_full():
+        raise queue_full_exception()
+
+    if patient_id:
+        patient = await db.get(Patient, patient_id)
+        if not patient:
+            raise HTTPException(status_code=404, detail="Patient not found")
+
+    ocr_version = get_ocr_version()
+
+    # Store every file up front; the request body is gone once we stream
+    staged_files = []
+    for file in files:
+        try:
+            staged_files.append(await stage_upload(file, ocr_version, db))
+        except HTTPException as e:
+            staged_files.append({"filename": file.filename, "error": e.detail})
+
+    # Admission for the whole batch, so it cannot queue more work than a
+    # series of single uploads would be allowed to
+    needs_ocr = [staged for staged in staged_files if "error" not in staged and staged["cached"] is None]
+    if len(needs_ocr) > ocr_executor.free_slots:
+        # Stored blobs are left for blob GC, as for a single upload
+        raise queue_full_exception()
+
+    async def process(index: int, staged: dict) -> dict:
+        line = {
+            "index": index,
+            "filename": staged["filename"],
+            **image_paths(staged["filename"]),
+            "status": "failed",
+            "ocr_result": None,
+            "error": staged.get("error")
+        }
+        if line["error"]:
+            line.update(file_path=None, thumbnail_path=None, preview_path=None)
+            return line
+
+        result = staged["cached"]
+        if result is None:
+            try:
+                result = await ocr_executor.run(process_medication_image, staged["file_path"])
+                await cache_ocr_result(staged, ocr_version, result)
+            except OCRQueueFull:
+                # Slots taken by other requests since the batch was admitted
+                line["error"] = "OCR queue is full, try again shortly"
+                return line
+            except Exception as e:
+                line["error"] = str(e)
+                return line
+
+        line["status"] = "completed"
+        line["ocr_result"] = result
+        return line
+
+    async def stream_results():
+        pending_medications = []
+        tasks = [
+            asyncio.create_task(process(index, staged))
+            for index, staged in enumerate(staged_files)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                if patient_id and line["status"] == "completed":
+                    pending_medications.extend(medications_from_ocr(
+                        patient_id,
+                        OCRResult(**line["ocr_result"]),
+                        staged_files[line["index"]]["filename"]
+                    ))
+                yield json.dumps(line) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        await save_medications(pending_medications)
+        yield json.dumps({
+            "summary": True,
+            "total": len(staged_files),
+            "completed": sum(1 for task in tasks if task.result()["status"] == "completed"),
+            "medications_created": len(pending_medications)
+        }) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.get("/jobs/{job_id}", response_model=OCRJobResponse)
+async def get_ocr_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Provider = Depends(get_current_user)
 ):
-    """Create medication records from OCR results"""
+    """Get status and result of an OCR job, from any API worker"""
+    job = await ocr_executor.get(db, job_id)
+    if not job or job.provider_id != current_user.id:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    return job_to_response(job)
+
+def medications_from_ocr(
+    patient_id: int,
+    ocr_result: OCRResult,
+    image_path: str
+) -> List[Medication]:
+    """Build (unsaved) medication records from OCR results"""
+    medications = []
     for med_data in ocr_result.suggested_medications:
-        medication = Medication(
+        # Prefer the confidence of the line the medication came from
+        line_confidence = med_data.get("confidence")
+        medications.append(Medication(
             patient_id=patient_id,
             name=med_data["name"],
+            generic_name=med_data.get("generic_name"),
+            ndc_number=med_data.get("ndc_number"),
             dosage=med_data["dosage"],
             frequency=med_data["frequency"],
             source="photo",
             image_path=image_path,
-            ocr_confidence=ocr_result.confidence,
+            ocr_confidence=(
+                round(line_confidence) if line_confidence is not None
+                else ocr_result.confidence
+            ),
             notes=f"Auto-extracted from image. Raw text: {med_data['raw_text']}"
-        )
-        db.add(medication)
-    
-    db.commit()
+        ))
+    return medications
 
-@router.get("/images/{filename}")
-async def get_uploaded_image(filename: str):
-    """Serve uploaded images"""
-    file_path = os.path.join(settings.UPLOAD_DIR, filename)
-    if not os.path.exists(file_path):
+async def save_medications(medications: List[Medication]):
+    """Insert medication records in a single transaction"""
+    if not medications:
+        return
+    async with AsyncSessionLocal() as db:
+        db.add_all(medications)
+        await db.commit()
+
+async def create_medications_from_ocr(
+    patient_id: int,
+    ocr_result: OCRResult,
+    image_path: str
+):
+    """Create medication records from OCR results"""
+    await save_medications(medications_from_ocr(patient_id, ocr_result, image_path))
+
+async def upload_path(filename: str) -> str:
+    """Local path of a stored upload, or 404 for unknown or invalid keys"""
+    file_path = await blob_store.local_path(filename) if is_valid_key(filename) else None
+    if file_path is None:
         raise HTTPException(status_code=404, detail="Image not found")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(file_path)
+    return file_path
+
+@router.get("/images/{filename}")
+async def get_uploaded_image(filename: str, request: Request):
+    """Serve an uploaded image at full resolution.
+
+    Uploads are stored under their content hash, so responses are cached
+    as immutable; supports If-None-Match and byte ranges.
+    """
+    file_path = await upload_path(filename)
+    validators = immutable_file_validators(file_path, settings.IMAGE_CACHE_MAX_AGE)
+    return serve_file(request, file_path, mimetypes.guess_type(file_path)[0], validators, settings.UPLOAD_CHUNK_SIZE)
+
+@router.get("/images/{filename}/{variant}")
+async def get_image_derivative(filename: str, variant: str, request: Request):
+    """Serve an upload's ``thumb`` or ``preview`` (downscaled, EXIF-stripped)"""
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail=f"Unknown image variant. Use one of: {', '.join(VARIANTS)}")
+    await upload_path(filename)
+    paths = await ensure_derivatives(filename)
+    if paths is None:
+        raise HTTPException(status_code=404, detail="No preview available for this image")
+    file_path = paths[variant]
+    validators = immutable_file_validators(file_path, settings.IMAGE_CACHE_MAX_AGE)
+    return serve_file(request, file_path, MEDIA_TYPE, validators, settings.UPLOAD_CHUNK_SIZE)
@@ -9,14 +9,34 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "PharmD Consult API"
     VERSION: str = "1.0.0"
     DEBUG: bool = False
+    METRICS_ENABLED: bool = True  # Record request/DB/OCR timings and serve GET /metrics
+    METRICS_TOKEN: str = ""  # If set, GET /metrics needs "Authorization: Bearer <token>"
     
     # Database - Default to SQLite for simplicity in production
     DATABASE_URL: str = "sqlite:///./pharmdconsult.db"
+    DB_POOL_SIZE: int = 5  # Persistent connections per worker
+    DB_MAX_OVERFLOW: int = 10  # Extra connections allowed under burst load
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True  # Check connections before handing them out
+    
+    # SQLite pragmas, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL lets readers run alongside a writer
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL, far fewer fsyncs than FULL
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait this long on a lock before "database is locked"
+    SQLITE_CACHE_SIZE_KB: int = 20000  # Page cache per connection
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Bytes of the database file to memory-map
+    SQLITE_TEMP_STORE: str = "MEMORY"  # Keep temp tables and indices in memory
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    BCRYPT_ROUNDS: int = 12  # Password hash cost; older hashes are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 2  # Threads hashing passwords off the event loop
+    AUTH_TOKEN_CACHE_SIZE: int = 4096  # Verified tokens kept until they expire
+    AUTH_PROVIDER_CACHE_SIZE: int = 1024  # Providers kept in memory for auth
+    AUTH_PROVIDER_CACHE_TTL: int = 60  # Seconds before a cached provider is reloaded
     
     # CORS - Allow common development and production origins
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -43,10 +63,57 @@ class Settings(BaseSettings):
     # File Upload
     MAX_FILE_SIZE: int = 5 * 1024 * 1024  # 5MB
     UPLOAD_DIR: str = "uploads"
+    BLOB_STORE_BACKEND: str = "local"  # "local" disk or in-process "memory" (see services/blob_store.py)
+    BLOB_GC_GRACE_SECONDS: int = 24 * 3600  # Unreferenced uploads younger than this survive GC
+    BLOB_GC_BATCH_SIZE: int = 1000  # Blobs checked against medications per query
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/jpg", "image/png", "image/gif"]
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024  # Bytes read per chunk when streaming uploads
+    MAX_BATCH_FILES: int = 25  # Max images per /upload/images request
+    THUMBNAIL_SIZE: int = 256  # Longest edge of an upload's thumbnail, pixels
+    PREVIEW_SIZE: int = 1024  # Longest edge of an upload's medium preview, pixels
+    DERIVATIVE_FORMAT: str = "webp"  # webp or jpeg; jpeg if Pillow was built without WebP
+    DERIVATIVE_QUALITY: int = 80  # Encoder quality for thumbnails and previews
+    IMAGE_CACHE_MAX_AGE: int = 365 * 24 * 3600  # Uploads never change under a name, so cache them this long
     
     # OCR Settings
     TESSERACT_PATH: Optional[str] = None
+    OCR_WORKERS: int = 2  # Worker processes in the OCR pool
+    OCR_QUEUE_SIZE: int = 16  # Max OCR jobs admitted (running + waiting) before 429
+    OCR_RETRY_AFTER: int = 5  # Seconds suggested to clients when the queue is full
+    OCR_JOB_TTL_SECONDS: int = 3600  # How long finished job results stay pollable
+    OCR_JOB_TIMEOUT_SECONDS: int = 600  # An unfinished OCR job is failed after this (its API worker died)
+    OCR_CACHE_SIZE: int = 512  # In-memory OCR results kept in front of the DB cache
+    
+    # Formulary (CSV or SQLite with brand_name, generic_name, ndc[, strength])
+    FORMULARY_PATH: Optional[str] = None
+    FORMULARY_MIN_SCORE: float = 0.6  # Minimum trigram similarity for a fuzzy match
+
+    # Reconciliation conflict detection
+    CONFLICT_STALE_FILL_DAYS: int = 90  # Flag active meds last filled longer ago than this
+    CONFLICT_CACHE_SIZE: int = 1024  # Patients whose grouped medication lists stay in memory
+    CONFLICT_CACHE_TTL: int = 300  # Seconds before a patient's conflicts are fully rebuilt
+
+    # Medication feed imports (POST /medications/import, python -m app.services.medication_import)
+    IMPORT_BATCH_SIZE: int = 2000  # Rows written and committed per batch
+    IMPORT_MAX_ERRORS: int = 1000  # Per-row errors reported; later ones are only counted
+    IMPORT_MAX_FILE_SIZE: int = 200 * 1024 * 1024  # Largest feed accepted over HTTP
+
+    # Exports (GET /export/...)
+    EXPORT_BATCH_SIZE: int = 1000  # Rows fetched from the cursor and encoded per chunk
+
+    # Background jobs (python -m app.worker, GET /jobs/{id})
+    JOB_WORKER_PROCESSES: int = 2  # Processes started by python -m app.worker
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds an idle worker waits before looking for work again
+    JOB_RECLAIM_INTERVAL: float = 15.0  # Seconds between a worker's checks for jobs whose lease ran out
+    JOB_LEASE_SECONDS: int = 60  # A running job is reclaimed if its worker stops heartbeating this long
+    JOB_MAX_ATTEMPTS: int = 3  # Runs before a failing job is marked failed
+    JOB_RETRY_BACKOFF: float = 10.0  # Seconds before the first retry; doubles with each attempt
+    JOB_RETRY_BACKOFF_MAX: float = 3600.0  # Longest wait between retries
+    JOB_RETENTION_SECONDS: int = 7 * 24 * 3600  # Finished jobs are deleted after this
+    JOB_FILES_DIR: str = "job_files"  # Inputs handed to workers (import feeds); shared with them
+
+    # Analytics
+    ANALYTICS_CACHE_TTL: int = 30  # Seconds an /analytics response is served from memory
     
     # Production settings
     WORKERS: int = 1
@@ -1,24 +1,135 @@
-from sqlalchemy import create_engine
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .metrics import instrument_engine
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async drivers for the configured database URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """Swap a plain or sync-driver database URL onto its async driver"""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect in ASYNC_DRIVERS:
+        return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+    return url
+
+
+def get_engine_options(url: str) -> dict:
+    """Pool options for the configured dialect"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return {}
+        # aiosqlite otherwise defaults to NullPool: a new connection, thread
+        # and round of pragmas for every session
+        return {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def get_sqlite_pragmas() -> dict:
+    """Connect-time pragmas for SQLite, from settings"""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE.upper(),
+        "synchronous": settings.SQLITE_SYNCHRONOUS.upper(),
+        "busy_timeout": int(settings.SQLITE_BUSY_TIMEOUT_MS),
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -int(settings.SQLITE_CACHE_SIZE_KB),
+        "mmap_size": int(settings.SQLITE_MMAP_SIZE),
+        "temp_store": settings.SQLITE_TEMP_STORE.upper(),
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in get_sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+database_url = get_async_database_url(settings.DATABASE_URL)
+engine = create_async_engine(database_url, **get_engine_options(database_url))
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", apply_sqlite_pragmas)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+
+# expire_on_commit=False: objects stay readable after commit without an
+# implicit (and, under asyncio, impossible) lazy refresh
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
 
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """Dependency to get database session"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def create_tables():
+async def create_tables():
     """Create database tables"""
-    from app.models.models import Provider, Patient, Medication, Reconciliation
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from app.models.models import Provider, Patient, Medication, Reconciliation, OCRCacheEntry
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_columns)
+        await conn.run_sync(create_missing_indexes)
+
+
+def create_missing_columns(connection):
+    """create_all skips existing tables, so add columns declared since.
+
+    Keeps databases that were bootstrapped here (not by ``alembic upgrade
+    head``) on the same schema as the migrations; those skip columns that
+    already exist. Only nullable columns or ones with a server default can
+    be added this way.
+    """
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(
+                    f"Cannot add {table.name}.{column.name} without a default; run alembic upgrade head"
+                )
+            definition = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+            if column.name == "updated_at" and "created_at" in existing:
+                # As the row versions migration does
+                connection.execute(text(
+                    f"UPDATE {preparer.format_table(table)} SET updated_at = created_at WHERE updated_at IS NULL"
+                ))
+
+
+def create_missing_indexes(connection):
+    """create_all skips existing tables, so add indexes declared since"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
@@ -0,0 +1,18 @@
+"""Logging setup shared by the API and ``python -m app.worker``.
+
+Modules log through ``logging.getLogger(__name__)``; this only gives the
+root logger a handler, at ``LOG_LEVEL``, unless one is configured
+already (e.g. by a test runner).
+"""
+import logging
+from app.core.config import settings
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(process)d]: %(message)s"
+# Libraries that log every request at INFO
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+
+def configure_logging():
+    logging.basicConfig(level=settings.LOG_LEVEL.upper(), format=LOG_FORMAT)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
@@ -0,0 +1,297 @@
+"""In-process metrics, served in Prometheus text format at ``GET /metrics``.
+
+A small implementation of counters, gauges and fixed-bucket histograms,
+so recording a sample costs a dict lookup and a few additions. Samples
+are recorded on the event loop thread (pool work reports back to it), and
+values are per process: with several uvicorn workers, scrape each one.
+
+``MetricsMiddleware`` times every request by route template and counts
+the database statements it ran (``instrument_engine`` hooks the cursor
+events). Work done in the OCR process pool is timed per stage with
+``timed_stage`` and handed back by ``call_with_stage_timings``.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Response adds "; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            # Unlabelled series are exported from the start, as zero
+            self.labels()
+        registry.register(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+    _new_child = _Value
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}{self._label_text(values)} {_format(child.value)}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down; ``function`` reads it at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def samples(self):
+        if self.function is not None:
+            yield f"{self.name} {_format(self.function())}"
+        else:
+            yield from super().samples()
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # First bucket whose upper bound is >= value; cumulated when rendered
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.labels(*labels).observe(time.perf_counter() - started)
+
+    def samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format(bound)}"'
+                yield f"{self.name}_bucket{self._label_text(values, le)} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(values)} {_format(child.sum)}"
+            yield f"{self.name}_count{self._label_text(values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+
+# HTTP and database
+
+REQUESTS = Counter("http_requests_total", "Requests handled, by route template and status", ["method", "route", "status"])
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time to send the whole response", ["method", "route"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled")
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+REQUEST_QUERIES = Histogram("http_request_db_queries", "Database statements per request", ["route"], QUERY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time per request spent in database statements", ["route"])
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time per database statement",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+# [statements, seconds] for the request being handled, if any
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+UNMATCHED = "unmatched"
+
+
+def _route_label(scope: dict) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path_format
+    # Plain Starlette routes (docs, openapi.json) only leave their endpoint
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        for candidate in scope["app"].routes:
+            if getattr(candidate, "endpoint", None) is endpoint:
+                return candidate.path
+    return UNMATCHED
+
+
+class MetricsMiddleware:
+    """Request counts, latency, in-flight requests and per-request DB use"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        db = [0, 0.0]
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _request_db.set(db)
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            _request_db.reset(token)
+            route = _route_label(scope)
+            REQUESTS.labels(scope["method"], route, str(status)).inc()
+            REQUEST_SECONDS.labels(scope["method"], route).observe(elapsed)
+            REQUEST_QUERIES.labels(route).observe(db[0])
+            REQUEST_DB_SECONDS.labels(route).observe(db[1])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERY_SECONDS.observe(elapsed)
+    db = _request_db.get()
+    if db is not None:
+        db[0] += 1
+        db[1] += elapsed
+
+
+def instrument_engine(engine):
+    """Time every statement on ``engine`` (an async engine)"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Process pools
+
+_stage_timings: Optional[List[Tuple[str, float]]] = None
+
+
+@contextmanager
+def timed_stage(name: str):
+    """Time a step of pool work; kept only under ``call_with_stage_timings``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _stage_timings is not None:
+            _stage_timings.append((name, time.perf_counter() - started))
+
+
+def call_with_stage_timings(fn, *args):
+    """Run ``fn(*args)`` (in a pool process); return its result and the
+    (stage, seconds) pairs it recorded, for the parent to observe"""
+    global _stage_timings
+    _stage_timings = []
+    try:
+        return fn(*args), _stage_timings
+    finally:
+        _stage_timings = None
@@ -1,15 +1,21 @@
-from fastapi import FastAPI
+import logging
+import secrets
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
-from app.api.endpoints import auth, patients, medications, reconciliations, upload
-import os
+from app.core.logs import configure_logging
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.utils.serialization import ORJSONResponse
+from app.api.endpoints import auth, patients, medications, reconciliations, upload, analytics, export, jobs
+
+logger = logging.getLogger(__name__)
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -19,13 +25,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors, totals and cache validators travel in headers
+    expose_headers=["Link", "X-Next-Cursor", "X-Prev-Cursor", "X-Total-Count", "X-Total-Count-Estimated", "ETag", "Last-Modified"],
 )
 
-# Create uploads directory if it doesn't exist
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# Outermost, so latency includes CORS handling
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # Include API routers
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["authentication"])
@@ -33,6 +39,9 @@ app.include_router(patients.router, prefix=f"{settings.API_V1_STR}/patients", ta
 app.include_router(medications.router, prefix=f"{settings.API_V1_STR}/medications", tags=["medications"])
 app.include_router(reconciliations.router, prefix=f"{settings.API_V1_STR}/reconciliations", tags=["reconciliations"])
 app.include_router(upload.router, prefix=f"{settings.API_V1_STR}/upload", tags=["file-upload"])
+app.include_router(analytics.router, prefix=f"{settings.API_V1_STR}/analytics", tags=["analytics"])
+app.include_router(export.router, prefix=f"{settings.API_V1_STR}/export", tags=["export"])
+app.include_router(jobs.router, prefix=f"{settings.API_V1_STR}/jobs", tags=["jobs"])
 
 @app.get("/")
 async def root():
@@ -49,13 +58,40 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "pharmd-consult-api"}
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(request: Request):
+        """Prometheus metrics for this process; needs METRICS_TOKEN if one is set"""
+        if settings.METRICS_TOKEN:
+            expected = f"Bearer {settings.METRICS_TOKEN}"
+            if not secrets.compare_digest(request.headers.get("authorization", ""), expected):
+                return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
 # Initialize database tables on startup
-from app.core.database import create_tables
+from app.core.database import AsyncSessionLocal, create_tables, engine
+from app.core.security import password_hasher
+from app.services.ocr_executor import ocr_executor
+from app.services.formulary import get_formulary
+from app.services.analytics import ensure_rollups
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
-    create_tables()
-    print(f"🚀 {settings.PROJECT_NAME} v{settings.VERSION} started!")
-    print(f"📖 API Documentation: http://localhost:8000/docs")
-    print(f"🔧 Health Check: http://localhost:8000/health")
+    # Here rather than at import, so importing the app (tests, benchmarks,
+    # CLIs) leaves their logging alone
+    configure_logging()
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        await ensure_rollups(db)
+    # Load before the OCR pool forks so workers share the index pages
+    get_formulary()
+    logger.info("%s v%s started; API docs at /docs, health check at /health", settings.PROJECT_NAME, settings.VERSION)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release background resources on shutdown"""
+    ocr_executor.shutdown()
+    password_hasher.shutdown()
+    await engine.dispose()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Text, ForeignKey, JSON, Index, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -32,10 +32,24 @@ class Patient(Base):
     email = Column(String(100), nullable=True)
     mrn = Column(String(50), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Bumped by every UPDATE, bulk ones included; ETags are built from these
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1", onupdate=literal_column("version + 1"))
     
     # Relationships
     medications = relationship("Medication", back_populates="patient")
     reconciliations = relationship("Reconciliation", back_populates="patient")
+    
+    __table_args__ = (
+        # Keyset pagination order
+        Index("ix_patients_created_at_id", "created_at", "id"),
+        # Case-insensitive prefix search (see services/patient_search.py)
+        Index("ix_patients_last_first_lower", func.lower(last_name), func.lower(first_name)),
+        Index("ix_patients_first_last_lower", func.lower(first_name), func.lower(last_name)),
+        Index("ix_patients_email_lower", func.lower(email)),
+        Index("ix_patients_dob_last_lower", date_of_birth, func.lower(last_name)),
+        Index("ix_patients_dob_first_lower", date_of_birth, func.lower(first_name)),
+    )
 
 class Medication(Base):
     """Medication model"""
@@ -52,12 +66,26 @@ class Medication(Base):
     last_filled = Column(Date, nullable=True)
     is_active = Column(Boolean, default=True)
     notes = Column(Text, nullable=True)
-    image_path = Column(String(500), nullable=True)
+    image_path = Column(String(500), nullable=True)  # Upload blob key
     ocr_confidence = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1", onupdate=literal_column("version + 1"))
     
     # Relationships
     patient = relationship("Patient", back_populates="medications")
+    
+    __table_args__ = (
+        # Keyset pagination order, overall and per patient
+        Index("ix_medications_created_at_id", "created_at", "id"),
+        Index("ix_medications_patient_created_at_id", "patient_id", "created_at", "id"),
+        # A patient's active list (reconciliation detail and counts)
+        Index("ix_medications_patient_active", "patient_id", "is_active"),
+        # Feed import upsert key (see services/medication_import.py)
+        Index("ix_medications_patient_ndc_filled", "patient_id", "ndc_number", "last_filled"),
+        # Blob garbage collection reference checks (see services/blob_store.py)
+        Index("ix_medications_image_path", "image_path"),
+    )
 
 class Reconciliation(Base):
     """Medication reconciliation session"""
@@ -73,7 +101,74 @@ class Reconciliation(Base):
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1", onupdate=literal_column("version + 1"))
     
     # Relationships
     patient = relationship("Patient", back_populates="reconciliations")
     provider = relationship("Provider", back_populates="reconciliations")
+    
+    __table_args__ = (
+        # Keyset pagination order, overall, per patient and per status
+        Index("ix_reconciliations_created_at_id", "created_at", "id"),
+        Index("ix_reconciliations_patient_created_at_id", "patient_id", "created_at", "id"),
+        Index("ix_reconciliations_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_reconciliations_provider_id", "provider_id"),
+    )
+
+class OCRCacheEntry(Base):
+    """Cached OCR result for an uploaded image, keyed by content hash"""
+    __tablename__ = "ocr_cache"
+    
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the image bytes
+    ocr_version = Column(String(50), primary_key=True)  # Engine + pipeline version
+    filename = Column(String(255), nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AnalyticsRollup(Base):
+    """Running count (and sum) per metric, UTC day and dimension value.
+
+    Maintained incrementally on writes by app/services/analytics.py so
+    dashboards aggregate a few rows per day instead of the base tables.
+    """
+    __tablename__ = "analytics_rollups"
+    
+    # Key order lets totals per dimension (GROUP BY metric, dimension) walk the primary key
+    metric = Column(String(50), primary_key=True)  # e.g. 'reconciliation_status'
+    dimension = Column(String(100), primary_key=True)  # status, source, provider id; '' if none
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)  # Sum of the metric's value column
+
+class Job(Base):
+    """Durable background job, run by ``python -m app.worker`` processes.
+
+    See app/services/jobs.py for the lifecycle: queued -> running ->
+    succeeded or failed, with failed runs requeued after a backoff. OCR
+    jobs (kind 'ocr') are recorded here too but run in the API's OCR pool.
+    """
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)  # Registered task name
+    payload = Column(JSON, nullable=False)  # Keyword arguments for the task
+    status = Column(String(20), nullable=False, default="queued")  # 'queued', 'running', 'succeeded', 'failed'
+    priority = Column(Integer, nullable=False, default=0)  # Higher runs first
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False)  # Not claimed before this (retry backoff)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)  # Reclaimed after this unless heartbeated
+    worker_id = Column(String(100), nullable=True)
+    progress = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    provider_id = Column(Integer, ForeignKey("providers.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        # Claim order within the queued jobs; also finds running and finished ones by status
+        Index("ix_jobs_status_priority_run_at", status, priority.desc(), run_at),
+    )
@@ -0,0 +1,336 @@
+"""Incrementally maintained analytics rollups.
+
+Each ``Rollup`` keeps a running row count (and optionally the sum of one
+column) per UTC day of ``created_at`` and per value of a dimension
+column. ORM inserts, updates and deletes add their deltas to
+``analytics_rollups`` inside the same transaction, so the rollups commit
+or roll back with the rows they describe. Writes that bypass the ORM
+must call ``apply_deltas`` themselves, or run a rebuild:
+
+    python -m app.services.analytics rebuild
+"""
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import String, cast, delete, event, func, inspect, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from app.core.config import settings
+from app.models.models import AnalyticsRollup, Medication, Patient, Reconciliation
+
+
+@dataclass
+class Rollup:
+    metric: str
+    model: type
+    dimension: Optional[str] = None  # Column grouped by; '' when None
+    total: Optional[str] = None  # Column summed into ``total``
+    required: Optional[str] = None  # Rows where this column is NULL are left out
+
+    def key(self, row) -> Optional[Tuple[str, int]]:
+        """(dimension value, total) a row contributes, or None"""
+        if self.required and getattr(row, self.required, None) is None:
+            return None
+        dimension = getattr(row, self.dimension, None) if self.dimension else ""
+        total = getattr(row, self.total, None) if self.total else 0
+        return ("" if dimension is None else str(dimension)), int(total or 0)
+
+
+ROLLUPS = [
+    Rollup("patients", Patient),
+    Rollup("medication_source", Medication, dimension="source"),
+    Rollup("ocr", Medication, total="ocr_confidence", required="ocr_confidence"),
+    Rollup("reconciliation_status", Reconciliation, dimension="status", total="conflicts_found"),
+    Rollup("reconciliation_provider", Reconciliation, dimension="provider_id"),
+]
+ROLLUPS_BY_MODEL: Dict[type, List[Rollup]] = {}
+# Columns the rollups of each model read: created_at plus what they group,
+# sum or filter on
+ROLLUP_COLUMNS: Dict[type, List[str]] = {}
+for _rollup in ROLLUPS:
+    ROLLUPS_BY_MODEL.setdefault(_rollup.model, []).append(_rollup)
+    _columns = ROLLUP_COLUMNS.setdefault(_rollup.model, ["created_at"])
+    for _column in (_rollup.dimension, _rollup.total, _rollup.required):
+        if _column and _column not in _columns:
+            _columns.append(_column)
+
+# (metric, day, dimension) -> [count delta, total delta]
+Deltas = Dict[Tuple[str, date, str], List[int]]
+
+
+def add_row(deltas: Deltas, model: type, row, day: date, sign: int = 1):
+    """Record ``row`` entering (sign=1) or leaving (sign=-1) the rollups"""
+    for rollup in ROLLUPS_BY_MODEL.get(model, ()):
+        key = rollup.key(row)
+        if key is None:
+            continue
+        entry = deltas.setdefault((rollup.metric, day, key[0]), [0, 0])
+        entry[0] += sign
+        entry[1] += sign * key[1]
+
+
+def _upsert(dialect: str):
+    if dialect == "sqlite":
+        return sqlite_insert
+    if dialect == "postgresql":
+        return postgresql_insert
+    return None
+
+
+def apply_deltas(connection, deltas: Deltas):
+    """Add ``deltas`` to the rollup table on a sync connection"""
+    table = AnalyticsRollup.__table__
+    insert = _upsert(connection.dialect.name)
+    for (metric, day, dimension), (count, total) in deltas.items():
+        if not count and not total:
+            continue
+        if insert is not None:
+            statement = insert(table).values(metric=metric, day=day, dimension=dimension, count=count, total=total)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=["metric", "dimension", "day"],
+                set_={"count": table.c.count + count, "total": table.c.total + total}
+            ))
+            continue
+        result = connection.execute(
+            update(table)
+            .where(table.c.metric == metric, table.c.day == day, table.c.dimension == dimension)
+            .values(count=table.c.count + count, total=table.c.total + total)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(metric=metric, day=day, dimension=dimension, count=count, total=total))
+
+
+def _loaded_values(mapper, target) -> dict:
+    loaded = inspect(target).dict
+    return {attr.key: loaded[attr.key] for attr in mapper.column_attrs if attr.key in loaded}
+
+
+def _rollup_changed(mapper, target) -> bool:
+    state = inspect(target)
+    return any(state.attrs[key].history.has_changes() for key in ROLLUP_COLUMNS[mapper.class_])
+
+
+def _previous_row(connection, mapper, target) -> SimpleNamespace:
+    """The rollup columns of the row as they were before this flush.
+
+    Columns not loaded on the instance are read from the database. On
+    update that read runs after the UPDATE statement, which only set the
+    columns that were changed (and loaded), so the stored value is still
+    the old one. Only the rollup columns are read: server-side onupdate
+    columns such as ``version`` are expired by the UPDATE, and reading
+    them here would cost an extra SELECT and return the new values.
+    """
+    state = inspect(target)
+    values, missing = {}, []
+    for key in ROLLUP_COLUMNS[mapper.class_]:
+        history = state.attrs[key].history
+        if history.deleted:
+            values[key] = history.deleted[0]
+        elif key in state.dict:
+            values[key] = state.dict[key]
+        else:
+            missing.append(key)
+    if missing:
+        columns = [mapper.columns[key] for key in missing]
+        row = connection.execute(select(*columns).where(mapper.class_.id == target.id)).first()
+        for key, column in zip(missing, columns):
+            values[key] = getattr(row, column.name) if row is not None else None
+    return SimpleNamespace(**values)
+
+
+def _day(row) -> date:
+    created_at = getattr(row, "created_at", None)
+    if isinstance(created_at, datetime):
+        return created_at.date()
+    # Just inserted: created_at is a server default that was not read back
+    return datetime.utcnow().date()
+
+
+def _session_deltas(target) -> Optional[Deltas]:
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault("analytics_deltas", {})
+
+
+def _on_insert(mapper, connection, target):
+    deltas = _session_deltas(target)
+    if deltas is not None:
+        row = SimpleNamespace(**_loaded_values(mapper, target))
+        add_row(deltas, mapper.class_, row, _day(row))
+
+
+def _on_update(mapper, connection, target):
+    deltas = _session_deltas(target)
+    if deltas is None or not _rollup_changed(mapper, target):
+        return
+    old = _previous_row(connection, mapper, target)
+    new = SimpleNamespace(**{**vars(old), **_loaded_values(mapper, target)})
+    add_row(deltas, mapper.class_, old, _day(old), -1)
+    add_row(deltas, mapper.class_, new, _day(old))
+
+
+def _on_delete(mapper, connection, target):
+    deltas = _session_deltas(target)
+    if deltas is not None:
+        old = _previous_row(connection, mapper, target)
+        add_row(deltas, mapper.class_, old, _day(old), -1)
+
+
+for _model in ROLLUPS_BY_MODEL:
+    event.listen(_model, "after_insert", _on_insert)
+    event.listen(_model, "after_update", _on_update)
+    # Before, so the row (and its created_at) can still be read
+    event.listen(_model, "before_delete", _on_delete)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_session_deltas(session, flush_context):
+    deltas = session.info.pop("analytics_deltas", None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_session_deltas(session):
+    session.info.pop("analytics_deltas", None)
+
+
+async def rebuild_rollups(db: AsyncSession):
+    """Recompute every rollup from the base tables"""
+    await db.execute(delete(AnalyticsRollup))
+    for rollup in ROLLUPS:
+        model = rollup.model
+        day = func.date(model.created_at)
+        group = [day]
+        dimension = literal("")
+        if rollup.dimension:
+            dimension = cast(getattr(model, rollup.dimension), String)
+            group.append(dimension)
+        total = func.coalesce(func.sum(getattr(model, rollup.total)), 0) if rollup.total else literal(0)
+        query = select(day.label("day"), dimension.label("dimension"), func.count().label("count"), total.label("total"))
+        if rollup.required:
+            query = query.where(getattr(model, rollup.required).isnot(None))
+        result = await db.execute(query.group_by(*group))
+        rows = [
+            {
+                "metric": rollup.metric,
+                # SQLite's date() returns text
+                "day": row.day if isinstance(row.day, date) else date.fromisoformat(row.day),
+                "dimension": row.dimension or "",
+                "count": row.count,
+                "total": int(row.total),
+            }
+            for row in result.all()
+        ]
+        if rows:
+            await db.execute(AnalyticsRollup.__table__.insert(), rows)
+    await db.commit()
+
+
+async def ensure_rollups(db: AsyncSession):
+    """Build the rollups if the table is empty but there is data to roll up"""
+    if await db.scalar(select(AnalyticsRollup.metric).limit(1)) is not None:
+        return
+    for model in ROLLUPS_BY_MODEL:
+        if await db.scalar(select(model.id).limit(1)) is not None:
+            await rebuild_rollups(db)
+            return
+
+
+def start_day(days: Optional[int]) -> Optional[date]:
+    """First UTC day of a ``days``-long window ending today (None: all time)"""
+    if not days:
+        return None
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+async def rollup_totals(db: AsyncSession, metrics: List[str], since: Optional[date] = None) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    """metric -> dimension -> (count, total), summed over days"""
+    query = (
+        select(AnalyticsRollup.metric, AnalyticsRollup.dimension,
+               func.sum(AnalyticsRollup.count), func.sum(AnalyticsRollup.total))
+        .where(AnalyticsRollup.metric.in_(metrics))
+        .group_by(AnalyticsRollup.metric, AnalyticsRollup.dimension)
+    )
+    if since:
+        query = query.where(AnalyticsRollup.day >= since)
+    totals: Dict[str, Dict[str, Tuple[int, int]]] = {metric: {} for metric in metrics}
+    for metric, dimension, count, total in (await db.execute(query)).all():
+        if count:
+            totals[metric][dimension] = (int(count), int(total or 0))
+    return totals
+
+
+async def rollup_daily(db: AsyncSession, metrics: List[str], since: Optional[date] = None) -> Dict[str, List[Tuple[date, str, int, int]]]:
+    """metric -> [(day, dimension, count, total)] in day order"""
+    query = (
+        select(AnalyticsRollup.metric, AnalyticsRollup.day, AnalyticsRollup.dimension,
+               AnalyticsRollup.count, AnalyticsRollup.total)
+        .where(AnalyticsRollup.metric.in_(metrics), AnalyticsRollup.count != 0)
+        .order_by(AnalyticsRollup.metric, AnalyticsRollup.dimension, AnalyticsRollup.day)
+    )
+    if since:
+        query = query.where(AnalyticsRollup.day >= since)
+    daily: Dict[str, List[Tuple[date, str, int, int]]] = {metric: [] for metric in metrics}
+    for metric, day, dimension, count, total in (await db.execute(query)).all():
+        daily[metric].append((day, dimension, count, total))
+    # Read in primary key order; a handful of rows per day to re-sort
+    for rows in daily.values():
+        rows.sort(key=lambda row: (row[0], row[1]))
+    return daily
+
+
+class AnalyticsCache:
+    """Short-lived cache of computed analytics responses, keyed by query"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[tuple, tuple] = {}
+
+    def get(self, key: tuple):
+        cached = self._entries.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        self._entries.pop(key, None)
+        return None
+
+    def set(self, key: tuple, value):
+        now = time.monotonic()
+        # Drop expired entries so the map stays as small as the live key set
+        for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[stale]
+        self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+
+analytics_cache = AnalyticsCache(ttl=settings.ANALYTICS_CACHE_TTL)
+
+
+async def _rebuild():
+    from app.core.database import AsyncSessionLocal, engine
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
+    await engine.dispose()
+
+
+def main() -> int:
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python -m app.services.analytics rebuild")
+        return 2
+    asyncio.run(_rebuild())
+    print("Analytics rollups rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
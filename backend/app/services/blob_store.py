@@ -0,0 +1,367 @@
+"""Content-addressed blob storage for uploads.
+
+Blobs are keyed by the SHA-256 of their content plus an extension, so
+identical uploads are stored once, and ``Medication.image_path`` holds
+the key rather than a filesystem path. ``BlobStore`` is the backend
+interface; ``LocalBlobStore`` keeps blobs on disk in two levels of
+hash-prefix directories (``ab/cd/abcd....jpg``) and writes them by
+renaming a fully written temporary file into place. ``MemoryBlobStore``
+keeps them in process memory, standing in for a remote object store in
+tests and local runs (``BLOB_STORE_BACKEND=memory``).
+
+Blobs no longer referenced by any medication are reclaimed by the
+garbage collector; legacy flat uploads are moved into shards by
+``migrate``:
+
+    python -m app.services.blob_store gc [--dry-run]
+    python -m app.services.blob_store migrate
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+import aiofiles.os
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.models import Medication
+
+# Hash (or hash-derived) name with an extension; never a path
+KEY_PATTERN = re.compile(r"^[0-9a-f]{4}[0-9A-Za-z_-]*(\.[0-9A-Za-z]+)*$")
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(KEY_PATTERN.match(key))
+
+
+@dataclass
+class BlobInfo:
+    key: str
+    size: int
+    modified: float  # Unix time of the last write
+
+
+class BlobStore(ABC):
+    """Where uploads live. Keys come from ``is_valid_key``-checked names.
+
+    ``staging_dir`` is local scratch space for uploads being written; a
+    remote backend would upload from it in ``put_file``. It is created on
+    first use, not when the store is built at import time.
+    """
+    staging_path: str
+    _staging_ready = False
+
+    @property
+    def staging_dir(self) -> str:
+        if not self._staging_ready:
+            os.makedirs(self.staging_path, exist_ok=True)
+            self._staging_ready = True
+        return self.staging_path
+
+    @abstractmethod
+    async def put_file(self, source_path: str, key: str) -> bool:
+        """Store a fully written local file under ``key``, consuming it.
+
+        Returns False if the key was already stored (the content is the
+        same, so the new copy is dropped); the stored blob then counts as
+        freshly written, so the garbage collector's grace period restarts.
+        Of several concurrent puts of one key, exactly one returns True.
+        """
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """The blob's content, or None if missing"""
+
+    @abstractmethod
+    async def local_path(self, key: str) -> Optional[str]:
+        """A readable local file with the blob's content, or None if missing"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def iter_blobs(self) -> AsyncIterator[BlobInfo]:
+        """Every stored blob, in no particular order"""
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+        self.staging_path = os.path.join(root, ".staging")
+
+    def path(self, key: str) -> str:
+        if not is_valid_key(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    async def put_file(self, source_path: str, key: str) -> bool:
+        path = self.path(key)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            # Same filesystem as the staging dir; unlike a rename, the link
+            # fails if another put got there first
+            await aiofiles.os.link(source_path, path)
+        except FileExistsError:
+            await asyncio.to_thread(os.utime, path)
+            return False
+        finally:
+            await aiofiles.os.remove(source_path)
+        return True
+
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        try:
+            stat = await aiofiles.os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return BlobInfo(key, stat.st_size, stat.st_mtime)
+
+    async def exists(self, key: str) -> bool:
+        return is_valid_key(key) and await aiofiles.os.path.isfile(self.path(key))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if not is_valid_key(key):
+            return None
+        try:
+            async with aiofiles.open(self.path(key), "rb") as stored:
+                return await stored.read()
+        except FileNotFoundError:
+            return None
+
+    async def local_path(self, key: str) -> Optional[str]:
+        return self.path(key) if await self.exists(key) else None
+
+    async def delete(self, key: str) -> bool:
+        try:
+            await aiofiles.os.remove(self.path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _scan_shard(self, shard: str) -> List[BlobInfo]:
+        blobs = []
+        for second in os.scandir(shard):
+            if not second.is_dir():
+                continue
+            for entry in os.scandir(second.path):
+                if entry.is_file() and is_valid_key(entry.name):
+                    stat = entry.stat()
+                    blobs.append(BlobInfo(entry.name, stat.st_size, stat.st_mtime))
+        return blobs
+
+    async def iter_blobs(self) -> AsyncIterator[BlobInfo]:
+        if not await aiofiles.os.path.isdir(self.root):
+            return
+        # One first-level shard (1/256 of the store) in memory at a time
+        shards = await asyncio.to_thread(
+            lambda: sorted(entry.path for entry in os.scandir(self.root) if entry.is_dir() and len(entry.name) == 2)
+        )
+        for shard in shards:
+            for blob in await asyncio.to_thread(self._scan_shard, shard):
+                yield blob
+
+
+class MemoryBlobStore(BlobStore):
+    """Blobs in a dict, behaving like a remote object store.
+
+    Only staging files and the copies handed out by ``local_path`` touch
+    ``root``, as downloads to a local cache would. Contents are per
+    process and lost on exit.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.staging_path = os.path.join(root, ".staging")
+        self._blobs: Dict[str, bytes] = {}
+        self._modified: Dict[str, float] = {}
+
+    def _check(self, key: str):
+        if not is_valid_key(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+
+    async def put_file(self, source_path: str, key: str) -> bool:
+        self._check(key)
+        async with aiofiles.open(source_path, "rb") as source:
+            content = await source.read()
+        await aiofiles.os.remove(source_path)
+        # No await between the check and the store
+        created = key not in self._blobs
+        if created:
+            self._blobs[key] = content
+        self._modified[key] = time.time()
+        return created
+
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        self._check(key)
+        if key not in self._blobs:
+            return None
+        return BlobInfo(key, len(self._blobs[key]), self._modified[key])
+
+    async def exists(self, key: str) -> bool:
+        return key in self._blobs
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._blobs.get(key)
+
+    async def local_path(self, key: str) -> Optional[str]:
+        content = self._blobs.get(key)
+        if content is None:
+            return None
+        path = os.path.join(self.root, ".cache", key)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        async with aiofiles.open(path, "wb") as cached:
+            await cached.write(content)
+        return path
+
+    async def delete(self, key: str) -> bool:
+        self._check(key)
+        self._modified.pop(key, None)
+        return self._blobs.pop(key, None) is not None
+
+    async def iter_blobs(self) -> AsyncIterator[BlobInfo]:
+        for key, content in list(self._blobs.items()):
+            yield BlobInfo(key, len(content), self._modified[key])
+
+
+BACKENDS = {"local": LocalBlobStore, "memory": MemoryBlobStore}
+
+
+def create_store(root: str) -> BlobStore:
+    """A store of the configured backend; nothing is created on disk yet"""
+    try:
+        backend = BACKENDS[settings.BLOB_STORE_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown BLOB_STORE_BACKEND {settings.BLOB_STORE_BACKEND!r}; available: {sorted(BACKENDS)}")
+    return backend(root)
+
+
+# Originals, and the thumbnails/previews rendered from them
+blob_store = create_store(os.path.join(settings.UPLOAD_DIR, "blobs"))
+derivative_store = create_store(os.path.join(settings.UPLOAD_DIR, "derivatives"))
+
+
+@dataclass
+class GCResult:
+    scanned: int = 0
+    referenced: int = 0
+    recent: int = 0
+    deleted: int = 0
+    bytes_freed: int = 0
+
+
+async def _referenced(db: AsyncSession, keys: List[str]) -> set:
+    result = await db.execute(select(Medication.image_path).where(Medication.image_path.in_(keys)).distinct())
+    return set(result.scalars().all())
+
+
+async def collect_garbage(
+    db: AsyncSession,
+    grace_seconds: int = settings.BLOB_GC_GRACE_SECONDS,
+    dry_run: bool = False,
+) -> GCResult:
+    """Delete blobs no medication references, and their derivatives.
+
+    Streams the store a batch at a time and checks each batch against
+    ``medications.image_path`` with one indexed lookup, so memory stays
+    bounded however many blobs or medications there are. Blobs written
+    in the last ``grace_seconds`` are kept: an upload is stored before
+    the medications that reference it are created.
+    """
+    # Imported here: image_derivatives builds on this module
+    from app.services.image_derivatives import delete_upload
+
+    result = GCResult()
+    cutoff = time.time() - grace_seconds
+    batch: List[BlobInfo] = []
+
+    async def sweep():
+        referenced = await _referenced(db, [blob.key for blob in batch])
+        for blob in batch:
+            if blob.key in referenced:
+                result.referenced += 1
+            elif blob.modified > cutoff:
+                result.recent += 1
+            elif not dry_run and (current := await blob_store.stat(blob.key)) and current.modified > cutoff:
+                # Uploaded again since the listing
+                result.recent += 1
+            else:
+                result.deleted += 1
+                result.bytes_freed += blob.size
+                if not dry_run:
+                    await delete_upload(blob.key)
+        batch.clear()
+
+    async for blob in blob_store.iter_blobs():
+        result.scanned += 1
+        batch.append(blob)
+        if len(batch) >= settings.BLOB_GC_BATCH_SIZE:
+            await sweep()
+    if batch:
+        await sweep()
+    return result
+
+
+def migrate_flat_uploads(upload_dir: str = settings.UPLOAD_DIR) -> Dict[str, int]:
+    """Move uploads stored flat in ``upload_dir`` (and their derivatives)
+    into the sharded local stores"""
+    moved = {"blobs": 0, "derivatives": 0}
+    for store, directory, label in [
+        (blob_store, upload_dir, "blobs"),
+        (derivative_store, os.path.join(upload_dir, "derivatives"), "derivatives"),
+    ]:
+        if not isinstance(store, LocalBlobStore) or not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if entry.is_file() and is_valid_key(entry.name):
+                target = store.path(entry.name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(entry.path, target)
+                moved[label] += 1
+    return moved
+
+
+async def _gc(dry_run: bool) -> GCResult:
+    from app.core.database import AsyncSessionLocal, engine
+    async with AsyncSessionLocal() as db:
+        result = await collect_garbage(db, dry_run=dry_run)
+    await engine.dispose()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Manage the upload blob store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gc = commands.add_parser("gc", help="Delete blobs no medication references")
+    gc.add_argument("--dry-run", action="store_true", help="Report what would be deleted")
+    commands.add_parser("migrate", help="Move flat uploads into sharded directories")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        moved = migrate_flat_uploads()
+        print(f"Moved {moved['blobs']:,} uploads and {moved['derivatives']:,} derivatives")
+        return 0
+    result = asyncio.run(_gc(args.dry_run))
+    verb = "Would delete" if args.dry_run else "Deleted"
+    print(
+        f"Scanned {result.scanned:,} blobs: {result.referenced:,} referenced, "
+        f"{result.recent:,} within the grace period. {verb} {result.deleted:,} "
+        f"({result.bytes_freed / 1024 / 1024:,.1f} MB)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
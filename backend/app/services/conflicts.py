@@ -0,0 +1,270 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from app.core.config import settings
+from app.models.models import Medication
+from app.services.formulary import get_formulary, normalize_name
+from app.services.sig_parser import parse_sig
+
+# Columns the engine needs; callers that already selected these can pass
+# rows straight to ``ConflictEngine.rebuild``
+FACT_COLUMNS = [
+    Medication.id, Medication.patient_id, Medication.name, Medication.generic_name,
+    Medication.ndc_number, Medication.dosage, Medication.frequency,
+    Medication.source, Medication.last_filled, Medication.is_active,
+]
+
+
+@dataclass
+class MedicationFacts:
+    """The fields of a medication that conflict detection looks at"""
+    id: int
+    name: str
+    generic_name: Optional[str] = None
+    ndc_number: Optional[str] = None
+    dosage: Optional[str] = None
+    frequency: Optional[str] = None
+    source: str = "manual"
+    last_filled: Optional[date] = None
+    is_active: bool = True
+
+    @classmethod
+    def from_row(cls, row) -> "MedicationFacts":
+        return cls(
+            id=row.id, name=row.name, generic_name=row.generic_name,
+            ndc_number=row.ndc_number, dosage=row.dosage, frequency=row.frequency,
+            source=row.source, last_filled=row.last_filled,
+            is_active=row.is_active is not False,
+        )
+
+
+@dataclass
+class Conflict:
+    type: str  # duplicate, dose_discrepancy, frequency_discrepancy, stale_fill
+    drug: str
+    medication_ids: List[int]
+    sources: List[str]
+    detail: str
+
+    def to_dict(self) -> dict:
+        return {
+            "type": self.type,
+            "drug": self.drug,
+            "medication_ids": self.medication_ids,
+            "sources": self.sources,
+            "detail": self.detail,
+        }
+
+
+def drug_identity(med: MedicationFacts) -> str:
+    """Normalized key that brand, generic and OCR'd spellings of a drug share"""
+    if med.generic_name:
+        return normalize_name(med.generic_name)
+    match = get_formulary().resolve(med.name)
+    if match and match.generic_name:
+        return normalize_name(match.generic_name)
+    return normalize_name(med.name)
+
+
+def normalized_dose(med: MedicationFacts) -> Optional[str]:
+    if not med.dosage:
+        return None
+    sig = parse_sig(med.dosage)
+    if sig.dose_value is not None:
+        return f"{sig.dose_value:g} {sig.dose_unit}"
+    return " ".join(med.dosage.lower().split())
+
+
+def normalized_frequency(med: MedicationFacts) -> Optional[str]:
+    if not med.frequency:
+        return None
+    return parse_sig(med.frequency).frequency or " ".join(med.frequency.lower().split())
+
+
+def group_conflicts(drug: str, meds: List[MedicationFacts]) -> List[Conflict]:
+    """Conflicts among active entries that share one drug identity"""
+    if len(meds) < 2:
+        return []
+    meds = sorted(meds, key=lambda m: m.id)
+    ids = [m.id for m in meds]
+    sources = sorted({m.source for m in meds})
+    label = meds[0].generic_name or meds[0].name
+
+    conflicts = []
+    doses = {d for d in map(normalized_dose, meds) if d}
+    frequencies = {f for f in map(normalized_frequency, meds) if f}
+    if len(doses) > 1:
+        conflicts.append(Conflict("dose_discrepancy", label, ids, sources, f"Doses differ: {', '.join(sorted(doses))}"))
+    if len(frequencies) > 1:
+        conflicts.append(Conflict(
+            "frequency_discrepancy", label, ids, sources, f"Frequencies differ: {', '.join(sorted(frequencies))}"
+        ))
+    if not conflicts:
+        conflicts.append(Conflict("duplicate", label, ids, sources, f"Listed {len(meds)} times"))
+    return conflicts
+
+
+def stale_conflict(med: MedicationFacts, today: date) -> Optional[Conflict]:
+    if not med.last_filled:
+        return None
+    age = (today - med.last_filled).days
+    if age <= settings.CONFLICT_STALE_FILL_DAYS:
+        return None
+    return Conflict("stale_fill", med.generic_name or med.name, [med.id], [med.source], f"Last filled {age} days ago")
+
+
+@dataclass
+class PatientConflicts:
+    """Grouped active medications and their conflicts for one patient"""
+    meds: Dict[int, MedicationFacts] = field(default_factory=dict)
+    identity: Dict[int, str] = field(default_factory=dict)
+    groups: Dict[str, Set[int]] = field(default_factory=dict)
+    by_group: Dict[str, List[Conflict]] = field(default_factory=dict)
+    stale: Dict[int, Conflict] = field(default_factory=dict)
+    expires_at: float = 0.0
+
+    def apply(self, med_id: int, med: Optional[MedicationFacts], today: date):
+        """Add, replace or (``med=None``) remove one medication.
+
+        Only the drug groups the medication leaves and joins are
+        re-evaluated, so an edit costs O(group size), not O(list size).
+        """
+        touched = set()
+        old_key = self.identity.pop(med_id, None)
+        if old_key is not None:
+            self.groups[old_key].discard(med_id)
+            touched.add(old_key)
+        self.meds.pop(med_id, None)
+        self.stale.pop(med_id, None)
+
+        if med is not None and med.is_active:
+            key = drug_identity(med)
+            self.meds[med_id] = med
+            self.identity[med_id] = key
+            self.groups.setdefault(key, set()).add(med_id)
+            touched.add(key)
+            stale = stale_conflict(med, today)
+            if stale:
+                self.stale[med_id] = stale
+
+        for key in touched:
+            members = [self.meds[i] for i in self.groups.get(key, ())]
+            if members:
+                self.by_group[key] = group_conflicts(key, members)
+            else:
+                self.groups.pop(key, None)
+                self.by_group.pop(key, None)
+
+    def conflicts(self) -> List[Conflict]:
+        found = [c for group in self.by_group.values() for c in group]
+        found.extend(self.stale.values())
+        found.sort(key=lambda c: (c.type, c.drug.lower(), c.medication_ids))
+        return found
+
+
+class ConflictEngine:
+    """Detects conflicts in each patient's medication list, incrementally.
+
+    A full build groups a patient's active medications by drug identity
+    in one pass. After that, medication inserts, updates and deletes
+    committed in this process mark just those rows dirty; the next read
+    reloads only the dirty rows and re-evaluates only the groups they
+    touch. Patient states are kept in a bounded LRU and rebuilt after
+    ``ttl`` seconds, which bounds staleness from other workers.
+    """
+
+    def __init__(self, max_patients: int, ttl: float):
+        self.max_patients = max_patients
+        self.ttl = ttl
+        self._patients: OrderedDict = OrderedDict()
+        self._dirty: Dict[int, Set[int]] = {}
+
+    def rebuild(self, patient_id: int, medications: Iterable) -> List[Conflict]:
+        """Build a patient's state from all their medications (rows or facts)"""
+        state = PatientConflicts(expires_at=time.monotonic() + self.ttl)
+        today = date.today()
+        for med in medications:
+            facts = med if isinstance(med, MedicationFacts) else MedicationFacts.from_row(med)
+            state.apply(facts.id, facts, today)
+        self._dirty.pop(patient_id, None)
+        self._patients[patient_id] = state
+        self._patients.move_to_end(patient_id)
+        while len(self._patients) > self.max_patients:
+            self._patients.popitem(last=False)
+        return state.conflicts()
+
+    async def get_conflicts(self, db: AsyncSession, patient_id: int) -> List[Conflict]:
+        state = self._patients.get(patient_id)
+        if state is None or state.expires_at < time.monotonic():
+            result = await db.execute(
+                select(*FACT_COLUMNS).where(
+                    Medication.patient_id == patient_id,
+                    Medication.is_active == True
+                )
+            )
+            return self.rebuild(patient_id, result.all())
+
+        self._patients.move_to_end(patient_id)
+        dirty = self._dirty.pop(patient_id, None)
+        if dirty:
+            result = await db.execute(select(*FACT_COLUMNS).where(Medication.id.in_(dirty)))
+            today = date.today()
+            found = {}
+            for row in result.all():
+                if row.patient_id == patient_id:
+                    found[row.id] = MedicationFacts.from_row(row)
+            for med_id in dirty:
+                state.apply(med_id, found.get(med_id), today)
+        return state.conflicts()
+
+    def mark_dirty(self, patient_id: int, medication_id: int):
+        if patient_id in self._patients:
+            self._dirty.setdefault(patient_id, set()).add(medication_id)
+
+    def invalidate(self, patient_id: int):
+        """Drop a patient's state, e.g. after bulk writes that skip ORM events"""
+        self._patients.pop(patient_id, None)
+        self._dirty.pop(patient_id, None)
+
+    def clear(self):
+        self._patients.clear()
+        self._dirty.clear()
+
+
+conflict_engine = ConflictEngine(
+    max_patients=settings.CONFLICT_CACHE_SIZE,
+    ttl=settings.CONFLICT_CACHE_TTL
+)
+
+
+# Changes are staged on the session and applied once committed, so a
+# read between flush and commit cannot pick up (and drop) a half-done edit
+@event.listens_for(Medication, "after_insert")
+@event.listens_for(Medication, "after_update")
+@event.listens_for(Medication, "after_delete")
+def _stage_medication_change(mapper, connection, target):
+    session = object_session(target)
+    if session is None or target.id is None:
+        return
+    changes = session.info.setdefault("conflict_changes", set())
+    changes.add((target.patient_id, target.id))
+    # A medication moved to another patient leaves the old one's list too
+    for patient_id in inspect(target).attrs.patient_id.history.deleted:
+        if patient_id is not None:
+            changes.add((patient_id, target.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_medication_changes(session):
+    for patient_id, medication_id in session.info.pop("conflict_changes", ()):
+        conflict_engine.mark_dirty(patient_id, medication_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_medication_changes(session):
+    session.info.pop("conflict_changes", None)
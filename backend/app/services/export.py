@@ -0,0 +1,109 @@
+"""Streaming CSV/NDJSON exports of patients, medications and reconciliations.
+
+Exports select plain columns (no ORM objects or response models) in
+(created_at, id) order and read them through a server-side cursor
+``EXPORT_BATCH_SIZE`` rows at a time, encoding each batch as it arrives,
+so memory stays flat however many rows match.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import Select, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import Medication, Patient, Reconciliation
+from app.utils.pagination import timestamp_param
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# dataset -> (model whose rows are exported, columns in output order)
+EXPORTS: Dict[str, Tuple[type, list]] = {
+    "patients": (Patient, [
+        Patient.id, Patient.mrn, Patient.first_name, Patient.last_name, Patient.date_of_birth,
+        Patient.phone, Patient.email, Patient.created_at,
+    ]),
+    "medications": (Medication, [
+        Medication.id, Medication.patient_id, Patient.mrn.label("patient_mrn"), Medication.name,
+        Medication.generic_name, Medication.dosage, Medication.frequency, Medication.source,
+        Medication.ndc_number, Medication.last_filled, Medication.is_active, Medication.notes,
+        Medication.ocr_confidence, Medication.created_at,
+    ]),
+    "reconciliations": (Reconciliation, [
+        Reconciliation.id, Reconciliation.patient_id, Reconciliation.provider_id, Reconciliation.status,
+        Reconciliation.total_medications, Reconciliation.approved_medications,
+        Reconciliation.conflicts_found, Reconciliation.notes, Reconciliation.created_at,
+        Reconciliation.completed_at,
+    ]),
+}
+
+
+@dataclass
+class ExportFilters:
+    patient_id: Optional[int] = None
+    start: Optional[date] = None  # Created on or after this UTC day
+    end: Optional[date] = None  # Created on or before this UTC day
+    # Reconciliations in this status; patients/medications of patients with one
+    reconciliation_status: Optional[str] = None
+
+
+def export_query(db: AsyncSession, dataset: str, filters: ExportFilters) -> Select:
+    model, columns = EXPORTS[dataset]
+    query = select(*columns)
+    if model is Medication:
+        query = query.join(Patient, Patient.id == Medication.patient_id)
+
+    patient_id = model.id if model is Patient else model.patient_id
+    if filters.patient_id:
+        query = query.where(patient_id == filters.patient_id)
+    if filters.start:
+        query = query.where(model.created_at >= timestamp_param(db, datetime.combine(filters.start, time.min)))
+    if filters.end:
+        next_day = datetime.combine(filters.end + timedelta(days=1), time.min)
+        query = query.where(model.created_at < timestamp_param(db, next_day))
+    if filters.reconciliation_status:
+        if model is Reconciliation:
+            query = query.where(Reconciliation.status == filters.reconciliation_status)
+        else:
+            query = query.where(exists().where(
+                Reconciliation.patient_id == patient_id,
+                Reconciliation.status == filters.reconciliation_status,
+            ))
+    return query.order_by(model.created_at, model.id)
+
+
+def _value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_rows(columns: List[str], rows, fmt: str) -> str:
+    """One chunk of export output for ``rows``"""
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(columns, map(_value, row))), separators=(",", ":")) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def stream_export(dataset: str, filters: ExportFilters, fmt: str) -> AsyncIterator[str]:
+    """Yield an export chunk by chunk from its own session.
+
+    The session outlives the request handler, so it is opened here rather
+    than taken from ``get_db``.
+    """
+    async with AsyncSessionLocal() as db:
+        query = export_query(db, dataset, filters).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        result = await db.stream(query)
+        columns = list(result.keys())
+        if fmt == "csv":
+            yield encode_rows(columns, [columns], fmt)
+        async for rows in result.partitions():
+            yield encode_rows(columns, rows, fmt)
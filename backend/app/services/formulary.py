@@ -0,0 +1,259 @@
+import bisect
+import csv
+import hashlib
+import os
+import sqlite3
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+from app.core.config import settings
+
+# Characters OCR commonly reads in place of letters ("METF0RMIN", "Lisinopri1")
+_OCR_CONFUSIONS = str.maketrans({"0": "o", "1": "l", "5": "s", "8": "b", "|": "l", "$": "s"})
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, undo common OCR confusions and collapse punctuation"""
+    name = name.lower().translate(_OCR_CONFUSIONS)
+    return " ".join("".join(c if c.isalnum() else " " for c in name).split())
+
+
+def trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class FormularyMatch:
+    """A formulary entry that a (possibly noisy) drug name resolved to"""
+    name: str
+    generic_name: Optional[str]
+    ndc_number: Optional[str]
+    strength: Optional[str]
+    score: float
+
+
+class Formulary:
+    """In-memory approximate-match index over a local drug formulary.
+
+    Brand and generic names are indexed by character trigrams. An exact
+    (OCR-normalized) name is a dict hit; anything else counts shared
+    trigrams across the query's posting lists with numpy and ranks names
+    by trigram Dice similarity.
+
+    Storage is flat: names and entry columns live in plain lists, the
+    name -> entries chains are ``array``s, and ``finalize`` packs every
+    posting list into a single uint32 buffer, so a 100k-row formulary
+    costs tens of MB per worker rather than one Python object per posting.
+    Call ``finalize`` after the last ``add``; the index is read-only after.
+    """
+
+    def __init__(self, min_score: float = 0.6):
+        self.min_score = min_score
+        self.version = "empty"
+        # Entry columns
+        self._generic: List[Optional[str]] = []
+        self._ndc: List[Optional[str]] = []
+        self._strength: List[Optional[str]] = []
+        self._next_entry = array("i")  # Next entry with the same name, -1 ends the chain
+        # Searchable names
+        self._names: List[str] = []  # Normalized
+        self._name_display: List[str] = []
+        self._name_grams = array("H")  # Trigram count per name
+        self._name_first = array("I")  # First entry per name
+        self._name_last = array("I")
+        self._name_ids: Dict[str, int] = {}
+        self._postings: Dict[str, array] = {}  # Only used while loading
+        self._posting_data = np.zeros(0, np.uint32)
+        self._posting_offsets: Dict[str, tuple] = {}
+        self._name_gram_counts = np.zeros(0, np.float32)
+        self._sorted_ids = array("I")
+
+    def __len__(self) -> int:
+        return len(self._generic)
+
+    def add(self, brand_name: str, generic_name: str | None, ndc: str | None, strength: str | None = None):
+        if not (brand_name or "").strip() and not (generic_name or "").strip():
+            return
+        entry_id = len(self._generic)
+        self._generic.append((generic_name or "").strip() or None)
+        self._ndc.append((ndc or "").strip() or None)
+        self._strength.append((strength or "").strip() or None)
+        self._next_entry.append(-1)
+
+        # Brand first, so it is the display name when both normalize alike
+        for raw in (brand_name, generic_name):
+            if raw and raw.strip():
+                self._index_name(raw.strip(), entry_id)
+
+    def _index_name(self, raw: str, entry_id: int):
+        normalized = normalize_name(raw)
+        if not normalized:
+            return
+        name_id = self._name_ids.get(normalized)
+        if name_id is None:
+            name_id = len(self._names)
+            self._name_ids[normalized] = name_id
+            self._names.append(normalized)
+            self._name_display.append(raw)
+            self._name_first.append(entry_id)
+            self._name_last.append(entry_id)
+            grams = trigrams(normalized)
+            self._name_grams.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                self._postings.setdefault(gram, array("I")).append(name_id)
+        elif self._name_last[name_id] != entry_id:
+            self._next_entry[self._name_last[name_id]] = entry_id
+            self._name_last[name_id] = entry_id
+
+    def finalize(self, version: str):
+        """Freeze the index: pack postings into one array and sort names"""
+        offsets = {}
+        data = array("I")
+        for gram, posting in self._postings.items():
+            offsets[gram] = (len(data), len(data) + len(posting))
+            data.extend(posting)
+        self._posting_data = np.frombuffer(data, dtype=np.uint32) if data else np.zeros(0, np.uint32)
+        self._posting_offsets = offsets
+        self._postings = {}
+        self._name_gram_counts = np.frombuffer(self._name_grams, dtype=np.uint16).astype(np.float32)
+        self._sorted_ids = array("I", sorted(range(len(self._names)), key=self._names.__getitem__))
+        self.version = version
+
+    def _entries(self, name_id: int):
+        entry_id = self._name_first[name_id]
+        while entry_id != -1:
+            yield entry_id
+            entry_id = self._next_entry[entry_id]
+
+    def _search(self, normalized: str, limit: int) -> List[tuple]:
+        exact = self._name_ids.get(normalized)
+        if exact is not None and limit == 1:
+            return [(1.0, exact)]
+
+        query_grams = trigrams(normalized)
+        slices = [
+            self._posting_data[span[0]:span[1]]
+            for span in (self._posting_offsets.get(g) for g in query_grams)
+            if span is not None
+        ]
+        if not slices:
+            return []
+
+        # Each trigram occurs once per name, so counting ids across the
+        # query's posting lists gives the exact overlap; numpy does the
+        # counting and the Dice scoring in bulk.
+        name_ids, shared = np.unique(np.concatenate(slices), return_counts=True)
+        scores = 2 * shared / (len(query_grams) + self._name_gram_counts[name_ids])
+        keep = np.flatnonzero(scores >= self.min_score)
+        if len(keep) > limit:
+            keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+        best = keep[np.argsort(-scores[keep], kind="stable")]
+        return [(float(scores[i]), int(name_ids[i])) for i in best]
+
+    def search(self, query: str, limit: int = 5) -> List[FormularyMatch]:
+        """Return the best fuzzy matches for a drug name"""
+        normalized = normalize_name(query)
+        if not normalized or not self._names:
+            return []
+        return [self._match(name_id, score) for score, name_id in self._search(normalized, limit)]
+
+    def resolve(self, query: str, dosage: str | None = None) -> Optional[FormularyMatch]:
+        """Resolve a noisy drug name to its best formulary entry.
+
+        When several entries share the name (one per strength/NDC), the one
+        whose strength matches ``dosage`` wins.
+        """
+        normalized = normalize_name(query)
+        if not normalized or not self._names:
+            return None
+        best = self._search(normalized, limit=1)
+        if not best:
+            return None
+        score, name_id = best[0]
+        if dosage:
+            wanted = dosage.lower().replace(" ", "")
+            for entry_id in self._entries(name_id):
+                strength = self._strength[entry_id]
+                if strength and strength.lower().replace(" ", "") == wanted:
+                    return self._entry_match(entry_id, self._name_display[name_id], score)
+        return self._match(name_id, score)
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[FormularyMatch]:
+        """Names starting with ``prefix``, topped up with fuzzy matches"""
+        normalized = normalize_name(prefix)
+        if not normalized or not self._names:
+            return []
+
+        results = []
+        seen = set()
+        start = bisect.bisect_left(self._sorted_ids, normalized, key=self._names.__getitem__)
+        for name_id in self._sorted_ids[start:start + limit]:
+            if not self._names[name_id].startswith(normalized):
+                break
+            seen.add(name_id)
+            results.append(self._match(name_id, 1.0))
+
+        if len(results) < limit:
+            for score, name_id in self._search(normalized, limit):
+                if name_id not in seen and len(results) < limit:
+                    seen.add(name_id)
+                    results.append(self._match(name_id, score))
+        return results
+
+    def _match(self, name_id: int, score: float) -> FormularyMatch:
+        return self._entry_match(self._name_first[name_id], self._name_display[name_id], score)
+
+    def _entry_match(self, entry_id: int, name: str, score: float) -> FormularyMatch:
+        return FormularyMatch(
+            name=name,
+            generic_name=self._generic[entry_id],
+            ndc_number=self._ndc[entry_id],
+            strength=self._strength[entry_id],
+            score=round(score, 3),
+        )
+
+
+def load_formulary(path: str | None, min_score: float = 0.6) -> Formulary:
+    """Load a formulary from CSV or SQLite.
+
+    CSV files need ``brand_name``, ``generic_name`` and ``ndc`` columns
+    (``strength`` is optional); SQLite files need a ``formulary`` table
+    with the same columns. A missing path yields an empty formulary.
+    """
+    formulary = Formulary(min_score=min_score)
+    if not path or not os.path.exists(path):
+        formulary.finalize("empty")
+        return formulary
+
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(formulary)")}
+            strength = "strength" if "strength" in columns else "NULL"
+            for row in conn.execute(
+                f"SELECT brand_name, generic_name, ndc, {strength} FROM formulary"
+            ):
+                formulary.add(*row)
+        finally:
+            conn.close()
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                formulary.add(
+                    row.get("brand_name"), row.get("generic_name"),
+                    row.get("ndc"), row.get("strength")
+                )
+
+    stat = os.stat(path)
+    fingerprint = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    formulary.finalize(hashlib.sha256(fingerprint.encode()).hexdigest()[:12])
+    return formulary
+
+
+@lru_cache(maxsize=1)
+def get_formulary() -> Formulary:
+    """Process-wide formulary, loaded on first use"""
+    return load_formulary(settings.FORMULARY_PATH, settings.FORMULARY_MIN_SCORE)
@@ -0,0 +1,106 @@
+"""Downscaled, EXIF-stripped derivatives of uploaded label images.
+
+Each upload gets a small thumbnail and a medium preview, rendered once
+into ``derivative_store`` as ``<key stem>-<variant><size>.<ext>``.
+Uploads are content-addressed and derivative names carry their size,
+so a derivative never changes once written and can be cached forever.
+JPEGs are decoded in draft mode, straight at the smallest DCT scale
+that still covers the preview, rather than at full resolution.
+"""
+import asyncio
+import os
+import uuid
+from typing import Dict, List, Optional
+from PIL import Image, ImageOps, features
+from app.core.config import settings
+from app.services.blob_store import blob_store, derivative_store
+
+VARIANTS = {"thumb": settings.THUMBNAIL_SIZE, "preview": settings.PREVIEW_SIZE}
+
+if settings.DERIVATIVE_FORMAT.lower() == "webp" and features.check("webp"):
+    FORMAT, EXTENSION, MEDIA_TYPE = "WEBP", ".webp", "image/webp"
+else:
+    FORMAT, EXTENSION, MEDIA_TYPE = "JPEG", ".jpg", "image/jpeg"
+
+
+class DerivativeError(Exception):
+    """Raised when an upload cannot be decoded into a derivative"""
+
+
+def derivative_name(key: str, variant: str) -> str:
+    stem = os.path.splitext(key)[0]
+    return f"{stem}-{variant}{VARIANTS[variant]}{EXTENSION}"
+
+
+def derivative_names(key: str) -> List[str]:
+    return [derivative_name(key, variant) for variant in VARIANTS]
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if not has_alpha:
+        return image.convert("RGB")
+    image = image.convert("RGBA")
+    if FORMAT == "WEBP":
+        return image
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def _save(image: Image.Image) -> str:
+    temp_path = os.path.join(derivative_store.staging_dir, f".{uuid.uuid4().hex}.part")
+    try:
+        # No exif= argument: metadata from the source is not carried over
+        image.save(temp_path, FORMAT, quality=settings.DERIVATIVE_QUALITY)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def render_derivatives(source_path: str, variants: List[str]) -> Dict[str, str]:
+    """Render ``variants`` of an image to staging files; variant -> temp path"""
+    try:
+        with Image.open(source_path) as source:
+            largest = max(VARIANTS[variant] for variant in variants)
+            source.draft("RGB", (largest, largest))
+            # Apply the EXIF orientation before the metadata is dropped
+            image = _flatten(ImageOps.exif_transpose(source))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise DerivativeError(str(e))
+
+    rendered = {}
+    # Largest first, so each smaller size is scaled down from the last
+    for variant in sorted(variants, key=VARIANTS.get, reverse=True):
+        image.thumbnail((VARIANTS[variant], VARIANTS[variant]), Image.Resampling.LANCZOS)
+        rendered[variant] = _save(image)
+    return rendered
+
+
+async def ensure_derivatives(key: str) -> Optional[Dict[str, str]]:
+    """Local paths of an upload's derivatives, rendering any that are
+    missing off the event loop; None if the upload is missing or cannot
+    be decoded"""
+    names = {variant: derivative_name(key, variant) for variant in VARIANTS}
+    missing = [variant for variant, name in names.items() if not await derivative_store.exists(name)]
+    if missing:
+        source_path = await blob_store.local_path(key)
+        if source_path is None:
+            return None
+        try:
+            rendered = await asyncio.to_thread(render_derivatives, source_path, missing)
+        except DerivativeError:
+            return None
+        for variant, temp_path in rendered.items():
+            await derivative_store.put_file(temp_path, names[variant])
+    paths = {variant: await derivative_store.local_path(name) for variant, name in names.items()}
+    return paths if all(paths.values()) else None
+
+
+async def delete_upload(key: str) -> bool:
+    """Delete an upload and its derivatives"""
+    for name in derivative_names(key):
+        await derivative_store.delete(name)
+    return await blob_store.delete(key)
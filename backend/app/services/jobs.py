@@ -0,0 +1,198 @@
+"""Durable job queue in the app's own database.
+
+Request handlers ``enqueue`` a job and return; ``python -m app.worker``
+processes claim jobs and run the task registered for their ``kind``
+with ``@task``. Nothing beyond the database is needed.
+
+A claim leases a job for the task's ``lease_seconds``; the worker
+extends the lease while the task runs (and whenever it reports
+progress). If a worker dies, its lease runs out and the job is queued
+again, or failed once it has used up its attempts. A task that raises is
+retried after an exponential backoff, up to ``max_attempts`` runs. Jobs
+are claimed by priority (higher first), then oldest ``run_at``.
+
+Claims are a conditional UPDATE on the job's status, so two workers
+never run the same job; on PostgreSQL the candidate row is also locked
+with SKIP LOCKED so concurrent workers pick different jobs.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.models import Job
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+CLAIM_ATTEMPTS = 5  # Candidates tried before giving up a claim round to other workers
+
+
+class UnknownTask(ValueError):
+    """Raised when enqueuing a kind no task is registered for"""
+
+
+@dataclass
+class Task:
+    kind: str
+    func: Callable[..., Awaitable[Optional[dict]]]
+    max_attempts: int
+    lease_seconds: int
+
+
+TASKS: Dict[str, Task] = {}
+
+
+def task(kind: str, max_attempts: Optional[int] = None, lease_seconds: Optional[int] = None):
+    """Register ``async def func(ctx: JobContext, **payload) -> dict | None``
+    as the task for ``kind``; its return value becomes the job's result"""
+    def register(func):
+        TASKS[kind] = Task(
+            kind, func,
+            max_attempts or settings.JOB_MAX_ATTEMPTS,
+            lease_seconds or settings.JOB_LEASE_SECONDS,
+        )
+        return func
+    return register
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before running a job again after ``attempts`` runs"""
+    return min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+
+
+def _lease_seconds(kind: str) -> int:
+    registered = TASKS.get(kind)
+    return registered.lease_seconds if registered else settings.JOB_LEASE_SECONDS
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    provider_id: Optional[int] = None,
+    delay: float = 0,
+) -> Job:
+    """Add a job and commit it"""
+    if kind not in TASKS:
+        raise UnknownTask(kind)
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=TASKS[kind].max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        provider_id=provider_id,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def reclaim_expired(db: AsyncSession) -> int:
+    """Requeue (or fail, if out of attempts) running jobs whose lease ran out"""
+    now = datetime.utcnow()
+    expired = (Job.status == RUNNING, Job.lease_expires_at < now)
+    released = {"worker_id": None, "lease_expires_at": None, "error": "Worker stopped heartbeating"}
+    failed = await db.execute(
+        update(Job).where(*expired, Job.attempts >= Job.max_attempts)
+        .values(status=FAILED, finished_at=now, **released)
+    )
+    requeued = await db.execute(
+        update(Job).where(*expired).values(status=QUEUED, run_at=now, **released)
+    )
+    await db.commit()
+    return failed.rowcount + requeued.rowcount
+
+
+async def claim(db: AsyncSession, worker_id: str) -> Optional[Job]:
+    """Lease the next runnable job to ``worker_id``, or None if there is none"""
+    for _ in range(CLAIM_ATTEMPTS):
+        now = datetime.utcnow()
+        candidate = (await db.execute(
+            select(Job.id, Job.kind)
+            .where(Job.status == QUEUED, Job.run_at <= now)
+            .order_by(Job.priority.desc(), Job.run_at, Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).first()
+        if candidate is None:
+            await db.rollback()
+            return None
+        lease = _lease_seconds(candidate.kind)
+        claimed = await db.execute(
+            update(Job).where(Job.id == candidate.id, Job.status == QUEUED)
+            .values(
+                status=RUNNING, worker_id=worker_id, attempts=Job.attempts + 1, error=None,
+                lease_expires_at=now + timedelta(seconds=lease), started_at=now,
+            )
+        )
+        await db.commit()
+        if claimed.rowcount == 1:
+            return await db.get(Job, candidate.id, populate_existing=True)
+        # Another worker got there first; try the next candidate
+    return None
+
+
+def _owned(job: Job, worker_id: str) -> tuple:
+    return (Job.id == job.id, Job.worker_id == worker_id, Job.status == RUNNING)
+
+
+async def heartbeat(db: AsyncSession, job: Job, worker_id: str, progress: Optional[dict] = None) -> bool:
+    """Extend the job's lease (and record ``progress``); False if it was lost"""
+    values = {"lease_expires_at": datetime.utcnow() + timedelta(seconds=_lease_seconds(job.kind))}
+    if progress is not None:
+        values["progress"] = progress
+    result = await db.execute(update(Job).where(*_owned(job, worker_id)).values(**values))
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def complete(db: AsyncSession, job: Job, worker_id: str, result: Optional[dict]) -> bool:
+    done = await db.execute(
+        update(Job).where(*_owned(job, worker_id))
+        .values(status=SUCCEEDED, result=result, finished_at=datetime.utcnow(), worker_id=None, lease_expires_at=None)
+    )
+    await db.commit()
+    return done.rowcount == 1
+
+
+async def fail(db: AsyncSession, job: Job, worker_id: str, error: str) -> bool:
+    """Record a failed run: queue a retry after a backoff, or fail the job
+    once it has used up its attempts"""
+    now = datetime.utcnow()
+    if job.attempts < job.max_attempts:
+        values = {"status": QUEUED, "run_at": now + timedelta(seconds=retry_delay(job.attempts))}
+    else:
+        values = {"status": FAILED, "finished_at": now}
+    failed = await db.execute(
+        update(Job).where(*_owned(job, worker_id))
+        .values(error=error, worker_id=None, lease_expires_at=None, **values)
+    )
+    await db.commit()
+    return failed.rowcount == 1
+
+
+async def purge_finished(db: AsyncSession, older_than: float = settings.JOB_RETENTION_SECONDS) -> int:
+    """Delete succeeded and failed jobs that finished more than ``older_than`` seconds ago"""
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    result = await db.execute(
+        delete(Job).where(Job.status.in_([SUCCEEDED, FAILED]), Job.finished_at < cutoff)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+class JobContext:
+    """Handed to a running task so it can report progress"""
+
+    def __init__(self, job: Job, worker_id: str, session_factory):
+        self.job = job
+        self.worker_id = worker_id
+        self._session_factory = session_factory
+
+    async def report(self, progress: dict) -> bool:
+        """Store ``progress`` for the status API; also extends the lease"""
+        async with self._session_factory() as db:
+            return await heartbeat(db, self.job, self.worker_id, progress)
@@ -0,0 +1,377 @@
+"""Bulk import of pharmacy/EMR medication feeds (CSV or NDJSON).
+
+Rows are read from a file a batch at a time, validated, resolved to
+patients (by ``patient_id`` or ``mrn``) with one query per batch, and
+written with executemany inserts/updates, one commit per batch. Rows with
+an NDC and a last-filled date are upserted on (patient, NDC, last_filled),
+so re-importing a feed updates the same medications.
+
+    python -m app.services.medication_import feed.csv --source pharmacy
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.models import Medication, Patient
+from app.services.analytics import add_row, apply_deltas
+from app.services.conflicts import conflict_engine
+
+SOURCES = {"photo", "pharmacy", "emr", "manual"}
+FORMATS = {"csv", "ndjson"}
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+KEY_LOOKUP_CHUNK = 250  # Upsert keys matched per query
+
+# Feed column -> Medication column, for the columns a feed may set
+FIELDS = {
+    "name": "name",
+    "generic_name": "generic_name",
+    "dosage": "dosage",
+    "frequency": "frequency",
+    "source": "source",
+    "ndc": "ndc_number",
+    "ndc_number": "ndc_number",
+    "last_filled": "last_filled",
+    "is_active": "is_active",
+    "notes": "notes",
+}
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+FALSE_VALUES = {"0", "false", "f", "no", "n"}
+
+
+class RowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportProgress:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[dict] = field(default_factory=list)  # First IMPORT_MAX_ERRORS only
+    elapsed: float = 0.0
+    done: bool = False
+
+    def fail(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def to_dict(self, include_errors: bool = True) -> dict:
+        data = {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "elapsed": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows / self.elapsed) if self.elapsed else None,
+            "done": self.done,
+        }
+        if include_errors:
+            data["errors"] = sorted(self.errors, key=lambda error: error["line"])
+        return data
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> Optional[str]:
+    name = (filename or "").lower()
+    for extension, fmt in EXTENSIONS.items():
+        if name.endswith(extension):
+            return fmt
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/json-lines"):
+        return "ndjson"
+    return None
+
+
+def iter_records(stream: io.TextIOBase, fmt: str) -> Iterator[Tuple[int, dict | RowError]]:
+    """Yield (line number, record or RowError) from a text stream"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        line = reader.line_num
+        for record in reader:
+            # Report the first physical line of the record
+            start, line = line + 1, reader.line_num
+            if None in record:
+                yield start, RowError("More values than header columns")
+            else:
+                yield start, record
+        return
+
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            yield line, RowError(f"Invalid JSON: {e}")
+            continue
+        if isinstance(record, dict):
+            yield line, {str(key).strip().lower(): value for key, value in record.items()}
+        else:
+            yield line, RowError("Expected a JSON object")
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_record(record: dict, default_source: str) -> Tuple[dict, Optional[int], Optional[str]]:
+    """Validate one record; return (medication values, patient id, mrn)"""
+    patient_id = _text(record.get("patient_id"))
+    mrn = _text(record.get("mrn"))
+    if patient_id is None and mrn is None:
+        raise RowError("patient_id or mrn is required")
+    if patient_id is not None:
+        if not patient_id.isdigit():
+            raise RowError(f"Invalid patient_id: {patient_id!r}")
+        patient_id = int(patient_id)
+
+    values = {}
+    for key, column in FIELDS.items():
+        if key in record:
+            values[column] = _text(record[key])
+    if not values.get("name"):
+        raise RowError("name is required")
+    values["source"] = (values.get("source") or default_source).lower()
+    if values["source"] not in SOURCES:
+        raise RowError(f"Invalid source: {values['source']!r}")
+    if values.get("last_filled"):
+        try:
+            values["last_filled"] = date.fromisoformat(values["last_filled"][:10])
+        except ValueError:
+            raise RowError(f"Invalid last_filled: {values['last_filled']!r}")
+    if "is_active" in values:
+        flag = (values["is_active"] or "true").lower()
+        if flag not in TRUE_VALUES | FALSE_VALUES:
+            raise RowError(f"Invalid is_active: {values['is_active']!r}")
+        values["is_active"] = flag in TRUE_VALUES
+    for column, limit in (("name", 200), ("generic_name", 200), ("dosage", 100), ("frequency", 100), ("ndc_number", 20)):
+        if values.get(column) and len(values[column]) > limit:
+            raise RowError(f"{column} is longer than {limit} characters")
+    return values, patient_id, mrn
+
+
+def _take(records: Iterator, size: int) -> list:
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+class MedicationImporter:
+    """Imports one feed; keeps patient lookups across batches"""
+
+    def __init__(self, db: AsyncSession, default_source: str = "pharmacy", batch_size: Optional[int] = None):
+        self.db = db
+        self.default_source = default_source
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.progress = ImportProgress()
+        self._known_ids: set = set()
+        self._mrn_ids: Dict[str, int] = {}
+
+    async def run(self, stream: io.TextIOBase, fmt: str) -> AsyncIterator[ImportProgress]:
+        """Import ``stream``, yielding progress after each committed batch"""
+        started = time.perf_counter()
+        records = iter_records(stream, fmt)
+        while True:
+            # Parse off the event loop; a batch is a few milliseconds of CPU
+            batch = await asyncio.to_thread(_take, records, self.batch_size)
+            self.progress.elapsed = time.perf_counter() - started
+            if not batch:
+                break
+            await self.import_batch(batch)
+            self.progress.elapsed = time.perf_counter() - started
+            yield self.progress
+        self.progress.done = True
+        yield self.progress
+
+    async def _resolve_patients(self, rows: List[tuple]):
+        ids = {patient_id for _, _, patient_id, _ in rows if patient_id is not None} - self._known_ids
+        mrns = {mrn for _, _, patient_id, mrn in rows if patient_id is None} - self._mrn_ids.keys()
+        if ids:
+            result = await self.db.execute(select(Patient.id).where(Patient.id.in_(ids)))
+            self._known_ids.update(result.scalars())
+        if mrns:
+            result = await self.db.execute(select(Patient.mrn, Patient.id).where(Patient.mrn.in_(mrns)))
+            for mrn, patient_id in result.all():
+                self._mrn_ids.setdefault(mrn, patient_id)
+
+    async def import_batch(self, batch: List[tuple]):
+        progress = self.progress
+        progress.rows += len(batch)
+
+        rows = []
+        for line, record in batch:
+            if isinstance(record, RowError):
+                progress.fail(line, str(record))
+                continue
+            try:
+                rows.append((line, *parse_record(record, self.default_source)))
+            except RowError as e:
+                progress.fail(line, str(e))
+
+        await self._resolve_patients(rows)
+
+        # The last row for an upsert key wins within a batch
+        keyed: Dict[tuple, tuple] = {}
+        unkeyed: List[tuple] = []
+        for line, values, patient_id, mrn in rows:
+            if patient_id is not None:
+                resolved = patient_id if patient_id in self._known_ids else None
+            else:
+                resolved = self._mrn_ids.get(mrn)
+            if resolved is None:
+                progress.fail(line, f"Unknown patient: {patient_id if patient_id is not None else mrn}")
+                continue
+            values["patient_id"] = resolved
+            if values.get("ndc_number") and values.get("last_filled"):
+                keyed[(resolved, values["ndc_number"], values["last_filled"])] = (line, values)
+            else:
+                unkeyed.append((line, values))
+
+        try:
+            existing = await self._existing(keyed)
+            deltas: dict = {}
+            inserts, updates = [], []
+            today = datetime.utcnow().date()
+            for key, (line, values) in keyed.items():
+                if key in existing:
+                    updates.append((existing[key], values))
+                else:
+                    inserts.append(values)
+            inserts.extend(values for _, values in unkeyed)
+
+            for values in inserts:
+                values.setdefault("is_active", True)
+                add_row(deltas, Medication, _Row(values), today)
+            await self._insert(inserts)
+            await self._update(updates, deltas)
+
+            # Bulk statements skip the ORM events that keep rollups current
+            await self.db.run_sync(lambda session: apply_deltas(session.connection(), deltas))
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            for line, _ in list(keyed.values()) + unkeyed:
+                progress.fail(line, f"Batch failed: {e.__class__.__name__}")
+            return
+
+        progress.inserted += len(inserts)
+        progress.updated += len(updates)
+        for patient_id in {values["patient_id"] for values in inserts} | {row.patient_id for row, _ in updates}:
+            conflict_engine.invalidate(patient_id)
+
+    async def _existing(self, keyed: Dict[tuple, tuple]) -> dict:
+        """Current rows for the batch's upsert keys, lowest id per key"""
+        existing = {}
+        keys = list(keyed)
+        # One index probe per key; chunked to stay under SQLite's expression depth limit
+        for start in range(0, len(keys), KEY_LOOKUP_CHUNK):
+            result = await self.db.execute(
+                select(
+                    Medication.id, Medication.patient_id, Medication.ndc_number, Medication.last_filled,
+                    Medication.source, Medication.ocr_confidence, Medication.created_at
+                )
+                .where(or_(*[
+                    and_(Medication.patient_id == patient_id, Medication.ndc_number == ndc,
+                         Medication.last_filled == last_filled)
+                    for patient_id, ndc, last_filled in keys[start:start + KEY_LOOKUP_CHUNK]
+                ]))
+                .order_by(Medication.id)
+            )
+            for row in result.all():
+                existing.setdefault((row.patient_id, row.ndc_number, row.last_filled), row)
+        return existing
+
+    async def _insert(self, rows: List[dict]):
+        # Group by column set so each executemany has uniform parameters
+        for columns, group in _group_by_columns(rows).items():
+            await self.db.execute(insert(Medication.__table__), group)
+
+    async def _update(self, updates: List[tuple], deltas: dict):
+        params = []
+        for old, values in updates:
+            new = {**old._asdict(), **values}
+            day = old.created_at.date() if isinstance(old.created_at, datetime) else datetime.utcnow().date()
+            add_row(deltas, Medication, old, day, -1)
+            add_row(deltas, Medication, _Row(new), day)
+            params.append({"medication_id": old.id, **{k: v for k, v in values.items() if k != "patient_id"}})
+        table = Medication.__table__
+        for columns, group in _group_by_columns(params).items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("medication_id"))
+                .values({column: bindparam(column) for column in columns if column != "medication_id"})
+            )
+            await self.db.execute(statement, group)
+
+
+class _Row:
+    """Attribute view of a values dict, for the rollup helpers"""
+
+    def __init__(self, values: dict):
+        self.__dict__.update(values)
+
+    def __getattr__(self, name):
+        return None
+
+
+def _group_by_columns(rows: List[dict]) -> Dict[tuple, List[dict]]:
+    groups: Dict[tuple, List[dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups
+
+
+async def _import_file(path: str, fmt: str, source: str, batch_size: int) -> ImportProgress:
+    from app.core.database import AsyncSessionLocal, engine
+
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            async with AsyncSessionLocal() as db:
+                importer = MedicationImporter(db, source, batch_size)
+                async for progress in importer.run(stream, fmt):
+                    if not progress.done:
+                        print(json.dumps(progress.to_dict(include_errors=False)), file=sys.stderr)
+                return importer.progress
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import a pharmacy/EMR medication feed")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="Default: from the file extension")
+    parser.add_argument("--source", default="pharmacy", choices=sorted(SOURCES), help="For rows without a source")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+    progress = asyncio.run(_import_file(args.path, fmt, args.source, args.batch_size))
+    print(json.dumps(progress.to_dict(), indent=2))
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+from functools import lru_cache
+from typing import List
+from PIL import Image
+import pytesseract
+from app.core.metrics import timed_stage
+from app.services.formulary import get_formulary
+from app.services.sig_parser import parse_sig, parse_medication_lines
+
+# Bump whenever preprocessing or parsing changes so cached results are redone
+OCR_PIPELINE_VERSION = "3"
+
+
+@lru_cache(maxsize=1)
+def get_ocr_version() -> str:
+    """Version string identifying the OCR engine and pipeline, for cache keys"""
+    try:
+        engine_version = str(pytesseract.get_tesseract_version())
+    except Exception:
+        engine_version = "unknown"
+    return f"p{OCR_PIPELINE_VERSION}-tesseract-{engine_version}-formulary-{get_formulary().version}"
+
+
+def process_medication_image(file_path: str) -> dict:
+    """Run OCR on an image and extract medication information.
+
+    This is CPU bound and blocking; it is meant to run inside the OCR
+    process pool, never directly on the event loop. Each stage is timed
+    for the ``ocr_stage_duration_seconds`` metric.
+    """
+    try:
+        with timed_stage("decode"):
+            image = Image.open(file_path)
+            image.load()
+        
+        with timed_stage("preprocess"):
+            # Convert to grayscale for better OCR
+            if image.mode != 'L':
+                image = image.convert('L')
+        
+        with timed_stage("tesseract"):
+            # Single Tesseract pass: words, boxes and confidences together
+            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+        
+        with timed_stage("parse"):
+            lines = group_words_into_lines(data)
+            
+            word_confidences = [
+                word["confidence"] for line in lines for word in line["words"]
+                if word["confidence"] > 0
+            ]
+            avg_confidence = (
+                int(sum(word_confidences) // len(word_confidences)) if word_confidences else 0
+            )
+            
+            # Parse medications line by line so each keeps its own confidence
+            suggested_medications = parse_medications_from_lines(lines)
+        
+        return {
+            "text": "\n".join(line["text"] for line in lines),
+            "confidence": avg_confidence,
+            "suggested_medications": suggested_medications,
+            "lines": lines
+        }
+        
+    except Exception as e:
+        raise Exception(f"OCR processing failed: {str(e)}")
+
+def group_words_into_lines(data: dict) -> List[dict]:
+    """Rebuild text lines from Tesseract ``image_to_data`` output.
+
+    Words are grouped by their (block, paragraph, line) numbers. Each line
+    carries its text, mean word confidence, bounding box and the words
+    themselves.
+    """
+    lines = {}
+    for i, word_text in enumerate(data["text"]):
+        word_text = word_text.strip()
+        # Non-word rows (pages, blocks, empty cells) have conf -1 or no text
+        confidence = float(data["conf"][i])
+        if not word_text or confidence < 0:
+            continue
+        
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append({
+            "text": word_text,
+            "confidence": confidence,
+            "left": data["left"][i],
+            "top": data["top"][i],
+            "width": data["width"][i],
+            "height": data["height"][i]
+        })
+    
+    result = []
+    for words in lines.values():
+        left = min(w["left"] for w in words)
+        top = min(w["top"] for w in words)
+        right = max(w["left"] + w["width"] for w in words)
+        bottom = max(w["top"] + w["height"] for w in words)
+        result.append({
+            "text": " ".join(w["text"] for w in words),
+            "confidence": round(sum(w["confidence"] for w in words) / len(words), 1),
+            "left": left,
+            "top": top,
+            "width": right - left,
+            "height": bottom - top,
+            "words": words
+        })
+    
+    return result
+
+def parse_medications_from_text(text: str) -> List[dict]:
+    """Parse medication information from plain OCR text"""
+    return parse_medications_from_lines(
+        [{"text": line, "confidence": None} for line in text.split('\n')]
+    )
+
+def parse_medications_from_lines(lines: List[dict]) -> List[dict]:
+    """Parse medication information from OCR lines with confidences"""
+    return resolve_medication_names(parse_medication_lines(lines))
+
+def resolve_medication_names(medications: List[dict]) -> List[dict]:
+    """Map noisy OCR drug names onto the formulary.
+
+    Matched medications get the canonical name plus generic name and NDC;
+    the text as read is kept under ``ocr_name``. Names that do not match
+    as a whole ("METFORMIN HCL ER") fall back to their first word.
+    """
+    formulary = get_formulary()
+    for medication in medications:
+        match = formulary.resolve(medication["name"], medication.get("dosage"))
+        words = medication["name"].split()
+        if not match and len(words) > 1:
+            match = formulary.resolve(words[0], medication.get("dosage"))
+        medication["ocr_name"] = medication["name"]
+        medication["generic_name"] = match.generic_name if match else None
+        medication["ndc_number"] = match.ndc_number if match else None
+        medication["formulary_score"] = match.score if match else None
+        if match:
+            medication["name"] = match.name
+    return medications
+
+def extract_dosage(text: str) -> str:
+    """Extract dosage from text"""
+    return parse_sig(text).dosage
+
+def extract_frequency(text: str) -> str:
+    """Extract frequency from text"""
+    return parse_sig(text).frequency
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.models import OCRCacheEntry
+
+
+class OCRResultCache:
+    """Two-tier cache of OCR results keyed by image content hash.
+
+    A bounded in-memory LRU sits in front of the ``ocr_cache`` table, so a
+    re-uploaded photo skips OCR entirely and survives restarts. Entries are
+    also keyed by the OCR pipeline version, so engine or parser changes
+    never serve stale results.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    async def get(self, db: AsyncSession, content_hash: str, ocr_version: str) -> Optional[dict]:
+        """Return ``{"filename", "result"}`` for a cached image, or None"""
+        key = (content_hash, ocr_version)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        entry = await db.get(OCRCacheEntry, (content_hash, ocr_version))
+        if not entry:
+            return None
+
+        cached = {"filename": entry.filename, "result": entry.result}
+        self._remember(key, cached)
+        return cached
+
+    async def put(self, db: AsyncSession, content_hash: str, ocr_version: str, filename: str, result: dict):
+        """Store an OCR result in both tiers"""
+        await db.merge(OCRCacheEntry(
+            content_hash=content_hash,
+            ocr_version=ocr_version,
+            filename=filename,
+            result=result
+        ))
+        await db.commit()
+        self._remember((content_hash, ocr_version), {"filename": filename, "result": result})
+
+    def _remember(self, key, value: dict):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+ocr_cache = OCRResultCache(max_entries=settings.OCR_CACHE_SIZE)
@@ -0,0 +1,236 @@
+"""Bounded process pool for OCR, with job state kept in the database.
+
+Each OCR job admitted to the pool is recorded as a row in the ``jobs``
+table (``kind="ocr"``), so with several API workers a job can be polled
+from whichever one the request reaches, and finished results survive a
+restart. The OCR itself runs in the pool of the worker that admitted it;
+``python -m app.worker`` never claims these rows. A row still running
+after ``OCR_JOB_TIMEOUT_SECONDS`` lost its API worker, and is failed
+when it is next polled (or by the worker's lease reclaim).
+"""
+import asyncio
+import logging
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import or_, select, update
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import Counter, Gauge, Histogram, call_with_stage_timings
+from app.models.models import Job
+from app.services.jobs import FAILED, RUNNING, SUCCEEDED, complete, fail
+
+OCR_STAGE_SECONDS = Histogram(
+    "ocr_stage_duration_seconds", "Time per OCR pipeline stage, in the pool process", ["stage"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+OCR_JOBS = Counter("ocr_jobs_total", "OCR runs in the pool, by outcome", ["status"])
+OCR_JOB_FAILURES = Counter(
+    "ocr_job_failures_total", "OCR jobs recorded as failed, by where they failed (ocr, on_complete, lost)", ["stage"]
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OCRQueueFull(Exception):
+    """Raised when the OCR admission queue has no free slots"""
+
+OCR_KIND = "ocr"  # Job.kind of OCR runs
+
+
+class OCRExecutor:
+    """Bounded process pool for CPU-heavy OCR work.
+
+    At most ``max_pending`` jobs are admitted at once (running or waiting
+    for a worker process); anything beyond that is rejected with
+    ``OCRQueueFull`` so callers can answer 429 instead of piling up work.
+    Admission is per process; job state is shared through the database.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, job_ttl: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._tasks: set = set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def free_slots(self) -> int:
+        return max(self.max_pending - self._pending, 0)
+
+    def is_full(self) -> bool:
+        return self._pending >= self.max_pending
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _acquire(self):
+        if self.is_full():
+            raise OCRQueueFull()
+        self._pending += 1
+
+    async def _run_in_pool(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        try:
+            result, stages = await loop.run_in_executor(self._get_pool(), call_with_stage_timings, fn, *args)
+        except Exception:
+            OCR_JOBS.labels("failed").inc()
+            raise
+        OCR_JOBS.labels("completed").inc()
+        for stage, seconds in stages:
+            OCR_STAGE_SECONDS.labels(stage).observe(seconds)
+        return result
+
+    def _release(self):
+        self._pending -= 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run ``fn(*args)`` in the pool and wait for its result.
+
+        Admitted like ``submit``: raises ``OCRQueueFull`` when no slot is free.
+        """
+        self._acquire()
+        try:
+            return await self._run_in_pool(fn, *args)
+        finally:
+            self._release()
+
+    async def submit(
+        self,
+        fn: Callable,
+        *args,
+        provider_id: int | None = None,
+        context: Dict[str, Any] | None = None,
+        on_complete: Callable[[dict], Awaitable[None]] | None = None,
+    ) -> Job:
+        """Admit a job, record it and return immediately; poll it with ``get``.
+
+        ``on_complete`` gets the result before the job is marked completed.
+        """
+        self._acquire()
+        try:
+            job = await self._record(RUNNING, provider_id, context)
+        except BaseException:
+            self._release()
+            raise
+
+        task = asyncio.get_running_loop().create_task(
+            self._finish(job, self._run_in_pool(fn, *args), on_complete)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def add_completed(
+        self,
+        result: dict,
+        provider_id: int | None = None,
+        context: Dict[str, Any] | None = None,
+    ) -> Job:
+        """Record an already-finished job, e.g. a cache hit"""
+        return await self._record(SUCCEEDED, provider_id, context, result)
+
+    async def _record(self, status: str, provider_id: int | None, context: Dict[str, Any] | None, result: dict | None = None) -> Job:
+        now = datetime.utcnow()
+        job = Job(
+            kind=OCR_KIND,
+            payload=context or {},  # What the job's response describes, e.g. the filename
+            status=status,
+            attempts=1,
+            max_attempts=1,  # Never retried: the pool work is gone with its process
+            run_at=now,
+            started_at=now,
+            provider_id=provider_id,
+            result=result,
+        )
+        if status == RUNNING:
+            job.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            job.lease_expires_at = now + timedelta(seconds=settings.OCR_JOB_TIMEOUT_SECONDS)
+        else:
+            job.finished_at = now
+        async with AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+        return job
+
+    async def _finish(self, job: Job, running: Awaitable, on_complete):
+        stage = "ocr"
+        try:
+            try:
+                result = await running
+                stage = "on_complete"
+                if on_complete:
+                    await on_complete(result)
+            except Exception as e:
+                OCR_JOB_FAILURES.labels(stage).inc()
+                # A bad image fails OCR routinely; a failing callback is a bug
+                logger.log(
+                    logging.WARNING if stage == "ocr" else logging.ERROR,
+                    "OCR job %s failed in %s: %s", job.id, stage, e, exc_info=stage != "ocr"
+                )
+                async with AsyncSessionLocal() as db:
+                    await fail(db, job, job.worker_id, str(e))
+            else:
+                async with AsyncSessionLocal() as db:
+                    await complete(db, job, job.worker_id, result)
+        finally:
+            self._release()
+
+    async def get(self, db, job_id: str) -> Optional[Job]:
+        """An OCR job by id; finished ones only for ``job_ttl`` seconds.
+
+        A job still running past its lease lost its API worker (crash or
+        restart) and is failed here, so polling clients get an answer
+        without ``python -m app.worker`` running.
+        """
+        if not job_id.isdigit():
+            return None
+        cutoff = datetime.utcnow() - timedelta(seconds=self.job_ttl)
+        job = (await db.execute(
+            select(Job).where(
+                Job.id == int(job_id),
+                Job.kind == OCR_KIND,
+                or_(Job.finished_at.is_(None), Job.finished_at >= cutoff),
+            )
+        )).scalar_one_or_none()
+        if job is not None and job.status == RUNNING and job.lease_expires_at < datetime.utcnow():
+            await self._expire(db, job)
+        return job
+
+    async def _expire(self, db, job: Job):
+        now = datetime.utcnow()
+        # Conditional, so a run that just finished is not overwritten
+        expired = await db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == RUNNING, Job.lease_expires_at < now)
+            .values(
+                status=FAILED, finished_at=now, worker_id=None, lease_expires_at=None,
+                error="OCR did not finish; the server handling it stopped",
+            )
+        )
+        await db.commit()
+        if expired.rowcount == 1:
+            OCR_JOB_FAILURES.labels("lost").inc()
+        await db.refresh(job)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+ocr_executor = OCRExecutor(
+    max_workers=settings.OCR_WORKERS,
+    max_pending=settings.OCR_QUEUE_SIZE,
+    job_ttl=settings.OCR_JOB_TTL_SECONDS,
+)
+Gauge("ocr_jobs_pending", "OCR jobs admitted (running or waiting for a process)", function=lambda: ocr_executor.pending)
@@ -0,0 +1,156 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Patient
+
+# Indexed expressions; the matching functional indexes live on Patient
+LAST_NAME_KEY = func.lower(Patient.last_name)
+FIRST_NAME_KEY = func.lower(Patient.first_name)
+EMAIL_KEY = func.lower(Patient.email)
+
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y")
+_TOKEN = re.compile(r"[^\s,]+")
+
+
+@dataclass
+class PatientQuery:
+    """A free-text patient search split into the parts we can index"""
+    raw: str
+    names: List[str]
+    email: Optional[str] = None
+    date_of_birth: Optional[date] = None
+    last_name_first: bool = False  # "Smith, John"
+
+
+@dataclass
+class PatientMatch:
+    patient: Patient
+    score: float
+
+
+def parse_date(text: str) -> Optional[date]:
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_patient_query(q: str, date_of_birth: Optional[date] = None) -> PatientQuery:
+    """Split ``q`` into name prefixes, an email and an optional DOB"""
+    query = PatientQuery(raw=q.strip(), names=[], date_of_birth=date_of_birth)
+    query.last_name_first = "," in q
+    for token in _TOKEN.findall(q):
+        if "@" in token:
+            query.email = token.lower()
+        elif (parsed := parse_date(token)) is not None:
+            query.date_of_birth = query.date_of_birth or parsed
+        else:
+            query.names.append(token.lower())
+    return query
+
+
+def prefix_range(column, prefix: str):
+    """``column LIKE 'prefix%'`` as a range, which any b-tree index can serve"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def _score(patient: Patient, query: PatientQuery) -> float:
+    score = 0.0
+    if patient.mrn and patient.mrn == query.raw:
+        score += 100
+    if query.email and patient.email:
+        email = patient.email.lower()
+        score += 40 if email == query.email else 25 if email.startswith(query.email) else 0
+
+    last, first = patient.last_name.lower(), patient.first_name.lower()
+    names = query.names
+    if len(names) == 1:
+        term = names[0]
+        score += 20 if last == term else 12 if last.startswith(term) else 0
+        score += 10 if first == term else 6 if first.startswith(term) else 0
+    elif len(names) >= 2:
+        a, b = names[0], names[-1]
+
+        def pair(first_term, last_term):
+            return (
+                (20 if last == last_term else 12 if last.startswith(last_term) else 0)
+                + (10 if first == first_term else 6 if first.startswith(first_term) else 0)
+            )
+
+        if query.last_name_first:
+            score += pair(b, a)
+        else:
+            # "John Smith" usually means first-last; still accept "Smith John"
+            score += max(pair(a, b) + 2, pair(b, a))
+    if query.date_of_birth and patient.date_of_birth == query.date_of_birth:
+        score += 5
+    return score
+
+
+async def search_patients(
+    db: AsyncSession,
+    q: str,
+    date_of_birth: Optional[date] = None,
+    limit: int = 20,
+) -> List[PatientMatch]:
+    """Search patients by MRN (exact), name or email prefix, optionally by DOB.
+
+    Each way a query can match runs as its own small index range scan
+    capped at a few times ``limit`` rows, so cost depends on the page size
+    rather than the table size; candidates are then ranked in Python.
+    """
+    query = parse_patient_query(q, date_of_birth)
+    candidate_limit = max(limit * 4, 50)
+    dob_filter = [Patient.date_of_birth == query.date_of_birth] if query.date_of_birth else []
+
+    statements = []
+    if query.raw and " " not in query.raw:
+        statements.append(select(Patient).where(Patient.mrn == query.raw, *dob_filter))
+    if query.email:
+        statements.append(
+            select(Patient)
+            .where(prefix_range(EMAIL_KEY, query.email), *dob_filter)
+            .order_by(EMAIL_KEY)
+        )
+    names = query.names
+    if len(names) == 1:
+        statements.append(
+            select(Patient)
+            .where(prefix_range(LAST_NAME_KEY, names[0]), *dob_filter)
+            .order_by(LAST_NAME_KEY, FIRST_NAME_KEY)
+        )
+        statements.append(
+            select(Patient)
+            .where(prefix_range(FIRST_NAME_KEY, names[0]), *dob_filter)
+            .order_by(FIRST_NAME_KEY, LAST_NAME_KEY)
+        )
+    elif len(names) >= 2:
+        a, b = names[0], names[-1]
+        for last_term, first_term in ((a, b), (b, a)):
+            statements.append(
+                select(Patient)
+                .where(
+                    prefix_range(LAST_NAME_KEY, last_term),
+                    prefix_range(FIRST_NAME_KEY, first_term),
+                    *dob_filter
+                )
+                .order_by(LAST_NAME_KEY, FIRST_NAME_KEY)
+            )
+    if not statements and dob_filter:
+        statements.append(select(Patient).where(*dob_filter).order_by(LAST_NAME_KEY, FIRST_NAME_KEY))
+
+    candidates: Dict[int, Patient] = {}
+    for statement in statements:
+        result = await db.execute(statement.limit(candidate_limit))
+        for patient in result.scalars():
+            candidates.setdefault(patient.id, patient)
+
+    matches = [PatientMatch(patient, _score(patient, query)) for patient in candidates.values()]
+    matches.sort(key=lambda m: (-m.score, m.patient.last_name.lower(), m.patient.first_name.lower(), m.patient.id))
+    return matches[:limit]
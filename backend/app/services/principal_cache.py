@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.models.models import Provider
+
+
+class PrincipalCache:
+    """Resolves bearer tokens to providers without touching the database.
+
+    Two bounded LRU maps: verified tokens -> (provider id, expiry), kept
+    until the token expires, and provider id -> detached ``Provider``,
+    kept for ``provider_ttl`` seconds. Provider updates and deletes made
+    through the ORM in this process invalidate the provider entry
+    immediately; the TTL bounds staleness for changes made by other
+    workers.
+
+    Cached providers are detached from any session and shared between
+    requests, so treat them as read-only; load a fresh copy with
+    ``db.get(Provider, current_user.id)`` before modifying one.
+    """
+
+    def __init__(self, max_tokens: int, max_providers: int, provider_ttl: float):
+        self.max_tokens = max_tokens
+        self.max_providers = max_providers
+        self.provider_ttl = provider_ttl
+        self._tokens: OrderedDict = OrderedDict()
+        self._providers: OrderedDict = OrderedDict()
+
+    def resolve_token(self, token: str) -> Optional[int | str]:
+        """Return the provider id (or legacy email subject) for a valid token"""
+        now = time.time()
+        cached = self._tokens.get(token)
+        if cached and cached[1] > now:
+            self._tokens.move_to_end(token)
+            return cached[0]
+        if cached:
+            del self._tokens[token]
+
+        payload = decode_access_token(token)
+        if not payload or not payload.get("sub"):
+            return None
+        subject = payload["sub"]
+        # Tokens issued before ids were embedded carry the email as subject
+        principal = int(subject) if subject.isdigit() else subject
+        self._remember(self._tokens, token, (principal, payload.get("exp", now)), self.max_tokens)
+        return principal
+
+    async def get_provider(self, db: AsyncSession, principal: int | str) -> Optional[Provider]:
+        """Return the provider for a token subject, from cache when fresh"""
+        now = time.monotonic()
+        cached = self._providers.get(principal)
+        if cached and cached[1] > now:
+            self._providers.move_to_end(principal)
+            return cached[0]
+
+        if isinstance(principal, int):
+            provider = await db.get(Provider, principal)
+        else:
+            result = await db.execute(select(Provider).where(Provider.email == principal))
+            provider = result.scalars().first()
+        if provider is None:
+            self._providers.pop(principal, None)
+            return None
+
+        db.expunge(provider)
+        self._remember(self._providers, principal, (provider, now + self.provider_ttl), self.max_providers)
+        return provider
+
+    def invalidate_provider(self, provider: Provider):
+        self._providers.pop(provider.id, None)
+        self._providers.pop(provider.email, None)
+
+    @staticmethod
+    def _remember(entries: OrderedDict, key, value, max_entries: int):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self._tokens.clear()
+        self._providers.clear()
+
+
+principal_cache = PrincipalCache(
+    max_tokens=settings.AUTH_TOKEN_CACHE_SIZE,
+    max_providers=settings.AUTH_PROVIDER_CACHE_SIZE,
+    provider_ttl=settings.AUTH_PROVIDER_CACHE_TTL
+)
+
+
+@event.listens_for(Provider, "after_update")
+@event.listens_for(Provider, "after_delete")
+def _invalidate_changed_provider(mapper, connection, target):
+    principal_cache.invalidate_provider(target)
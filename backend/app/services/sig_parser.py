@@ -0,0 +1,221 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Everything in this module is compiled once at import time. Parsing a line
+# is a single ``finditer`` over one combined pattern; each alternative is a
+# named group so ``match.lastgroup`` tells us which token was hit.
+
+_START = r"(?<![a-z0-9])"
+_END = r"(?![a-z0-9])"
+
+# (group name, pattern, label, times per day)
+_FREQUENCIES = [
+    ("freq_qod", r"q\.?o\.?d\.?|every\s+other\s+day", "Every other day", 0.5),
+    ("freq_qh", r"q\.?\s*(?P<qh_n>\d+)\s*(?:-\s*(?P<qh_max>\d+)\s*)?h(?:rs?|ours?)?\.?", None, None),
+    ("freq_every", r"every\s+(?P<every_n>\d+)\s*(?:(?:-|to)\s*(?P<every_max>\d+)\s*)?h(?:rs?|ours?)", None, None),
+    ("freq_qid", r"q\.?i\.?d\.?|(?:four|4)\s+times\s+(?:a\s+|per\s+|each\s+)?(?:day|daily)", "Four times daily", 4),
+    ("freq_tid", r"t\.?i\.?d\.?|(?:three|3)\s+times\s+(?:a\s+|per\s+|each\s+)?(?:day|daily)", "Three times daily", 3),
+    ("freq_bid", r"b\.?i\.?d\.?|(?:twice|two\s+times|2\s+times)\s+(?:a\s+|per\s+|each\s+)?(?:day|daily)", "Twice daily", 2),
+    ("freq_qhs", r"q\.?h\.?s\.?|at\s+bedtime|nightly", "At bedtime", 1),
+    ("freq_qam", r"q\.?a\.?m\.?|every\s+morning|in\s+the\s+morning", "Every morning", 1),
+    ("freq_qpm", r"q\.?p\.?m\.?|every\s+evening|in\s+the\s+evening", "Every evening", 1),
+    ("freq_weekly", r"weekly|once\s+(?:a\s+|per\s+|each\s+)?week|q\.?\s*wk\.?", "Once weekly", 1 / 7),
+    ("freq_daily", r"once\s+(?:a\s+|per\s+|each\s+)?(?:day|daily)|q\.?d\.?|every\s+day|daily", "Once daily", 1),
+]
+
+_ROUTES = {
+    "oral": r"p\.?o\.?|by\s+mouth|orally|oral",
+    "sublingual": r"s\.?l\.?|sublingual(?:ly)?|under\s+the\s+tongue",
+    "intravenous": r"i\.?v\.?|intravenous(?:ly)?",
+    "intramuscular": r"i\.?m\.?|intramuscular(?:ly)?",
+    "subcutaneous": r"subq|sub-q|s\.?c\.?|sq|subcutaneous(?:ly)?",
+    "topical": r"topical(?:ly)?|to\s+(?:the\s+)?skin",
+    "inhaled": r"inhal(?:e|ed|ation)|by\s+inhalation",
+    "rectal": r"p\.?r\.?|rectal(?:ly)?",
+    "ophthalmic": r"ophthalmic|in(?:to)?\s+(?:each|both|the)\s+eyes?",
+    "otic": r"otic|in(?:to)?\s+(?:each|both|the)\s+ears?",
+    "nasal": r"(?:intra)?nasal(?:ly)?|in(?:to)?\s+(?:each|the)\s+nostrils?",
+    "transdermal": r"transdermal(?:ly)?",
+}
+
+_FORMS = {
+    "tablet": r"tab(?:let)?s?",
+    "capsule": r"cap(?:sule)?s?",
+    "solution": r"solution|soln",
+    "suspension": r"suspension|susp",
+    "cream": r"cream",
+    "ointment": r"ointment|oint",
+    "patch": r"patch(?:es)?",
+    "inhaler": r"inhaler",
+    "injection": r"injection|inj",
+    "drop": r"drops?|gtts?",
+    "puff": r"puffs?",
+}
+
+_UNITS = {
+    "mcg": "mcg", "µg": "mcg", "ug": "mcg",
+    "mg": "mg", "g": "g", "gm": "g",
+    "ml": "mL", "l": "L",
+    "meq": "mEq",
+    "unit": "units", "units": "units", "u": "units", "iu": "units",
+    "%": "%",
+}
+
+_NUMBER_WORDS = {"one": 1.0, "two": 2.0, "three": 3.0, "four": 4.0, "half": 0.5, "1/2": 0.5}
+
+# A value never starts inside another number ("1,2345 mg" is not 2345 mg)
+_STRENGTH = (
+    r"(?<!\d[.,])(?P<dose_value>\d{1,3}(?:,\d{3})+|\d+(?:\.\d+|,\d{1,2})?)(?:\s*/\s*\d+(?:\.\d+)?)?\s*"
+    r"(?P<dose_unit>mcg|µg|ug|mg|gm|g|ml|l|meq|units?|iu|u|%)"
+)
+_THOUSANDS = re.compile(r"\d{1,3}(?:,\d{3})+")
+_QUANTITY = r"(?:take|give|use|inhale|instill|apply)\s+(?P<qty>\d+(?:\.\d+)?|one|two|three|four|half|1/2)"
+
+
+def _alternation() -> str:
+    parts = [f"(?P<strength>{_STRENGTH})", f"(?P<quantity>{_QUANTITY})"]
+    parts += [f"(?P<{name}>{pattern})" for name, pattern, _, _ in _FREQUENCIES]
+    parts += [f"(?P<route_{name}>{pattern})" for name, pattern in _ROUTES.items()]
+    parts += [f"(?P<form_{name}>{pattern})" for name, pattern in _FORMS.items()]
+    parts.append(r"(?P<prn>p\.?r\.?n\.?|as\s+needed)")
+    return f"{_START}(?:{'|'.join(parts)}){_END}"
+
+
+SIG_PATTERN = re.compile(_alternation(), re.IGNORECASE)
+_FREQUENCY_TABLE = {name: (label, per_day) for name, _, label, per_day in _FREQUENCIES}
+
+# Leading words that never belong to a drug name
+_NAME_STOPWORDS = frozenset({
+    "take", "give", "use", "apply", "inhale", "instill", "insert", "chew",
+    "dissolve", "inject", "spray", "place", "sig", "directions",
+    "and", "then", "with", "of", "for", "the", "a", "an",
+})
+# Digits are allowed after the first letter: OCR often reads "l"/"o" as 1/0
+_NAME_TOKEN = re.compile(r"[a-z][a-z0-9\-]*", re.IGNORECASE)
+
+# Label bookkeeping lines ("Qty: 30 tablets", "Refills: 2") carry no sig
+_METADATA_LINE = re.compile(
+    r"^\s*(?:qty|quantity|refills?|rx|ndc|date|exp|dr|filled|discard)(?![a-z])",
+    re.IGNORECASE
+)
+
+
+@dataclass
+class ParsedSig:
+    """Structured dose and directions extracted from one line of label text"""
+    dose_value: Optional[float] = None
+    dose_unit: Optional[str] = None
+    dosage: str = ""
+    quantity: Optional[float] = None
+    form: Optional[str] = None
+    route: Optional[str] = None
+    frequency: str = ""
+    frequency_per_day: Optional[float] = None
+    prn: bool = False
+    name_end: int = -1  # Offset of the first sig token; text before it may be a drug name
+
+    @property
+    def is_empty(self) -> bool:
+        return self.name_end < 0
+
+    def to_dict(self) -> dict:
+        return {
+            "dose_value": self.dose_value,
+            "dose_unit": self.dose_unit,
+            "dosage": self.dosage,
+            "quantity": self.quantity,
+            "form": self.form,
+            "route": self.route,
+            "frequency": self.frequency,
+            "frequency_per_day": self.frequency_per_day,
+            "prn": self.prn,
+        }
+
+
+def parse_sig(text: str) -> ParsedSig:
+    """Extract strength, quantity, form, route and frequency from text"""
+    sig = ParsedSig()
+    for match in SIG_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if sig.name_end < 0:
+            sig.name_end = match.start()
+
+        if kind == "strength":
+            if sig.dose_value is None:
+                # "50,000 IU" has thousands separators; "1,25 mcg" a decimal comma
+                value = match.group("dose_value")
+                value = value.replace(",", "") if _THOUSANDS.fullmatch(value) else value.replace(",", ".")
+                sig.dose_value = float(value)
+                sig.dose_unit = _UNITS[match.group("dose_unit").lower()]
+                sig.dosage = f"{value} {sig.dose_unit}"
+        elif kind == "quantity":
+            if sig.quantity is None:
+                qty = match.group("qty").lower()
+                sig.quantity = _NUMBER_WORDS.get(qty) or float(qty)
+        elif kind == "prn":
+            sig.prn = True
+        elif kind.startswith("route_"):
+            sig.route = sig.route or kind[len("route_"):]
+        elif kind.startswith("form_"):
+            sig.form = sig.form or kind[len("form_"):]
+        elif not sig.frequency:
+            label, per_day = _FREQUENCY_TABLE[kind]
+            if label is None:
+                hours = int(match.group("qh_n") or match.group("every_n"))
+                if hours <= 0:
+                    continue
+                # A range ("q4-6h") is labelled as such; per day is the most it allows
+                most = match.group("qh_max") or match.group("every_max")
+                span = f"{hours}-{most}" if most and int(most) > hours else str(hours)
+                label, per_day = f"Every {span} hours", 24 / hours
+            sig.frequency = label
+            sig.frequency_per_day = round(float(per_day), 4)
+
+    if sig.prn and not sig.frequency:
+        sig.frequency = "As needed"
+    return sig
+
+
+def extract_drug_name(text: str, sig: ParsedSig) -> str:
+    """Return the words in front of the first sig token, minus filler words"""
+    prefix = text[:sig.name_end] if sig.name_end >= 0 else text
+    words = _NAME_TOKEN.findall(prefix)
+    while words and words[0].lower() in _NAME_STOPWORDS:
+        words.pop(0)
+    return " ".join(words)
+
+
+def parse_medication_lines(lines: List[dict]) -> List[dict]:
+    """Turn OCR lines (``text`` + ``confidence``) into medication suggestions.
+
+    A line with a drug name and at least one sig token starts a medication.
+    A following line with only directions ("Take 1 tablet by mouth twice
+    daily") fills in whatever the previous medication is missing.
+    """
+    medications = []
+    for ocr_line in lines:
+        line = ocr_line["text"].strip()
+        if not line or _METADATA_LINE.match(line):
+            continue
+
+        sig = parse_sig(line)
+        if sig.is_empty:
+            continue
+
+        name = extract_drug_name(line, sig)
+        if len(name) >= 3:
+            medications.append({
+                "name": name,
+                **sig.to_dict(),
+                "confidence": ocr_line.get("confidence"),
+                "raw_text": line
+            })
+        elif medications:
+            previous = medications[-1]
+            for key, value in sig.to_dict().items():
+                if value not in (None, "", False) and previous.get(key) in (None, "", False):
+                    previous[key] = value
+            previous["raw_text"] = f"{previous['raw_text']} / {line}"
+
+    return medications
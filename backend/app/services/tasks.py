@@ -0,0 +1,47 @@
+"""Tasks run by ``python -m app.worker``; see app/services/jobs.py.
+
+Workers are separate processes: in-memory caches they invalidate (the
+conflict cache, for one) are their own, and the API's copies catch up
+when their TTLs run out.
+"""
+import os
+from dataclasses import asdict
+from app.core.database import AsyncSessionLocal
+from app.services.analytics import rebuild_rollups
+from app.services.blob_store import collect_garbage
+from app.services.jobs import JobContext, task
+from app.services.medication_import import MedicationImporter
+
+
+# Not retried: rows without an upsert key would be inserted twice
+@task("medication_import", max_attempts=1)
+async def import_medication_feed(ctx: JobContext, path: str, format: str, source: str) -> dict:
+    """Import a feed spooled into JOB_FILES_DIR, then delete it"""
+    try:
+        async with AsyncSessionLocal() as db:
+            importer = MedicationImporter(db, source)
+            try:
+                with open(path, encoding="utf-8-sig", newline="") as feed:
+                    async for progress in importer.run(feed, format):
+                        if not progress.done:
+                            await ctx.report(progress.to_dict(include_errors=False))
+            except UnicodeDecodeError:
+                # Batches before the bad bytes are already committed
+                await ctx.report(importer.progress.to_dict())
+                raise ValueError("Feed is not valid UTF-8")
+        return importer.progress.to_dict()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+@task("blob_gc")
+async def collect_blob_garbage(ctx: JobContext, dry_run: bool = False) -> dict:
+    async with AsyncSessionLocal() as db:
+        return asdict(await collect_garbage(db, dry_run=dry_run))
+
+
+@task("analytics_rebuild")
+async def rebuild_analytics(ctx: JobContext) -> None:
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
@@ -0,0 +1,92 @@
+"""Conditional GETs: strong ETags and Last-Modified from row versions.
+
+A handler first looks up the versions its response is built from, with
+a query that loads no full rows. If the client already holds that
+representation it answers 304 without loading or serializing anything.
+``Cache-Control: no-cache`` lets browsers keep the body and revalidate
+with ``If-None-Match`` on every fetch.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+from fastapi import Request, Response
+
+
+@dataclass
+class Validators:
+    etag: str
+    last_modified: Optional[datetime] = None
+    cache_control: str = "private, no-cache"
+
+    @property
+    def headers(self) -> dict:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands back naive UTC timestamps
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def make_validators(parts: tuple, modified: Iterable[Optional[datetime]] = ()) -> Validators:
+    """ETag over ``parts`` (ids, versions, anything else that shapes the
+    body) and Last-Modified from the latest of ``modified``"""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    timestamps = [_utc(value).replace(microsecond=0) for value in modified if value is not None]
+    return Validators(f'"{digest}"', max(timestamps, default=None))
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """Whether the client's copy is current (RFC 9110 section 13.2.2)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == validators.etag for tag in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = _utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+        return validators.last_modified <= since
+    return False
+
+
+def if_range_matches(request: Request, validators: Validators) -> bool:
+    """Whether a Range request may be answered with a part (RFC 9110
+    section 13.1.5): no If-Range, or one naming the current version.
+
+    An entity tag is compared strongly, so weak tags never match; an
+    HTTP-date must equal Last-Modified exactly.
+    """
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', "W/")):
+        return if_range == validators.etag
+    if validators.last_modified is None:
+        return False
+    try:
+        return _utc(parsedate_to_datetime(if_range)) == validators.last_modified
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified(validators: Validators) -> Response:
+    return Response(status_code=304, headers=validators.headers)
+
+
+def set_validators(response: Response, validators: Validators):
+    response.headers.update(validators.headers)
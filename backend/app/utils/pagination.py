@@ -0,0 +1,193 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import Request, Response
+from sqlalchemy import Select, func, literal, or_, select, text, String
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class CursorPage:
+    """One page of a keyset-paginated list"""
+    items: List
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+
+@dataclass
+class Cursor:
+    created_at: datetime
+    id: int
+    direction: str = "next"  # "next": rows after the key, "prev": rows before it
+    filters: dict = field(default_factory=dict)
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    payload = {
+        "k": [cursor.created_at.isoformat(), cursor.id],
+        "d": cursor.direction,
+        "f": cursor.filters,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        created_at, row_id = payload["k"]
+        cursor = Cursor(
+            created_at=datetime.fromisoformat(created_at),
+            id=int(row_id),
+            direction=payload.get("d", "next"),
+            filters=payload.get("f") or {},
+        )
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor")
+    if cursor.direction not in ("next", "prev") or not isinstance(cursor.filters, dict):
+        raise InvalidCursor("Malformed cursor")
+    return cursor
+
+
+def resolve_cursor(token: Optional[str], filters: dict) -> Tuple[Optional[Cursor], dict]:
+    """Decode a request's cursor and work out the filters for the page.
+
+    Filters travel inside the cursor, so follow-up requests only need
+    ``cursor``; filters passed alongside it must agree with it.
+    """
+    requested = {key: value for key, value in filters.items() if value is not None}
+    if not token:
+        return None, requested
+    cursor = decode_cursor(token)
+    for key, value in requested.items():
+        if cursor.filters.get(key) != value:
+            raise InvalidCursor("Cursor does not match the requested filters")
+    return cursor, cursor.filters
+
+
+def timestamp_param(db: AsyncSession, value: datetime):
+    # SQLite stores server_default timestamps as text without microseconds,
+    # while SQLAlchemy binds datetimes with them; compare like for like.
+    if db.get_bind().dialect.name == "sqlite":
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S"
+        return literal(value.strftime(fmt), String)
+    return value
+
+
+async def estimate_count(db: AsyncSession, table_name: str) -> int:
+    """Cheap row count for an unfiltered table (planner stats or max rowid)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        estimate = await db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+            {"name": table_name}
+        )
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    elif dialect == "sqlite":
+        # Ids are never reused, so max(rowid) is an upper bound found via the b-tree
+        return int(await db.scalar(text(f'SELECT max(rowid) FROM "{table_name}"')) or 0)
+    return int(await db.scalar(text(f'SELECT count(*) FROM "{table_name}"')))
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    model,
+    limit: int,
+    cursor: Optional[Cursor] = None,
+    filters: Optional[dict] = None,
+    skip: int = 0,
+    include_total: bool = False,
+    scalars: bool = True,
+) -> CursorPage:
+    """Fetch one page of ``query`` ordered by (created_at, id).
+
+    With a cursor, the page starts right after (or, for ``prev``, ends
+    right before) the cursor's key, so every page costs one index range
+    scan regardless of depth. ``skip`` keeps the old offset behaviour for
+    existing clients and is ignored when a cursor is given. Pass
+    ``scalars=False`` for column projections; rows must still expose
+    ``created_at`` and ``id``.
+    """
+    filters = filters or {}
+    created_at, row_id = model.created_at, model.id
+    backwards = cursor is not None and cursor.direction == "prev"
+
+    page_query = query
+    if cursor is not None:
+        key = timestamp_param(db, cursor.created_at)
+        if backwards:
+            page_query = page_query.where(
+                created_at <= key, or_(created_at < key, row_id < cursor.id)
+            )
+        else:
+            page_query = page_query.where(
+                created_at >= key, or_(created_at > key, row_id > cursor.id)
+            )
+    elif skip:
+        page_query = page_query.offset(skip)
+
+    if backwards:
+        page_query = page_query.order_by(created_at.desc(), row_id.desc())
+    else:
+        page_query = page_query.order_by(created_at, row_id)
+
+    # One extra row tells us whether there is another page in this direction
+    result = await db.execute(page_query.limit(limit + 1))
+    rows = list(result.scalars().all() if scalars else result.all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    page = CursorPage(items=rows)
+    if rows:
+        first, last = rows[0], rows[-1]
+        if backwards:
+            # We came from the page after this one, so there is always a next
+            more_before, more_after = has_more, True
+        else:
+            more_before, more_after = cursor is not None or skip > 0, has_more
+        if more_before:
+            page.prev_cursor = encode_cursor(Cursor(first.created_at, first.id, "prev", filters))
+        if more_after:
+            page.next_cursor = encode_cursor(Cursor(last.created_at, last.id, "next", filters))
+
+    if include_total:
+        if filters:
+            page.total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        else:
+            page.total = await estimate_count(db, model.__tablename__)
+            page.total_is_estimate = True
+    return page
+
+
+def set_pagination_headers(request: Request, response: Response, page: CursorPage):
+    """Expose cursors as ``Link`` / ``X-Next-Cursor`` headers.
+
+    List endpoints keep returning a plain JSON array so existing clients
+    are unaffected; cursor-aware clients read the headers.
+    """
+    links = []
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        links.append(f'<{request.url.include_query_params(cursor=page.next_cursor).remove_query_params("skip")}>; rel="next"')
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
+        links.append(f'<{request.url.include_query_params(cursor=page.prev_cursor).remove_query_params("skip")}>; rel="prev"')
+    if links:
+        response.headers["Link"] = ", ".join(links)
+    if page.total is not None:
+        response.headers["X-Total-Count"] = str(page.total)
+        if page.total_is_estimate:
+            response.headers["X-Total-Count-Estimated"] = "true"
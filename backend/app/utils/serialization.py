@@ -0,0 +1,62 @@
+"""Fast JSON for list endpoints.
+
+List handlers select only the columns their response model needs (or the
+subset named in ``fields=``), build dicts straight from the row tuples
+and encode them with orjson, skipping ORM hydration and response model
+validation. Everything else is encoded by ``ORJSONResponse`` too, as the
+app's default response class. A ``fields=`` response is not described by
+the endpoint's OpenAPI schema; the parameter's description says so.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import orjson
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse as FastAPIORJSONResponse
+from pydantic import BaseModel
+
+FIELDS = Query(None, description=(
+    "Comma-separated fields to return (sparse fieldset); default all. "
+    "Items then hold only those fields, so they do not match the documented "
+    "response schema, whose fields are all required."
+))
+
+
+class ORJSONResponse(FastAPIORJSONResponse):
+    def render(self, content) -> bytes:
+        # FastAPI's options plus "Z" for UTC, as pydantic writes it
+        return orjson.dumps(
+            content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+
+def response_columns(model, response_model: type[BaseModel], **columns) -> Dict[str, object]:
+    """Response field name -> column, taken from ``model`` unless given"""
+    return {
+        name: columns[name] if name in columns else getattr(model, name)
+        for name in response_model.model_fields
+    }
+
+
+def select_fields(columns: Dict[str, object], fields: Optional[str], keys: Sequence = ()) -> Tuple[List[str], list]:
+    """Output names and SELECT list for a ``fields=`` value (None: all).
+
+    ``keys`` (paging columns) are selected after the fields and never output.
+    """
+    if fields is None:
+        names = list(columns)
+    else:
+        names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in names if name not in columns]
+        if unknown or not names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}. Available: {', '.join(columns)}"
+            )
+    return names, [columns[name] for name in names] + list(keys)
+
+
+def rows_response(names: List[str], rows, response: Optional[Response] = None) -> ORJSONResponse:
+    """Encode rows selected by ``select_fields``, keeping ``response``'s headers"""
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return ORJSONResponse([dict(zip(names, row)) for row in rows], headers=headers)
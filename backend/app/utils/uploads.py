@@ -0,0 +1,199 @@
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+import aiofiles
+import aiofiles.os
+from fastapi import Request, Response, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from app.utils.conditional import Validators, if_range_matches, is_not_modified, not_modified
+
+# Magic-number prefixes of the image formats we accept
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+IMAGE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+}
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+
+class UnsupportedImageType(Exception):
+    """Raised when an upload's bytes are not a recognised image format"""
+
+
+@dataclass
+class StreamedUpload:
+    """An upload written to a temporary file in a staging directory"""
+    temp_path: str
+    content_hash: str
+    content_type: str
+    size: int
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_EXTENSIONS.get(self.content_type, "")
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect the image MIME type from the first bytes of a file"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+async def stream_upload_to_disk(
+    file: UploadFile,
+    directory: str,
+    max_size: int,
+    allowed_types: list,
+    chunk_size: int = 64 * 1024,
+) -> StreamedUpload:
+    """Copy an upload to disk chunk by chunk.
+
+    The SHA-256 and the real image type are computed in the same pass, and
+    the copy stops as soon as ``max_size`` is crossed, so at most one chunk
+    is held in memory. The data lands in a temporary file in ``directory``
+    (on the same filesystem as its final location); hand it to a blob store
+    or call ``discard_upload`` afterwards.
+    """
+    temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    content_type = None
+    size = 0
+
+    try:
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+
+                if content_type is None:
+                    content_type = sniff_image_type(chunk)
+                    if content_type not in allowed_types:
+                        raise UnsupportedImageType()
+
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge()
+
+                digest.update(chunk)
+                await buffer.write(chunk)
+
+        if content_type is None:
+            raise UnsupportedImageType()
+    except BaseException:
+        await aiofiles.os.remove(temp_path)
+        raise
+
+    return StreamedUpload(
+        temp_path=temp_path,
+        content_hash=digest.hexdigest(),
+        content_type=content_type,
+        size=size,
+    )
+
+
+async def discard_upload(upload: StreamedUpload):
+    """Remove a streamed upload's temporary file"""
+    await aiofiles.os.remove(upload.temp_path)
+
+
+class UnsatisfiableRange(Exception):
+    """Raised when a Range header asks only for bytes past the end of the file"""
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """First and last byte of a single ``bytes=`` range, clamped to ``size``.
+
+    Returns None for anything else (multiple ranges, other units, bad
+    syntax); the whole file is sent then, as RFC 9110 allows.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise UnsatisfiableRange()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start < 0 or (last and start > end):
+        return None
+    if start >= size:
+        raise UnsatisfiableRange()
+    return start, min(end, size - 1)
+
+
+async def _read_range(path: str, start: int, end: int, chunk_size: int):
+    async with aiofiles.open(path, "rb") as stored:
+        await stored.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await stored.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def immutable_file_validators(path: str, max_age: int) -> Validators:
+    """Validators for a file that never changes under its name"""
+    stat = os.stat(path)
+    return Validators(
+        etag=f'"{os.path.splitext(os.path.basename(path))[0]}"',
+        last_modified=datetime.fromtimestamp(int(stat.st_mtime), timezone.utc),
+        cache_control=f"private, max-age={max_age}, immutable",
+    )
+
+
+def serve_file(
+    request: Request,
+    path: str,
+    media_type: Optional[str],
+    validators: Validators,
+    chunk_size: int = 64 * 1024,
+) -> Response:
+    """Send a stored file with ETag/Last-Modified, 304s and byte ranges"""
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+
+    size = os.stat(path).st_size
+    headers = {**validators.headers, "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range")
+    # A range against an older copy (If-Range mismatch) gets the whole file
+    if range_header and if_range_matches(request, validators):
+        try:
+            byte_range = parse_range(range_header, size)
+        except UnsatisfiableRange:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                _read_range(path, start, end, chunk_size),
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)},
+            )
+    return FileResponse(path, media_type=media_type, headers=headers)
@@ -0,0 +1,188 @@
+"""Background job worker.
+
+    python -m app.worker [--processes N]
+    python -m app.worker --enqueue blob_gc [--payload '{"dry_run": true}'] [--priority 5]
+
+Starts N worker processes (JOB_WORKER_PROCESSES by default) that claim
+jobs from the database queue one at a time and run them; see
+app/services/jobs.py. A worker that dies is restarted. SIGINT/SIGTERM
+stops claiming new jobs and lets running ones finish.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine
+from app.core.logs import configure_logging
+from app.models.models import Job
+from app.services import tasks  # noqa: F401  Registers the tasks
+from app.services.jobs import (
+    TASKS, JobContext, UnknownTask, claim, complete, enqueue, fail, heartbeat, purge_finished, reclaim_expired
+)
+
+PURGE_INTERVAL = 3600  # Seconds between deletions of old finished jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    def __init__(self, worker_id: str):
+        self.id = worker_id
+        self.stopping = asyncio.Event()
+        self._reclaimed_at = self._purged_at = float("-inf")
+
+    async def run(self):
+        while not self.stopping.is_set():
+            if not await self.run_once():
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self) -> bool:
+        """Claim and run one job; False if there was none"""
+        async with AsyncSessionLocal() as db:
+            await self.maintain(db)
+            job = await claim(db, self.id)
+        if job is None:
+            return False
+        await self.execute(job)
+        return True
+
+    async def maintain(self, db):
+        """Requeue jobs whose lease ran out and delete old finished ones,
+        each on its own interval rather than on every poll"""
+        now = time.monotonic()
+        if now - self._reclaimed_at >= settings.JOB_RECLAIM_INTERVAL:
+            await reclaim_expired(db)
+            self._reclaimed_at = now
+        if now - self._purged_at >= PURGE_INTERVAL:
+            await purge_finished(db)
+            self._purged_at = now
+
+    async def execute(self, job: Job):
+        logger.info("job %s (%s) attempt %s/%s", job.id, job.kind, job.attempts, job.max_attempts)
+        registered = TASKS.get(job.kind)
+        if registered is None:
+            async with AsyncSessionLocal() as db:
+                await fail(db, job, self.id, f"No task registered for {job.kind!r}")
+            return
+
+        started = time.perf_counter()
+        running = asyncio.create_task(registered.func(JobContext(job, self.id, AsyncSessionLocal), **job.payload))
+        keeping = asyncio.create_task(self._keep_lease(job, running, registered.lease_seconds / 3))
+        try:
+            result = await running
+        except asyncio.CancelledError:
+            if not keeping.done() or keeping.cancelled():
+                raise
+            logger.warning("job %s lost its lease; abandoned", job.id)
+            return
+        except Exception as e:
+            logger.exception("job %s failed", job.id)
+            async with AsyncSessionLocal() as db:
+                await fail(db, job, self.id, f"{e.__class__.__name__}: {e}")
+            return
+        finally:
+            keeping.cancel()
+        async with AsyncSessionLocal() as db:
+            await complete(db, job, self.id, result)
+        logger.info("job %s done in %.1fs", job.id, time.perf_counter() - started)
+
+    async def _keep_lease(self, job: Job, running: asyncio.Task, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            async with AsyncSessionLocal() as db:
+                if not await heartbeat(db, job, self.id):
+                    # Reclaimed by another worker; stop before both write
+                    running.cancel()
+                    return
+
+
+async def _serve():
+    worker = Worker(f"{socket.gethostname()}:{os.getpid()}")
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stopping.set)
+    logger.info("worker %s started", worker.id)
+    try:
+        await worker.run()
+    finally:
+        await engine.dispose()
+    logger.info("worker %s stopped", worker.id)
+
+
+def serve():
+    """Entry point of one worker process"""
+    configure_logging()
+    asyncio.run(_serve())
+
+
+def supervise(processes: int) -> int:
+    """Run ``processes`` workers, restarting any that die, until signalled"""
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = [context.Process(target=serve, name=f"worker-{index}") for index in range(processes)]
+    for process in workers:
+        process.start()
+    while not stopping:
+        time.sleep(1)
+        for index, process in enumerate(workers):
+            if not process.is_alive() and not stopping:
+                logger.warning("%s exited with %s; restarting", process.name, process.exitcode)
+                workers[index] = context.Process(target=serve, name=process.name)
+                workers[index].start()
+    for process in workers:
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+    for process in workers:
+        process.join()
+    return 0
+
+
+async def _enqueue(kind: str, payload: dict, priority: int) -> Job:
+    try:
+        async with AsyncSessionLocal() as db:
+            return await enqueue(db, kind, payload, priority)
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    parser.add_argument("--enqueue", metavar="KIND", help=f"Queue a job instead: one of {', '.join(sorted(TASKS))}")
+    parser.add_argument("--payload", default="{}", help="JSON object of task arguments, with --enqueue")
+    parser.add_argument("--priority", type=int, default=0, help="With --enqueue; higher runs first")
+    args = parser.parse_args()
+
+    if args.enqueue:
+        try:
+            job = asyncio.run(_enqueue(args.enqueue, json.loads(args.payload), args.priority))
+        except UnknownTask:
+            parser.error(f"unknown task {args.enqueue!r}")
+        print(f"Queued job {job.id} ({job.kind})")
+        return 0
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    configure_logging()
+    return supervise(args.processes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
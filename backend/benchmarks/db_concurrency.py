@@ -0,0 +1,155 @@
+"""Concurrency benchmark for the async data path.
+
+Seeds a throwaway database, then drives authenticated list/detail requests
+through the ASGI app at increasing numbers of in-flight requests and
+reports throughput and latency at each level.
+
+    python -m benchmarks.db_concurrency
+    python -m benchmarks.db_concurrency --url postgresql://user:pw@localhost/bench
+
+The database URL must be set before the app is imported, so ``--url``
+(default: a temporary SQLite file) is exported as DATABASE_URL first.
+
+Against the default SQLite file the numbers stay flat (about 300 req/s
+from 1 to 16 in flight on a laptop): each query takes a fraction of a
+millisecond, so a request is almost all Python work on the one event loop,
+which the in-process client shares. Extra in-flight requests only queue
+for that loop, so p50 grows with the level while req/s stays put. The pool
+(DB_POOL_SIZE + DB_MAX_OVERFLOW connections) is not the limit, and nor is
+auth: principals are cached and bcrypt only runs at login. Async pays off
+when requests wait on the database, as they do on a networked server.
+``--latency-ms`` models that by delaying every SQLite statement in the
+driver's thread, off the event loop:
+
+    python -m benchmarks.db_concurrency --latency-ms 2
+
+With 2 ms per statement, throughput goes from about 120 req/s at 1 in
+flight to about 320 at 4-16, until the loop is saturated again.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--patients", type=int, default=2_000)
+    parser.add_argument("--requests", type=int, default=2_000, help="Requests per concurrency level")
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Delay added to each SQLite statement, like a network round trip")
+    return parser.parse_args()
+
+
+def add_statement_latency():
+    """Give SQLite connections opened from now on a per-statement delay.
+
+    aiosqlite runs each connection in its own thread, so the sleep blocks
+    that connection but not the event loop. The delay is read from
+    ``STATEMENT_LATENCY`` on every statement, so seeding can run at 0.
+    """
+    import sqlite3
+
+    class SlowCursor(sqlite3.Cursor):
+        def execute(self, *args):
+            time.sleep(STATEMENT_LATENCY)
+            return super().execute(*args)
+
+        def executemany(self, *args):
+            time.sleep(STATEMENT_LATENCY)
+            return super().executemany(*args)
+
+    class SlowConnection(sqlite3.Connection):
+        def cursor(self, factory=SlowCursor):
+            return super().cursor(factory)
+
+    connect = sqlite3.connect
+
+    def slow_connect(*args, **kwargs):
+        kwargs.setdefault("factory", SlowConnection)
+        return connect(*args, **kwargs)
+
+    sqlite3.connect = slow_connect
+
+
+STATEMENT_LATENCY = 0.0  # Seconds; set after seeding
+
+
+async def seed(n_patients: int) -> str:
+    from app.core.database import AsyncSessionLocal, create_tables
+    from app.core.security import create_access_token, get_password_hash
+    from app.models.models import Medication, Patient, Provider
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        provider = Provider(name="Bench", email="bench@example.com", hashed_password=get_password_hash("bench"))
+        db.add(provider)
+        for i in range(n_patients):
+            patient = Patient(first_name=f"First{i}", last_name=f"Last{i}", date_of_birth=date(1950, 1, 1))
+            patient.medications = [
+                Medication(name=f"Drug{j}", dosage="10 mg", frequency="Once daily", source="manual")
+                for j in range(3)
+            ]
+            db.add(patient)
+        await db.commit()
+    return create_access_token(subject=provider.email)
+
+
+async def run_level(client, headers, n_requests: int, in_flight: int, n_patients: int) -> tuple:
+    latencies = []
+    semaphore = asyncio.Semaphore(in_flight)
+
+    async def one(i: int):
+        # Mix of list and detail reads, like a dashboard page load
+        path = "/api/v1/patients/?limit=50" if i % 3 == 0 else \
+            f"/api/v1/medications/?patient_id={i % n_patients + 1}"
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return n_requests / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+async def main(args):
+    import httpx
+    from app.core.database import engine
+    from app.main import app
+
+    global STATEMENT_LATENCY
+    if args.latency_ms:
+        if args.url:
+            raise SystemExit("--latency-ms only applies to the SQLite default; a real server has its own")
+        add_statement_latency()
+    token = await seed(args.patients)
+    STATEMENT_LATENCY = args.latency_ms / 1000
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up pools and caches
+        await run_level(client, headers, 50, 4, args.patients)
+        if args.latency_ms:
+            print(f"{args.latency_ms:g} ms added to each statement")
+        print(f"{'in-flight':>9}  {'req/s':>8}  {'p50 ms':>7}  {'p95 ms':>7}")
+        for level in [int(x) for x in args.levels.split(",")]:
+            rps, p50, p95 = await run_level(client, headers, args.requests, level, args.patients)
+            print(f"{level:>9}  {rps:>8.0f}  {p50 * 1000:>7.1f}  {p95 * 1000:>7.1f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("UPLOAD_DIR", os.path.join(tmp, "uploads"))
+        asyncio.run(main(args))
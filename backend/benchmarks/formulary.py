@@ -0,0 +1,88 @@
+"""Lookup latency and memory benchmark for the formulary index.
+
+Builds a synthetic formulary (or loads one with --path), then times fuzzy
+resolution of OCR-damaged names and prefix autocomplete.
+
+    python -m benchmarks.formulary --entries 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from app.services.formulary import Formulary, load_formulary
+
+ONSETS = ["b", "c", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "v", "x", "z",
+          "br", "ch", "cl", "cr", "dr", "fl", "gl", "gr", "ph", "pr", "qu", "sc", "st", "th", "tr", "tz"]
+NUCLEI = ["a", "e", "i", "o", "u", "y", "ai", "ea", "io", "ou", "ia"]
+SUFFIXES = ["pril", "mine", "statin", "pine", "xine", "terol", "prazole", "pentin", "line", "rin", "olol", "sartan", "mab", "cillin"]
+OCR_DAMAGE = {"l": "1", "o": "0", "s": "5", "i": "1", "b": "8"}
+
+
+def _syllables(rng: random.Random, low: int, high: int) -> str:
+    return "".join(rng.choice(ONSETS) + rng.choice(NUCLEI) for _ in range(rng.randint(low, high)))
+
+
+def synthetic_formulary(n_entries: int, ndcs_per_drug: int = 5, seed: int = 11) -> Formulary:
+    """Drug-like names (syllables plus a class suffix), several NDC rows each,
+    roughly the shape of a real NDC-level formulary"""
+    rng = random.Random(seed)
+    formulary = Formulary()
+    i = 0
+    while i < n_entries:
+        generic = (_syllables(rng, 2, 3) + rng.choice(SUFFIXES)).capitalize()
+        brand = _syllables(rng, 2, 3).upper()
+        for strength in rng.sample([2.5, 5, 10, 20, 25, 40, 50, 100], ndcs_per_drug):
+            formulary.add(brand, generic, f"{i:05d}-{rng.randint(0, 9999):04d}-01", f"{strength:g} mg")
+            i += 1
+    formulary.finalize("synthetic")
+    return formulary
+
+
+def damage(name: str, rng: random.Random) -> str:
+    chars = list(name)
+    for _ in range(2):
+        i = rng.randrange(len(chars))
+        chars[i] = OCR_DAMAGE.get(chars[i].lower(), chars[i])
+    return "".join(chars).upper()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--path", help="Load a real formulary CSV/SQLite instead")
+    parser.add_argument("--queries", type=int, default=5_000)
+    args = parser.parse_args()
+
+    def build():
+        return load_formulary(args.path) if args.path else synthetic_formulary(args.entries)
+
+    start = time.perf_counter()
+    build()
+    load_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    formulary = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"loaded {len(formulary):,} entries ({len(formulary._names):,} names) in {load_time:.2f}s, "
+          f"index {current / 2**20:.1f} MiB (peak {peak / 2**20:.1f} MiB)")
+
+    rng = random.Random(3)
+    names = [formulary._name_display[rng.randrange(len(formulary._names))] for _ in range(args.queries)]
+    noisy = [damage(name, rng) for name in names]
+
+    start = time.perf_counter()
+    hits = sum(1 for query in noisy if formulary.resolve(query))
+    elapsed = time.perf_counter() - start
+    print(f"resolve       {elapsed / len(noisy) * 1e6:8.1f} us/lookup  ({hits}/{len(noisy)} resolved)")
+
+    prefixes = [name[:4] for name in names]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        formulary.autocomplete(prefix, limit=10)
+    elapsed = time.perf_counter() - start
+    print(f"autocomplete  {elapsed / len(prefixes) * 1e6:8.1f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Throughput benchmark for bulk medication feed imports.
+
+Writes a synthetic pharmacy feed (CSV or NDJSON) for a set of patients
+identified by MRN, imports it into a temporary SQLite database with
+``MedicationImporter``, then imports it again so the second pass is all
+upserts on (patient, NDC, last_filled).
+
+    python -m benchmarks.medication_import
+    python -m benchmarks.medication_import --rows 500000 --format ndjson
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+DRUGS = [("Lisinopril", "10 mg"), ("Metformin", "500 mg"), ("Atorvastatin", "20 mg"),
+         ("Amlodipine", "5 mg"), ("Levothyroxine", "50 mcg"), ("Omeprazole", "20 mg"),
+         ("Losartan", "50 mg"), ("Sertraline", "50 mg"), ("Gabapentin", "300 mg")]
+FREQUENCIES = ["once daily", "twice daily", "at bedtime", "every 8 hours"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def write_feed(path: str, fmt: str, rows: int, patients: int, rng: random.Random):
+    start = date(2025, 1, 1)
+    columns = ["mrn", "name", "dosage", "frequency", "ndc", "last_filled"]
+    with open(path, "w", newline="") as out:
+        writer = csv.writer(out) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        for i in range(rows):
+            drug, dose = rng.choice(DRUGS)
+            row = [
+                f"MRN{rng.randrange(patients):08d}", drug, dose, rng.choice(FREQUENCIES),
+                f"{rng.randrange(10**10):010d}", (start + timedelta(days=i % 365)).isoformat(),
+            ]
+            if writer:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(dict(zip(columns, row))) + "\n")
+
+
+async def run(path: str, fmt: str, patients: int, batch_size):
+    from sqlalchemy import insert
+    from app.core.database import AsyncSessionLocal, create_tables, engine
+    from app.models.models import Patient
+    from app.services.medication_import import MedicationImporter
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Patient.__table__), [
+            {"first_name": "Test", "last_name": f"Patient{i}", "date_of_birth": date(1960, 1, 1), "mrn": f"MRN{i:08d}"}
+            for i in range(patients)
+        ])
+        await db.commit()
+
+    for label in ("insert", "upsert"):
+        with open(path, encoding="utf-8-sig", newline="") as feed:
+            async with AsyncSessionLocal() as db:
+                importer = MedicationImporter(db, "pharmacy", batch_size)
+                async for progress in importer.run(feed, fmt):
+                    pass
+        print(
+            f"{label}: {progress.rows:,} rows in {progress.elapsed:.1f}s "
+            f"({progress.rows / progress.elapsed * 60:,.0f} rows/min), "
+            f"{progress.inserted:,} inserted, {progress.updated:,} updated, {progress.failed:,} failed"
+        )
+    await engine.dispose()
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'import.db')}"
+        feed = os.path.join(tmp, f"feed.{args.format}")
+        write_feed(feed, args.format, args.rows, args.patients, rng)
+        asyncio.run(run(feed, args.format, args.patients, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Latency benchmark for GET /patients/search on a large patient table.
+
+Bulk-loads synthetic patients into a temporary SQLite database (indexes
+built after the load), then times a mix of prefix, full-name, MRN, email
+and DOB-qualified searches through ``search_patients``.
+
+    python -m benchmarks.patient_search
+    python -m benchmarks.patient_search --patients 1000000 --queries 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+FIRST = ["james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda", "david",
+         "elizabeth", "william", "barbara", "richard", "susan", "joseph", "jessica", "thomas", "sarah",
+         "maria", "nguyen", "wei", "aisha", "omar", "priya", "diego", "yuki", "fatima", "ivan"]
+SYLLABLES = ["son", "ler", "man", "ton", "ez", "ski", "ber", "well", "ford", "ham", "ino",
+             "sen", "ova", "ley", "ger", "ry", "dt", "ka", "lo", "mor", "ris", "van", "ch"]
+ONSETS = ["sm", "j", "w", "br", "d", "m", "g", "h", "r", "l", "k", "p", "st", "th", "c", "n"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def last_name(rng: random.Random) -> str:
+    return (rng.choice(ONSETS) + rng.choice("aeiou") + "".join(
+        rng.choice(SYLLABLES) for _ in range(rng.randint(1, 2))
+    )).capitalize()
+
+
+def build(path: str, n: int, rng: random.Random) -> list:
+    """Create the schema through the app, bulk insert with sqlite3, then index"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.schema import CreateTable
+    from app.models.models import Patient
+
+    sync_engine = create_engine(f"sqlite:///{path}")
+    with sync_engine.begin() as conn:
+        conn.execute(CreateTable(Patient.__table__))
+    sync_engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    sample = []
+    start = date(1930, 1, 1)
+    batch = []
+    for i in range(1, n + 1):
+        first = rng.choice(FIRST).capitalize()
+        last = last_name(rng)
+        dob = start + timedelta(days=rng.randrange(365 * 80))
+        mrn = f"MRN{i:08d}"
+        email = f"{first}.{last}{i}@example.com".lower()
+        batch.append((first, last, dob.isoformat(), email, mrn))
+        if rng.random() < 0.001:
+            sample.append((first, last, dob, email, mrn))
+        if len(batch) == 50_000:
+            conn.executemany(
+                "INSERT INTO patients (first_name, last_name, date_of_birth, email, mrn, created_at)"
+                " VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", batch
+            )
+            batch.clear()
+    if batch:
+        conn.executemany(
+            "INSERT INTO patients (first_name, last_name, date_of_birth, email, mrn, created_at)"
+            " VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)", batch
+        )
+    conn.commit()
+    conn.close()
+    return sample
+
+
+def make_queries(sample: list, count: int, rng: random.Random) -> list:
+    kinds = [
+        lambda p: (p[1][:3], None),  # Last-name prefix
+        lambda p: (p[0][:2], None),  # First-name prefix
+        lambda p: (f"{p[0]} {p[1][:4]}", None),  # First + last prefix
+        lambda p: (f"{p[1]}, {p[0]}", None),  # "Last, First"
+        lambda p: (p[4], None),  # MRN
+        lambda p: (p[3][:p[3].index("@") + 3], None),  # Email prefix
+        lambda p: (p[3], None),  # Full email
+        lambda p: (p[1][:3], p[2]),  # DOB-qualified
+    ]
+    return [rng.choice(kinds)(rng.choice(sample)) for _ in range(count)]
+
+
+async def run(queries: list):
+    from app.core.database import AsyncSessionLocal, create_tables, engine
+    from app.services.patient_search import search_patients
+
+    started = time.perf_counter()
+    await create_tables()  # Builds the search indexes on the loaded table
+    print(f"indexes built in {time.perf_counter() - started:.1f}s")
+
+    timings = []
+    async with AsyncSessionLocal() as db:
+        for q, dob in queries[:20]:  # Warm up
+            await search_patients(db, q, date_of_birth=dob)
+        for q, dob in queries:
+            start = time.perf_counter()
+            await search_patients(db, q, date_of_birth=dob)
+            timings.append((time.perf_counter() - start) * 1000)
+            db.expunge_all()
+    await engine.dispose()
+    timings.sort()
+    print(
+        f"{len(timings)} searches: p50 {statistics.median(timings):.2f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms, max {timings[-1]:.2f} ms"
+    )
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "patients.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        started = time.perf_counter()
+        sample = build(path, args.patients, rng)
+        print(f"loaded {args.patients:,} patients in {time.perf_counter() - started:.1f}s")
+        asyncio.run(run(make_queries(sample, args.queries, rng)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Throughput benchmark for the sig/dosage parser.
+
+Builds a synthetic corpus of prescription-label lines and times the parser
+over it, the way a bulk re-parse of historical notes would run.
+
+    python -m benchmarks.sig_parser --lines 200000
+"""
+import argparse
+import random
+import time
+from app.services.sig_parser import parse_sig, parse_medication_lines
+
+DRUGS = [
+    "Lisinopril", "METFORMIN HCL ER", "Atorvastatin", "Amlodipine Besylate",
+    "Levothyroxine", "Albuterol HFA", "Omeprazole DR", "Gabapentin",
+    "Hydrochlorothiazide", "Sertraline", "Warfarin", "Insulin Glargine",
+]
+STRENGTHS = ["5 mg", "10mg", "20 MG", "500MG", "90 mcg", "0.125 mg", "100 units", "40mg/5ml"]
+FORMS = ["tablet", "TAB", "capsule", "caps", "inhaler", "solution", ""]
+SIGS = [
+    "Take 1 tablet by mouth once daily",
+    "TAKE TWO TABLETS BID WITH MEALS",
+    "take one cap po tid",
+    "Inhale 2 puffs q4-6h prn wheezing",
+    "Take 1 tab qhs",
+    "Take 1 tablet every 8 hours as needed for pain",
+    "Apply topically twice a day",
+    "Inject 10 units subq every morning",
+    "1 tab PO q.d.",
+    "Take half tablet every other day",
+]
+NOISE = ["CVS Pharmacy #1234", "Rx# 0012345", "Qty: 30 Refills: 2", "Dr. J Smith MD", "Discard after 01/2027"]
+
+
+def build_corpus(n_lines: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    lines = []
+    while len(lines) < n_lines:
+        lines.append(f"{rng.choice(DRUGS)} {rng.choice(STRENGTHS)} {rng.choice(FORMS)}".strip())
+        lines.append(rng.choice(SIGS))
+        if rng.random() < 0.5:
+            lines.append(rng.choice(NOISE))
+    return lines[:n_lines]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.lines)
+    ocr_lines = [{"text": line, "confidence": None} for line in corpus]
+
+    for label, run in [
+        ("parse_sig", lambda: [parse_sig(line) for line in corpus]),
+        ("parse_medication_lines", lambda: parse_medication_lines(ocr_lines)),
+    ]:
+        best = min(_timed(run) for _ in range(args.repeat))
+        print(
+            f"{label:<24} {len(corpus):>8} lines  {best:7.3f}s  "
+            f"{len(corpus) / best:>10,.0f} lines/s  {best / len(corpus) * 1e6:6.2f} us/line"
+        )
+
+
+def _timed(run) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
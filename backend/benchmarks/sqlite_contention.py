@@ -0,0 +1,158 @@
+"""Read/write contention benchmark for SQLite across worker processes.
+
+Starts several processes (like ``uvicorn --workers N``) against one SQLite
+file. Each runs concurrent readers (patient list + medication count) and
+writers (medication inserts) through the app's engine for a fixed time,
+and the totals are reported per pragma profile: SQLite's defaults
+(rollback journal, no busy timeout) and the tuned settings.
+
+    python -m benchmarks.sqlite_contention
+    python -m benchmarks.sqlite_contention --workers 4 --seconds 10 --profile tuned
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date
+
+# Settings overrides per profile; "tuned" uses the Settings defaults
+PROFILES = {
+    "default": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "0",
+        "SQLITE_CACHE_SIZE_KB": "2000",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_TEMP_STORE": "DEFAULT",
+    },
+    "tuned": {},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="Processes sharing the database")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent readers per process")
+    parser.add_argument("--writers", type=int, default=2, help="Concurrent writers per process")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--profile", choices=[*PROFILES, "all"], default="all")
+    return parser.parse_args()
+
+
+def configure(db_path: str, profile: str):
+    """Point the app at ``db_path`` with the profile's pragmas (before import)"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.update(PROFILES[profile])
+
+
+async def seed(n_patients: int):
+    from app.core.database import AsyncSessionLocal, create_tables, engine
+    from app.models.models import Patient
+
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            Patient(first_name=f"First{i}", last_name=f"Last{i}", date_of_birth=date(1950, 1, 1))
+            for i in range(n_patients)
+        )
+        await db.commit()
+    await engine.dispose()
+
+
+async def hammer(args, worker: int) -> dict:
+    from sqlalchemy import func, select
+    from sqlalchemy.exc import OperationalError
+    from app.core.database import AsyncSessionLocal, engine
+    from app.models.models import Medication, Patient
+
+    counts = {"reads": 0, "writes": 0, "locked": 0, "errors": 0}
+    deadline = time.perf_counter() + args.seconds
+
+    async def guarded(op):
+        try:
+            await op()
+        except OperationalError as e:
+            counts["locked" if "locked" in str(e) else "errors"] += 1
+
+    async def reader():
+        async def read():
+            async with AsyncSessionLocal() as db:
+                await db.execute(select(Patient).order_by(Patient.last_name).limit(50))
+                await db.scalar(select(func.count(Medication.id)))
+            counts["reads"] += 1
+        while time.perf_counter() < deadline:
+            await guarded(read)
+
+    async def writer(n: int):
+        async def write():
+            async with AsyncSessionLocal() as db:
+                db.add(Medication(
+                    patient_id=(worker * 7919 + n * 104729 + counts["writes"]) % args.patients + 1,
+                    name="Benchmark", dosage="10 mg", frequency="Once daily", source="manual"
+                ))
+                await db.commit()
+            counts["writes"] += 1
+        while time.perf_counter() < deadline:
+            await guarded(write)
+
+    await asyncio.gather(
+        *(reader() for _ in range(args.readers)),
+        *(writer(n) for n in range(args.writers)),
+    )
+    await engine.dispose()
+    return counts
+
+
+def run_seed(args, db_path: str, profile: str):
+    configure(db_path, profile)
+    asyncio.run(seed(args.patients))
+
+
+def run_worker(args, db_path: str, profile: str, worker: int, results):
+    configure(db_path, profile)
+    results.put(asyncio.run(hammer(args, worker)))
+
+
+def run_profile(args, profile: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "contention.db")
+        # Seed with the same profile so the journal mode is set on the file
+        seeder = multiprocessing.Process(target=run_seed, args=(args, db_path, profile))
+        seeder.start()
+        seeder.join()
+
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=run_worker, args=(args, db_path, profile, i, results))
+            for i in range(args.workers)
+        ]
+        for process in workers:
+            process.start()
+        totals = {"reads": 0, "writes": 0, "locked": 0, "errors": 0}
+        for _ in workers:
+            for key, value in results.get().items():
+                totals[key] += value
+        for process in workers:
+            process.join()
+
+    print(
+        f"{profile:>8}  {totals['reads'] / args.seconds:>9.0f}  {totals['writes'] / args.seconds:>9.0f}"
+        f"  {totals['locked']:>7}  {totals['errors']:>6}"
+    )
+
+
+def main():
+    args = parse_args()
+    print(f"{args.workers} workers x ({args.readers} readers + {args.writers} writers), {args.seconds:g}s")
+    print(f"{'profile':>8}  {'reads/s':>9}  {'writes/s':>9}  {'locked':>7}  {'other':>6}")
+    for profile in PROFILES if args.profile == "all" else [args.profile]:
+        run_profile(args, profile)
+
+
+if __name__ == "__main__":
+    # Fork would inherit an already-imported engine; each worker builds its own
+    multiprocessing.set_start_method("spawn")
+    main()
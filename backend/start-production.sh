@@ -25,7 +25,7 @@ chmod 755 uploads
 
 # Run database migrations/initialization
 echo "📊 Initializing database..."
-python -c "from app.core.database import create_tables; create_tables()"
+alembic upgrade head
 
 # Print startup information
 echo "✅ Database initialized"
@@ -0,0 +1,122 @@
+"""Shared fixtures.
+
+Settings are read when ``app`` is first imported, so the environment is
+pointed at a throwaway database and upload directory before that. One
+event loop and one schema serve the whole session; tests that need a
+clean table delete its rows themselves.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="pharmd-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(TEST_DIR, "uploads")
+os.environ["JOB_FILES_DIR"] = os.path.join(TEST_DIR, "job_files")
+os.environ["FORMULARY_PATH"] = ""
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+async def database():
+    from app.core.database import create_tables, engine
+
+    await create_tables()
+    yield engine
+    await engine.dispose()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+async def db(database):
+    from app.core.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+async def client(database):
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+async def auth_headers(client):
+    from app.core.database import AsyncSessionLocal
+    from app.core.security import get_password_hash
+    from app.models.models import Provider
+
+    async with AsyncSessionLocal() as session:
+        session.add(Provider(name="Test Provider", email="tests@example.com", hashed_password=get_password_hash("tests")))
+        await session.commit()
+    login = await client.post("/api/v1/auth/token", data={"username": "tests@example.com", "password": "tests"})
+    login.raise_for_status()
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+async def seeded(auth_headers):
+    """30 patients with three medications and an open reconciliation each"""
+    from types import SimpleNamespace
+    from datetime import date
+    from sqlalchemy import select
+    from app.core.database import AsyncSessionLocal
+    from app.models.models import Medication, Patient, Provider, Reconciliation
+
+    async with AsyncSessionLocal() as session:
+        provider = await session.scalar(select(Provider).where(Provider.email == "tests@example.com"))
+        patients = []
+        for i in range(30):
+            patient = Patient(
+                first_name=f"First{i}", last_name=f"Smith{i}", date_of_birth=date(1950, 1, 1 + i % 28),
+                email=f"p{i}@example.com", mrn=f"MRN{i:04d}"
+            )
+            patient.medications = [
+                Medication(name=f"Drug{j}", dosage="10 mg", frequency="Once daily", source="manual")
+                for j in range(3)
+            ]
+            patient.reconciliations = [Reconciliation(provider_id=provider.id, status="in_progress")]
+            patients.append(patient)
+        session.add_all(patients)
+        await session.commit()
+        return SimpleNamespace(
+            patients=[patient.id for patient in patients],
+            medications=[medication.id for patient in patients for medication in patient.medications],
+            reconciliations=[patient.reconciliations[0].id for patient in patients],
+        )
+
+
+@pytest.fixture
+def count_queries(database):
+    """``with count_queries() as statements:`` collects every statement run inside"""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(database.sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(database.sync_engine, "before_cursor_execute", record)
+
+    return counting
@@ -0,0 +1,56 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import select
+from app.models.models import AnalyticsRollup, Provider, Reconciliation
+
+
+async def status_counts(db) -> dict:
+    rows = await db.execute(
+        select(AnalyticsRollup.dimension, AnalyticsRollup.count, AnalyticsRollup.total)
+        .where(AnalyticsRollup.metric == "reconciliation_status", AnalyticsRollup.day == datetime.utcnow().date())
+    )
+    return {row.dimension: (row.count, row.total) for row in rows}
+
+
+def reads_of(statements, table: str) -> list:
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT") and table in s]
+
+
+@pytest.fixture
+async def reconciliation(db, seeded):
+    provider = await db.scalar(select(Provider).where(Provider.email == "tests@example.com"))
+    created = Reconciliation(patient_id=seeded.patients[0], provider_id=provider.id, status="pending")
+    db.add(created)
+    await db.commit()
+    db.expunge_all()
+    yield await db.get(Reconciliation, created.id)
+    await db.delete(await db.get(Reconciliation, created.id))
+    await db.commit()
+
+
+async def test_updates_move_rollup_counts(db, reconciliation):
+    before = await status_counts(db)
+    reconciliation.status = "in_progress"
+    reconciliation.conflicts_found = 3
+    await db.commit()
+    after = await status_counts(db)
+    assert after["pending"][0] == before["pending"][0] - 1
+    assert after["in_progress"] == (before["in_progress"][0] + 1, before["in_progress"][1] + 3)
+
+
+async def test_updates_read_back_only_what_the_rollups_need(db, reconciliation, count_queries):
+    # The first UPDATE expires the server-side version and updated_at
+    reconciliation.status = "in_progress"
+    await db.commit()
+
+    with count_queries() as statements:
+        reconciliation.status = "completed"
+        await db.commit()
+    assert reads_of(statements, "reconciliations") == []
+
+    # Nothing the rollups read changed: no deltas, no reads
+    with count_queries() as statements:
+        reconciliation.notes = "Reviewed"
+        await db.commit()
+    assert reads_of(statements, "reconciliations") == []
+    assert not any("analytics_rollups" in s for s in statements)
@@ -0,0 +1,71 @@
+import pytest
+from passlib.hash import bcrypt
+from sqlalchemy import delete, select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import Provider
+from app.services.principal_cache import principal_cache
+
+EMAIL = "cached@example.com"
+
+
+@pytest.fixture
+async def provider(db):
+    """A provider whose password hash uses a lower cost than BCRYPT_ROUNDS"""
+    created = Provider(name="Cached", email=EMAIL, hashed_password=bcrypt.using(rounds=4).hash("secret"))
+    db.add(created)
+    await db.commit()
+    yield created
+    await db.execute(delete(Provider).where(Provider.id == created.id))
+    await db.commit()
+
+
+async def login(client) -> dict:
+    response = await client.post("/api/v1/auth/token", data={"username": EMAIL, "password": "secret"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def stored_hash(provider_id: int) -> str:
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(select(Provider.hashed_password).where(Provider.id == provider_id))
+
+
+async def update_provider(provider_id: int, **values):
+    # Another session, as an admin tool or other request would
+    async with AsyncSessionLocal() as session:
+        provider = await session.get(Provider, provider_id)
+        for name, value in values.items():
+            setattr(provider, name, value)
+        await session.commit()
+
+
+async def test_updating_a_provider_invalidates_the_cached_principal(client, provider):
+    headers = await login(client)
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["name"] == "Cached"
+    assert provider.id in principal_cache._providers
+
+    await update_provider(provider.id, name="Renamed")
+    assert provider.id not in principal_cache._providers
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["name"] == "Renamed"
+
+
+async def test_deactivating_a_provider_revokes_access(client, provider):
+    headers = await login(client)
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+
+    await update_provider(provider.id, is_active=False)
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+
+
+async def test_login_rehashes_an_outdated_cost(client, provider):
+    old = await stored_hash(provider.id)
+    await login(client)
+    upgraded = await stored_hash(provider.id)
+    assert upgraded != old
+    assert bcrypt.from_string(upgraded).rounds == settings.BCRYPT_ROUNDS
+    assert bcrypt.verify("secret", upgraded)
+
+    # Current hashes are left alone
+    await login(client)
+    assert await stored_hash(provider.id) == upgraded
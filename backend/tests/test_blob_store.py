@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import os
+import pytest
+from sqlalchemy import delete
+from app.core.config import settings
+from app.models.models import Medication
+from app.services import blob_store as blob_store_module
+from app.services import image_derivatives
+from app.services.blob_store import BACKENDS, collect_garbage, create_store
+from app.services.image_derivatives import derivative_names
+
+
+def key_for(content: bytes) -> str:
+    return f"{hashlib.sha256(content).hexdigest()}.png"
+
+
+async def put(store, content: bytes) -> str:
+    key = key_for(content)
+    path = os.path.join(store.staging_dir, f".{key}.part")
+    with open(path, "wb") as staged:
+        staged.write(content)
+    await store.put_file(path, key)
+    return key
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def store(request, tmp_path):
+    return BACKENDS[request.param](str(tmp_path / "blobs"))
+
+
+def test_stores_create_nothing_until_used(tmp_path, monkeypatch):
+    root = tmp_path / "blobs"
+    for backend in sorted(BACKENDS):
+        monkeypatch.setattr(settings, "BLOB_STORE_BACKEND", backend)
+        store = create_store(str(root))
+        assert not root.exists()
+        assert os.path.isdir(store.staging_dir)
+        os.rmdir(store.staging_dir)
+        os.rmdir(root)
+
+
+def test_unknown_backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "BLOB_STORE_BACKEND", "tape")
+    with pytest.raises(ValueError):
+        create_store(str(tmp_path))
+
+
+async def test_put_get_exists_delete(store):
+    key = await put(store, b"first upload")
+    assert await store.exists(key)
+    assert await store.get(key) == b"first upload"
+    assert (await store.stat(key)).size == len(b"first upload")
+    with open(await store.local_path(key), "rb") as local:
+        assert local.read() == b"first upload"
+    assert os.listdir(store.staging_dir) == []
+
+    assert await store.delete(key)
+    assert not await store.exists(key)
+    assert await store.get(key) is None
+    assert await store.stat(key) is None
+    assert await store.local_path(key) is None
+    assert not await store.delete(key)
+
+
+async def test_put_existing_key_keeps_one_copy(store):
+    key = await put(store, b"same content")
+    first = (await store.stat(key)).modified
+    staged = os.path.join(store.staging_dir, ".again.part")
+    with open(staged, "wb") as again:
+        again.write(b"same content")
+    assert not await store.put_file(staged, key)
+    assert not os.path.exists(staged)
+    assert (await store.stat(key)).modified >= first
+    assert [blob.key async for blob in store.iter_blobs()] == [key]
+
+
+async def test_concurrent_puts_create_once(store):
+    key = key_for(b"raced")
+    paths = []
+    for i in range(4):
+        paths.append(os.path.join(store.staging_dir, f".race{i}.part"))
+        with open(paths[-1], "wb") as staged:
+            staged.write(b"raced")
+    created = await asyncio.gather(*(store.put_file(path, key) for path in paths))
+    assert sorted(created) == [False, False, False, True]
+    assert await store.get(key) == b"raced"
+    assert os.listdir(store.staging_dir) == []
+
+
+async def test_invalid_keys(store):
+    assert not await store.exists("../etc/passwd")
+    assert await store.get("../etc/passwd") is None
+    with pytest.raises(ValueError):
+        await store.delete("../etc/passwd")
+
+
+@pytest.fixture
+async def stores(store, tmp_path, monkeypatch):
+    derivatives = type(store)(str(tmp_path / "derivatives"))
+    monkeypatch.setattr(blob_store_module, "blob_store", store)
+    monkeypatch.setattr(image_derivatives, "blob_store", store)
+    monkeypatch.setattr(image_derivatives, "derivative_store", derivatives)
+    return store, derivatives
+
+
+@pytest.fixture
+async def referencing(db, seeded):
+    """Make a medication reference a key"""
+    created = []
+
+    async def reference(key: str):
+        medication = Medication(patient_id=seeded.patients[0], name="Imaged", source="photo", image_path=key)
+        db.add(medication)
+        await db.commit()
+        created.append(medication.id)
+
+    yield reference
+    await db.execute(delete(Medication).where(Medication.id.in_(created)))
+    await db.commit()
+
+
+async def test_garbage_collection(db, stores, referencing, monkeypatch):
+    store, derivatives = stores
+    monkeypatch.setattr(settings, "BLOB_GC_BATCH_SIZE", 2)
+    kept = await put(store, b"referenced")
+    await referencing(kept)
+    orphans = [await put(store, f"orphan {i}".encode()) for i in range(3)]
+    orphan_derivative = derivative_names(orphans[0])[0]
+    staged = os.path.join(derivatives.staging_dir, ".thumb.part")
+    with open(staged, "wb") as thumb:
+        thumb.write(b"thumbnail")
+    await derivatives.put_file(staged, orphan_derivative)
+
+    # Within the grace period nothing unreferenced goes
+    result = await collect_garbage(db)
+    assert (result.scanned, result.referenced, result.recent, result.deleted) == (4, 1, 3, 0)
+
+    result = await collect_garbage(db, grace_seconds=0, dry_run=True)
+    assert (result.deleted, result.bytes_freed) == (3, sum(len(f"orphan {i}") for i in range(3)))
+    assert all([await store.exists(key) for key in orphans])
+
+    result = await collect_garbage(db, grace_seconds=0)
+    assert (result.referenced, result.deleted) == (1, 3)
+    assert [blob.key async for blob in store.iter_blobs()] == [kept]
+    assert not await derivatives.exists(orphan_derivative)
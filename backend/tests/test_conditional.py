@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import pytest
+from starlette.requests import Request
+from app.utils.conditional import Validators, is_conditional, is_not_modified, make_validators
+
+MODIFIED = datetime(2024, 5, 1, 12, 30, 15, tzinfo=timezone.utc)
+VALIDATORS = Validators('"abc123"', MODIFIED)
+
+
+def request_with(**headers) -> Request:
+    raw = [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value, usegmt=True)
+
+
+def test_make_validators():
+    naive = datetime(2024, 5, 1, 12, 30, 15, 999999)
+    validators = make_validators(("patient", 1, 3), [None, naive, naive - timedelta(days=1)])
+    assert validators.etag.startswith('"') and validators.etag.endswith('"')
+    assert validators.last_modified == MODIFIED
+    assert validators.headers["Last-Modified"] == "Wed, 01 May 2024 12:30:15 GMT"
+    assert make_validators(("patient", 1, 4)).etag != validators.etag
+    assert "Last-Modified" not in make_validators(("patient", 1, 3)).headers
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc123"', True),
+    ('W/"abc123"', True),
+    ('"other", "abc123"', True),
+    ("*", True),
+    ('"other"', False),
+    ('"ABC123"', False),
+])
+def test_if_none_match(header, expected):
+    assert is_not_modified(request_with(if_none_match=header), VALIDATORS) is expected
+
+
+@pytest.mark.parametrize("since, expected", [
+    (http_date(MODIFIED), True),
+    (http_date(MODIFIED + timedelta(hours=1)), True),
+    (http_date(MODIFIED - timedelta(seconds=1)), False),
+    ("not a date", False),
+])
+def test_if_modified_since(since, expected):
+    assert is_not_modified(request_with(if_modified_since=since), VALIDATORS) is expected
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    request = request_with(if_none_match='"other"', if_modified_since=http_date(MODIFIED))
+    assert is_not_modified(request, VALIDATORS) is False
+
+
+def test_unconditional_requests():
+    assert not is_conditional(request_with())
+    assert is_conditional(request_with(if_modified_since=http_date(MODIFIED)))
+    assert not is_not_modified(request_with(), VALIDATORS)
+    assert not is_not_modified(request_with(if_modified_since=http_date(MODIFIED)), Validators('"abc123"'))
+
+
+@pytest.fixture
+async def patient_url(client, auth_headers):
+    created = await client.post("/api/v1/patients/", headers=auth_headers, json={
+        "first_name": "Etag", "last_name": "Conditional", "date_of_birth": "1970-01-01"
+    })
+    url = f"/api/v1/patients/{created.json()['id']}"
+    yield url
+    await client.delete(url, headers=auth_headers)
+
+
+async def test_patient_revalidation(client, auth_headers, patient_url):
+    first = await client.get(patient_url, headers=auth_headers)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    cached = await client.get(patient_url, headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    since = await client.get(patient_url, headers={**auth_headers, "If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304
+
+    await client.put(patient_url, headers=auth_headers, json={
+        "first_name": "Etag", "last_name": "Changed", "date_of_birth": "1970-01-01"
+    })
+    changed = await client.get(patient_url, headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["last_name"] == "Changed"
+    assert changed.headers["etag"] != etag
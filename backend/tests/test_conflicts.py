@@ -0,0 +1,155 @@
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import delete, select
+from app.models.models import Medication, Patient, Provider, Reconciliation
+from app.services.conflicts import ConflictEngine, MedicationFacts, PatientConflicts, conflict_engine
+
+TODAY = date(2024, 6, 1)
+
+
+def facts(med_id: int, name: str, dosage: str = "10 mg", frequency: str = "Once daily", **kwargs) -> MedicationFacts:
+    return MedicationFacts(id=med_id, name=name, dosage=dosage, frequency=frequency, **kwargs)
+
+
+def summary(conflicts) -> list:
+    return [(conflict.type, conflict.drug, conflict.medication_ids) for conflict in conflicts]
+
+
+def test_apply_groups_by_drug():
+    state = PatientConflicts()
+    state.apply(1, facts(1, "Lisinopril"), TODAY)
+    state.apply(2, facts(2, "Metformin"), TODAY)
+    assert state.conflicts() == []
+    state.apply(3, facts(3, "lisinopril"), TODAY)
+    assert summary(state.conflicts()) == [("duplicate", "Lisinopril", [1, 3])]
+    state.apply(3, facts(3, "Lisinopril", dosage="20 mg"), TODAY)
+    assert summary(state.conflicts()) == [("dose_discrepancy", "Lisinopril", [1, 3])]
+
+
+def test_apply_removal_and_inactive_entries_leave_their_group():
+    state = PatientConflicts()
+    for med_id in (1, 2, 3):
+        state.apply(med_id, facts(med_id, "Lisinopril"), TODAY)
+    state.apply(2, None, TODAY)
+    assert summary(state.conflicts()) == [("duplicate", "Lisinopril", [1, 3])]
+    state.apply(3, facts(3, "Lisinopril", is_active=False), TODAY)
+    assert state.conflicts() == []
+    state.apply(1, None, TODAY)
+    assert state.groups == {} and state.by_group == {} and state.meds == {}
+
+
+def test_apply_renamed_medication_moves_between_groups():
+    state = PatientConflicts()
+    state.apply(1, facts(1, "Lisinopril"), TODAY)
+    state.apply(2, facts(2, "Lisinopril"), TODAY)
+    state.apply(3, facts(3, "Metformin"), TODAY)
+    state.apply(2, facts(2, "Metformin", frequency="Twice daily"), TODAY)
+    assert summary(state.conflicts()) == [("frequency_discrepancy", "Metformin", [2, 3])]
+    assert state.groups["lisinopril"] == {1}
+
+
+def test_apply_tracks_stale_fills():
+    state = PatientConflicts()
+    state.apply(1, facts(1, "Lisinopril", last_filled=TODAY - timedelta(days=400)), TODAY)
+    assert summary(state.conflicts()) == [("stale_fill", "Lisinopril", [1])]
+    state.apply(1, facts(1, "Lisinopril", last_filled=TODAY), TODAY)
+    assert state.conflicts() == []
+
+
+def test_rebuild_is_bounded():
+    engine = ConflictEngine(max_patients=2, ttl=60)
+    for patient_id in (1, 2, 3):
+        engine.rebuild(patient_id, [facts(patient_id, "Lisinopril")])
+    assert list(engine._patients) == [2, 3]
+
+
+@pytest.fixture
+async def two_patients(db):
+    pair = [
+        Patient(first_name="Moved", last_name=f"Conflicts{i}", date_of_birth=date(1960, 1, 1))
+        for i in range(2)
+    ]
+    db.add_all(pair)
+    await db.commit()
+    yield [patient.id for patient in pair]
+    ids = [patient.id for patient in pair]
+    await db.execute(delete(Reconciliation).where(Reconciliation.patient_id.in_(ids)))
+    await db.execute(delete(Medication).where(Medication.patient_id.in_(ids)))
+    await db.execute(delete(Patient).where(Patient.id.in_(ids)))
+    await db.commit()
+    for patient_id in ids:
+        conflict_engine.invalidate(patient_id)
+
+
+async def test_get_conflicts_follows_a_medication_to_another_patient(db, two_patients):
+    first, second = two_patients
+    meds = [Medication(patient_id=first, name="Warfarin", dosage="5 mg", frequency="Once daily", source=source)
+            for source in ("pharmacy", "photo")]
+    db.add_all(meds)
+    await db.commit()
+
+    assert summary(await conflict_engine.get_conflicts(db, first)) == [
+        ("duplicate", "Warfarin", [meds[0].id, meds[1].id])
+    ]
+    assert await conflict_engine.get_conflicts(db, second) == []
+
+    # Both patients are cached; the move has to reach each of them
+    meds[1].patient_id = second
+    await db.commit()
+    assert await conflict_engine.get_conflicts(db, first) == []
+    assert await conflict_engine.get_conflicts(db, second) == []
+
+    meds[0].patient_id = second
+    await db.commit()
+    assert await conflict_engine.get_conflicts(db, first) == []
+    assert summary(await conflict_engine.get_conflicts(db, second)) == [
+        ("duplicate", "Warfarin", [meds[0].id, meds[1].id])
+    ]
+
+
+async def test_conflicts_found_is_written_only_by_writes(client, auth_headers, db, two_patients):
+    patient_id = two_patients[0]
+    provider = await db.scalar(select(Provider).where(Provider.email == "tests@example.com"))
+    reconciliation = Reconciliation(patient_id=patient_id, provider_id=provider.id, status="in_progress")
+    db.add_all([reconciliation] + [
+        Medication(patient_id=patient_id, name="Warfarin", dosage=dosage, frequency="Once daily", source="manual")
+        for dosage in ("5 mg", "7.5 mg")
+    ])
+    await db.commit()
+    url = f"/api/v1/reconciliations/{reconciliation.id}"
+
+    conflicts = await client.get(f"{url}/conflicts", headers=auth_headers)
+    assert [conflict["type"] for conflict in conflicts.json()] == ["dose_discrepancy"]
+    await db.refresh(reconciliation)
+    assert reconciliation.conflicts_found == 0
+
+    # Reads report the live count of an open reconciliation
+    detail = await client.get(url, headers=auth_headers)
+    assert detail.json()["reconciliation"]["conflicts_found"] == 1
+
+    # Clients can no longer set it; the server does on write
+    response = await client.put(url, headers=auth_headers, json={"notes": "Checked", "conflicts_found": 7})
+    assert response.status_code == 200
+    assert response.json()["conflicts_found"] == 1
+
+
+async def test_completing_keeps_the_approved_count(client, auth_headers, db, two_patients):
+    patient_id = two_patients[1]
+    provider = await db.scalar(select(Provider).where(Provider.email == "tests@example.com"))
+    reconciliation = Reconciliation(patient_id=patient_id, provider_id=provider.id, status="in_progress")
+    db.add(reconciliation)
+    await db.commit()
+    url = f"/api/v1/reconciliations/{reconciliation.id}"
+
+    # What the detail page sends before completing
+    saved = await client.put(url, headers=auth_headers, json={"approved_medications": 2, "notes": "Done"})
+    assert saved.json()["approved_medications"] == 2
+    assert (await client.post(f"{url}/complete", headers=auth_headers)).status_code == 200
+
+    await db.refresh(reconciliation)
+    assert (reconciliation.status, reconciliation.approved_medications) == ("completed", 2)
+    detail = await client.get(url, headers=auth_headers)
+    assert detail.json()["reconciliation"]["approved_medications"] == 2
+
+    invalid = await client.put(url, headers=auth_headers, json={"approved_medications": -1})
+    assert invalid.status_code == 422
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+import pytest
+from sqlalchemy import delete
+from app.core.config import settings
+from app.models.models import Medication, Patient
+from app.services.export import ExportFilters, stream_export
+
+DAYS = [datetime(2020, 3, day, 12, 30) for day in (1, 2, 3)]
+
+
+@pytest.fixture
+async def exported(db):
+    """A patient with one medication created on each of DAYS"""
+    patient = Patient(first_name="Ex, \"Port\"", last_name="Ed\nLine", date_of_birth=date(1961, 2, 3), mrn="EXP0001")
+    patient.medications = [
+        Medication(name=f"Exported{i}", dosage="5 mg", frequency="Once daily", source="emr",
+                   ndc_number=f"0000{i}", last_filled=date(2020, 2, 1 + i), is_active=i != 1, created_at=day)
+        for i, day in enumerate(DAYS)
+    ]
+    db.add(patient)
+    await db.commit()
+    yield patient
+    await db.execute(delete(Medication).where(Medication.patient_id == patient.id))
+    await db.execute(delete(Patient).where(Patient.id == patient.id))
+    await db.commit()
+
+
+def expected(medication: Medication, patient: Patient) -> dict:
+    return {
+        "id": medication.id, "patient_id": patient.id, "patient_mrn": patient.mrn, "name": medication.name,
+        "generic_name": None, "dosage": "5 mg", "frequency": "Once daily", "source": "emr",
+        "ndc_number": medication.ndc_number, "last_filled": medication.last_filled.isoformat(),
+        "is_active": medication.is_active, "notes": None, "ocr_confidence": None,
+        "created_at": medication.created_at.isoformat(),
+    }
+
+
+async def test_ndjson_round_trip(client, auth_headers, exported):
+    response = await client.get(
+        "/api/v1/export/medications", headers=auth_headers,
+        params={"format": "ndjson", "patient_id": exported.id}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [expected(medication, exported) for medication in exported.medications]
+
+
+async def test_csv_round_trip(client, auth_headers, exported):
+    response = await client.get("/api/v1/export/patients", headers=auth_headers, params={"patient_id": exported.id})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"].startswith('attachment; filename="patients-')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert rows == [{
+        "id": str(exported.id), "mrn": "EXP0001", "first_name": 'Ex, "Port"', "last_name": "Ed\nLine",
+        "date_of_birth": "1961-02-03", "phone": "", "email": "", "created_at": exported.created_at.isoformat(),
+    }]
+
+
+async def test_date_filters_are_inclusive_utc_days(client, auth_headers, exported):
+    async def names(**params) -> list:
+        response = await client.get(
+            "/api/v1/export/medications", headers=auth_headers,
+            params={"format": "ndjson", "patient_id": exported.id, **params}
+        )
+        assert response.status_code == 200
+        return [json.loads(line)["name"] for line in response.text.splitlines()]
+
+    assert await names(start="2020-03-02") == ["Exported1", "Exported2"]
+    assert await names(end="2020-03-02") == ["Exported0", "Exported1"]
+    assert await names(start="2020-03-02", end="2020-03-02") == ["Exported1"]
+    bad = await client.get(
+        "/api/v1/export/medications", headers=auth_headers, params={"start": "2020-03-03", "end": "2020-03-01"}
+    )
+    assert bad.status_code == 400
+
+
+async def test_streams_in_batches(exported, monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    chunks = [chunk async for chunk in stream_export("medications", ExportFilters(patient_id=exported.id), "csv")]
+    # Header, then one chunk per batch of rows
+    assert len(chunks) == 3
+    assert chunks[0].startswith("id,patient_id,patient_mrn,name,")
+    assert [len(list(csv.reader(io.StringIO(chunk)))) for chunk in chunks[1:]] == [2, 1]
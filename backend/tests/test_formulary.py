@@ -0,0 +1,92 @@
+import pytest
+from app.services.formulary import Formulary, load_formulary, normalize_name
+
+ROWS = [
+    ("Zestril", "lisinopril", "0001", "10 mg"),
+    ("Prinivil", "lisinopril", "0002", "20 mg"),
+    ("Glucophage", "metformin", "0005", "500 mg"),
+    ("Metformin ER", "metformin", "0006", "750 mg"),
+    ("Metoprolol Tartrate", "metoprolol", "0007", "25 mg"),
+    ("Metoprolol Succinate", "metoprolol", "0008", "50 mg"),
+    ("Lipitor", "atorvastatin", "0009", "10 mg"),
+]
+
+
+@pytest.fixture(scope="module")
+def formulary():
+    formulary = Formulary(min_score=0.6)
+    for row in ROWS:
+        formulary.add(*row)
+    formulary.finalize("test")
+    return formulary
+
+
+def test_normalize_undoes_ocr_confusions():
+    assert normalize_name("LISINOPRI1") == "lisinopril"
+    assert normalize_name("METF0RMIN  E.R.") == "metformin e r"
+
+
+def test_resolve_exact_after_normalizing(formulary):
+    match = formulary.resolve("Lisinopri1")
+    assert match.generic_name == "lisinopril"
+    assert match.score == 1.0
+
+
+def test_resolve_brand_to_generic(formulary):
+    match = formulary.resolve("GLUCOPHAGE")
+    assert (match.name, match.generic_name, match.ndc_number) == ("Glucophage", "metformin", "0005")
+
+
+def test_resolve_picks_the_entry_with_the_matching_strength(formulary):
+    assert formulary.resolve("lisinopril").ndc_number == "0001"
+    assert formulary.resolve("lisinopril", dosage="20mg").ndc_number == "0002"
+    # No entry of that strength: the name's first entry
+    assert formulary.resolve("lisinopril", dosage="40 mg").ndc_number == "0001"
+
+
+def test_resolve_fuzzy_and_below_threshold(formulary):
+    match = formulary.resolve("metfromin")
+    assert match.generic_name == "metformin"
+    assert 0.6 <= match.score < 1.0
+    assert formulary.resolve("acetaminophen") is None
+    assert formulary.resolve("") is None
+
+
+def test_search_ranks_by_similarity(formulary):
+    matches = formulary.search("metoprolol tartrat", limit=5)
+    assert matches[0].name == "Metoprolol Tartrate"
+    scores = [match.score for match in matches]
+    assert scores == sorted(scores, reverse=True)
+    assert all(score >= 0.6 for score in scores)
+
+
+def test_autocomplete_lists_prefix_matches_alphabetically(formulary):
+    names = [match.name for match in formulary.autocomplete("met")]
+    assert names == ["metformin", "Metformin ER", "metoprolol", "Metoprolol Succinate", "Metoprolol Tartrate"]
+    assert len(formulary.autocomplete("met", limit=2)) == 2
+
+
+def test_autocomplete_tops_up_with_fuzzy_matches(formulary):
+    matches = formulary.autocomplete("metoprolol t", limit=3)
+    assert matches[0].name == "Metoprolol Tartrate"
+    assert matches[0].score == 1.0
+    # After the prefix matches, fuzzy ones by score, without repeats
+    assert [match.score for match in matches[1:]] == sorted((match.score for match in matches[1:]), reverse=True)
+    assert len({match.name for match in matches}) == len(matches)
+
+
+def test_empty_formulary_matches_nothing():
+    formulary = load_formulary(None)
+    assert len(formulary) == 0
+    assert formulary.version == "empty"
+    assert formulary.resolve("lisinopril") is None
+    assert formulary.autocomplete("lis") == []
+
+
+def test_load_csv(tmp_path):
+    path = tmp_path / "formulary.csv"
+    path.write_text("brand_name,generic_name,ndc,strength\nZestril,lisinopril,0001,10 mg\n,,,\n")
+    formulary = load_formulary(str(path))
+    assert len(formulary) == 1
+    assert formulary.version != "empty"
+    assert formulary.resolve("zestril").generic_name == "lisinopril"
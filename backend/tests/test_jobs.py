@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete, update
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import Job
+from app.services import jobs
+from app.services.jobs import FAILED, QUEUED, RUNNING, TASKS, claim, enqueue, fail, reclaim_expired, retry_delay, task
+from app import worker as worker_module
+
+KIND = "test_noop"
+PRIORITY = 1000  # Ahead of anything other tests left queued
+
+
+@pytest.fixture
+async def queued(db):
+    """Enqueue jobs of a throwaway task kind; removed afterwards"""
+    @task(KIND, max_attempts=2, lease_seconds=30)
+    async def noop(ctx):
+        return None
+
+    async def add(**payload) -> Job:
+        return await enqueue(db, KIND, payload, priority=PRIORITY)
+
+    yield add
+    del TASKS[KIND]
+    await db.execute(delete(Job).where(Job.kind == KIND))
+    await db.commit()
+
+
+async def expire_lease(db, job: Job):
+    await db.execute(update(Job).where(Job.id == job.id).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    await db.commit()
+
+
+async def test_claim_is_exclusive(queued):
+    job = await queued()
+
+    async def claim_in_own_session(worker_id):
+        async with AsyncSessionLocal() as session:
+            return await claim(session, worker_id)
+
+    claims = await asyncio.gather(*(claim_in_own_session(f"worker-{i}") for i in range(4)))
+    winners = [claimed for claimed in claims if claimed is not None and claimed.id == job.id]
+    assert len(winners) == 1
+    assert winners[0].status == RUNNING
+    assert winners[0].attempts == 1
+    assert winners[0].lease_expires_at > datetime.utcnow() + timedelta(seconds=25)
+
+
+async def test_claim_skips_jobs_not_yet_due(db, queued):
+    later = await enqueue(db, KIND, {}, priority=PRIORITY + 1, delay=60)
+    due = await queued()
+    claimed = await claim(db, "worker")
+    assert claimed.id == due.id
+    assert claimed.id != later.id
+
+
+async def test_expired_lease_requeues_then_fails(db, queued):
+    job = await queued()
+    claimed = await claim(db, "lost")
+    assert claimed.id == job.id
+    await reclaim_expired(db)
+    assert (await db.get(Job, job.id, populate_existing=True)).status == RUNNING
+
+    await expire_lease(db, job)
+    await reclaim_expired(db)
+    requeued = await db.get(Job, job.id, populate_existing=True)
+    assert (requeued.status, requeued.worker_id, requeued.error) == (QUEUED, None, "Worker stopped heartbeating")
+    # The lost worker can no longer finish it
+    assert not await jobs.complete(db, claimed, "lost", {"late": True})
+
+    claimed = await claim(db, "second")
+    assert (claimed.id, claimed.attempts) == (job.id, 2)
+    await expire_lease(db, job)
+    await reclaim_expired(db)
+    failed = await db.get(Job, job.id, populate_existing=True)
+    assert failed.status == FAILED
+    assert failed.finished_at is not None
+
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF", 10.0)
+    monkeypatch.setattr(settings, "JOB_RETRY_BACKOFF_MAX", 60.0)
+    assert [retry_delay(attempts) for attempts in range(1, 6)] == [10.0, 20.0, 40.0, 60.0, 60.0]
+
+
+async def test_failed_runs_back_off_until_max_attempts(db, queued):
+    job_id = (await queued()).id
+    claimed = await claim(db, "worker")
+    before = datetime.utcnow()
+    assert await fail(db, claimed, "worker", "ValueError: first")
+    retried = await db.get(Job, job_id, populate_existing=True)
+    assert (retried.status, retried.error) == (QUEUED, "ValueError: first")
+    assert retried.run_at >= before + timedelta(seconds=retry_delay(1)) - timedelta(seconds=1)
+    # Not due yet, so not claimed again
+    # (claim rolls back when nothing is due, expiring loaded jobs)
+    other = await claim(db, "worker")
+    assert other is None or other.id != job_id
+
+    await db.execute(update(Job).where(Job.id == job_id).values(run_at=datetime.utcnow()))
+    await db.commit()
+    claimed = await claim(db, "worker")
+    assert (claimed.id, claimed.attempts) == (job_id, 2)
+    assert await fail(db, claimed, "worker", "ValueError: second")
+    failed = await db.get(Job, job_id, populate_existing=True)
+    assert (failed.status, failed.error, failed.attempts) == (FAILED, "ValueError: second", 2)
+    assert failed.finished_at is not None
+
+
+async def test_worker_maintenance_runs_on_its_own_interval(monkeypatch):
+    calls = []
+
+    async def record(name):
+        calls.append(name)
+
+    monkeypatch.setattr(worker_module, "reclaim_expired", lambda db: record("reclaim"))
+    monkeypatch.setattr(worker_module, "purge_finished", lambda db: record("purge"))
+    monkeypatch.setattr(worker_module, "claim", lambda db, worker_id: record("claim"))
+    monkeypatch.setattr(settings, "JOB_RECLAIM_INTERVAL", 3600)
+
+    idle = worker_module.Worker("interval")
+    for _ in range(3):
+        assert not await idle.run_once()
+    assert calls == ["reclaim", "purge", "claim", "claim", "claim"]
+
+    monkeypatch.setattr(settings, "JOB_RECLAIM_INTERVAL", 0)
+    await idle.run_once()
+    assert calls[-2:] == ["reclaim", "claim"]
@@ -0,0 +1,84 @@
+import json
+from datetime import date
+import pytest
+from sqlalchemy import delete, select
+from app.models.models import Medication, Patient
+from app.services.analytics import analytics_cache
+
+FEED = """mrn,name,dosage,frequency,ndc,last_filled,source
+IMP0001,Lisinopril,10 mg,Once daily,00071-0222,2024-05-01,
+IMP0001,Metformin,500 mg,Twice daily,00093-1048,2024-05-01,
+"""
+# Same keys, a new dose and source, plus two bad rows
+REIMPORT = """mrn,name,dosage,frequency,ndc,last_filled,source
+IMP0001,Lisinopril,20 mg,Once daily,00071-0222,2024-05-01,emr
+IMP0001,Metformin,500 mg,Twice daily,00093-1048,2024-05-01,
+NOPE404,Atorvastatin,40 mg,Once daily,00071-0155,2024-05-01,
+IMP0001,Atorvastatin,40 mg,Once daily,00071-0155,05/01/2024,
+"""
+
+
+@pytest.fixture
+async def patient(db):
+    created = Patient(first_name="Feed", last_name="Import", date_of_birth=date(1955, 5, 5), mrn="IMP0001")
+    db.add(created)
+    await db.commit()
+    yield created.id
+    await db.execute(delete(Medication).where(Medication.patient_id == created.id))
+    await db.execute(delete(Patient).where(Patient.id == created.id))
+    await db.commit()
+
+
+async def import_feed(client, auth_headers, feed: str) -> dict:
+    response = await client.post(
+        "/api/v1/medications/import", headers=auth_headers,
+        files={"file": ("feed.csv", feed.encode(), "text/csv")}
+    )
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["done"]
+    return lines[-1]
+
+
+async def medication_totals(client, auth_headers) -> tuple:
+    """(total, count by source) from the analytics summary"""
+    analytics_cache.clear()
+    summary = (await client.get("/api/v1/analytics/summary", headers=auth_headers)).json()
+    return summary["medications"], {row["source"]: row["count"] for row in summary["medications_by_source"]}
+
+
+async def test_reimport_updates_in_place(client, auth_headers, db, patient):
+    total_before, before = await medication_totals(client, auth_headers)
+    first = await import_feed(client, auth_headers, FEED)
+    assert (first["rows"], first["inserted"], first["updated"], first["failed"]) == (2, 2, 0, 0)
+    total, after = await medication_totals(client, auth_headers)
+    assert total == total_before + 2
+    assert after["pharmacy"] == before.get("pharmacy", 0) + 2
+
+    lisinopril = await db.scalar(select(Medication).where(Medication.patient_id == patient, Medication.name == "Lisinopril"))
+    url = f"/api/v1/medications/{lisinopril.id}"
+    etag = (await client.get(url, headers=auth_headers)).headers["etag"]
+    assert lisinopril.version == 1
+
+    second = await import_feed(client, auth_headers, REIMPORT)
+    assert (second["rows"], second["inserted"], second["updated"], second["failed"]) == (4, 0, 2, 2)
+    assert second["errors"] == [
+        {"line": 4, "error": "Unknown patient: NOPE404"},
+        {"line": 5, "error": "Invalid last_filled: '05/01/2024'"},
+    ]
+
+    rows = (await db.execute(
+        select(Medication).where(Medication.patient_id == patient).execution_options(populate_existing=True)
+    )).scalars().all()
+    assert len(rows) == 2
+    updated = next(row for row in rows if row.id == lisinopril.id)
+    assert (updated.dosage, updated.source, updated.version) == ("20 mg", "emr", 2)
+    response = await client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+    # One medication moved from pharmacy to emr; nothing was added
+    total, moved = await medication_totals(client, auth_headers)
+    assert total == total_before + 2
+    assert moved["pharmacy"] == after["pharmacy"] - 1
+    assert moved["emr"] == after.get("emr", 0) + 1
@@ -0,0 +1,69 @@
+import re
+import pytest
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, Counter, Histogram, Registry
+
+# name{labels} value
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'  # Value escapes: \\ \" \n
+SAMPLE = re.compile(rf'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{{{LABEL}(,{LABEL})*\}})? \S+$')
+
+
+def samples(text: str) -> dict:
+    """Sample line -> value, asserting every line is well formed"""
+    found = {}
+    for line in text.strip().split("\n"):
+        if line.startswith("# "):
+            assert re.match(r"^# (HELP|TYPE) \S+ .+$", line), line
+            continue
+        assert SAMPLE.match(line), line
+        name, value = line.rsplit(" ", 1)
+        found[name] = float(value)
+    return found
+
+
+def test_exposition_format(monkeypatch):
+    import app.core.metrics as metrics
+    registry = Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    counter = Counter("test_events_total", "Events", ["kind"])
+    counter.labels('say "hi"\n').inc(2)
+    histogram = Histogram("test_seconds", "Durations", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    text = registry.render()
+    assert "# TYPE test_events_total counter" in text
+    assert "# TYPE test_seconds histogram" in text
+    values = samples(text)
+    assert values['test_events_total{kind="say \\"hi\\"\\n"}'] == 2
+    assert values['test_seconds_bucket{le="0.1"}'] == 1
+    assert values['test_seconds_bucket{le="1.0"}'] == 2
+    assert values['test_seconds_bucket{le="+Inf"}'] == 3
+    assert values["test_seconds_count"] == 3
+    assert values["test_seconds_sum"] == pytest.approx(5.55)
+
+
+async def test_metrics_endpoint_labels_routes_by_template(client, auth_headers, seeded):
+    for patient_id in seeded.patients[:3]:
+        assert (await client.get(f"/api/v1/patients/{patient_id}", headers=auth_headers)).status_code == 200
+    await client.get("/no/such/route")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == f"{CONTENT_TYPE}; charset=utf-8"
+    values = samples(response.text)
+    detail = 'http_requests_total{method="GET",route="/api/v1/patients/{patient_id}",status="200"}'
+    assert values[detail] >= 3
+    assert 'http_request_db_queries_count{route="/api/v1/patients/{patient_id}"}' in values
+    # Ids never become label values; unknown paths share one series
+    assert not any(f"/patients/{seeded.patients[0]}" in name for name in values)
+    assert values['http_requests_total{method="GET",route="unmatched",status="404"}'] >= 1
+
+
+async def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-me")
+    assert (await client.get("/metrics")).status_code == 401
+    assert (await client.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+    allowed = await client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert allowed.status_code == 200
+    assert "# TYPE http_requests_total counter" in allowed.text
@@ -0,0 +1,64 @@
+import os
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+from app.core.config import settings
+from app.core.database import Base, create_missing_columns, create_missing_indexes
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROW_VERSION_TABLES = ("patients", "medications", "reconciliations")
+
+
+@pytest.fixture
+def migrate(tmp_path, monkeypatch):
+    """Run alembic against a scratch SQLite file; yields (upgrade, engine)"""
+    path = tmp_path / "migrations.db"
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{path}")
+    # No config file: alembic.ini's logging setup would disable the app's loggers
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    engine = create_engine(f"sqlite:///{path}")
+    yield (lambda revision="head": command.upgrade(config, revision)), engine
+    engine.dispose()
+
+
+def columns(engine, table: str) -> set:
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def test_upgrade_adopts_a_database_the_app_created(migrate):
+    upgrade, engine = migrate
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+    upgrade()
+    for table in ROW_VERSION_TABLES:
+        assert {"updated_at", "version"} <= columns(engine, table)
+
+
+def test_startup_adds_columns_missing_from_an_older_database(migrate):
+    upgrade, engine = migrate
+    # Schema as of the revision before row versions
+    upgrade("3f6a9b2d5e18")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO patients (first_name, last_name, date_of_birth, created_at) "
+            "VALUES ('Old', 'Row', '1950-01-01', '2024-01-02 03:04:05')"
+        ))
+    assert "version" not in columns(engine, "patients")
+
+    # What create_tables() does on startup
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        create_missing_columns(connection)
+        create_missing_indexes(connection)
+    for table in ROW_VERSION_TABLES:
+        assert {"updated_at", "version"} <= columns(engine, table)
+    with engine.connect() as connection:
+        row = connection.execute(text("SELECT version, updated_at FROM patients")).one()
+    assert row.version == 1
+    assert row.updated_at == "2024-01-02 03:04:05"
+
+    # And migrating afterwards still converges
+    upgrade()
+    assert {"updated_at", "version"} <= columns(engine, "patients")
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete, update
+from app.models.models import Job
+from app.services.jobs import FAILED, RUNNING, SUCCEEDED, complete
+from app.services.ocr_executor import OCR_JOB_FAILURES, OCRExecutor, OCRQueueFull
+
+
+@pytest.fixture
+async def executor(db):
+    await db.execute(delete(Job))
+    await db.commit()
+    executor = OCRExecutor(max_workers=1, max_pending=2, job_ttl=3600)
+    yield executor
+    executor.shutdown()
+
+
+async def settle(executor):
+    await asyncio.gather(*executor._tasks)
+
+
+async def test_job_is_visible_to_other_workers(executor, db):
+    job = await executor.submit(dict, {"text": "Lisinopril 10 mg"}, provider_id=1, context={"filename": "a.jpg"})
+    assert job.status == RUNNING
+    await settle(executor)
+
+    # Another API worker has its own executor and no memory of the job
+    other = OCRExecutor(max_workers=1, max_pending=2, job_ttl=3600)
+    found = await other.get(db, str(job.id))
+    assert found.status == SUCCEEDED
+    assert found.result == {"text": "Lisinopril 10 mg"}
+    assert found.payload == {"filename": "a.jpg"}
+    assert executor.pending == 0
+
+
+async def test_failed_run_is_recorded(executor, db):
+    job = await executor.submit(int, "not a number", context={"filename": "b.jpg"})
+    await settle(executor)
+    found = await executor.get(db, str(job.id))
+    assert found.status == FAILED
+    assert "invalid literal" in found.error
+
+
+async def test_failures_are_logged_and_counted(executor, db, caplog):
+    before = {stage: OCR_JOB_FAILURES.labels(stage).value for stage in ("ocr", "on_complete")}
+
+    async def broken(result):
+        raise RuntimeError("callback broke")
+
+    with caplog.at_level(logging.WARNING, logger="app.services.ocr_executor"):
+        failed_ocr = await executor.submit(int, "not a number", context={"filename": "b.jpg"})
+        failed_callback = await executor.submit(dict, {}, context={"filename": "b.jpg"}, on_complete=broken)
+        await settle(executor)
+
+    assert OCR_JOB_FAILURES.labels("ocr").value == before["ocr"] + 1
+    assert OCR_JOB_FAILURES.labels("on_complete").value == before["on_complete"] + 1
+    records = {record.levelno: record for record in caplog.records}
+    assert f"OCR job {failed_ocr.id} failed in ocr" in records[logging.WARNING].getMessage()
+    assert f"OCR job {failed_callback.id} failed in on_complete" in records[logging.ERROR].getMessage()
+    assert records[logging.ERROR].exc_info is not None
+    assert (await executor.get(db, str(failed_callback.id))).error == "callback broke"
+
+
+async def test_on_complete_sees_the_result(executor, db):
+    seen = []
+
+    async def on_complete(result):
+        seen.append(result)
+
+    await executor.submit(dict, {"text": "x"}, context={"filename": "c.jpg"}, on_complete=on_complete)
+    await settle(executor)
+    assert seen == [{"text": "x"}]
+
+
+async def test_admission_is_bounded(executor):
+    for _ in range(2):
+        await executor.submit(dict, {}, context={"filename": "d.jpg"})
+    with pytest.raises(OCRQueueFull):
+        await executor.submit(dict, {}, context={"filename": "d.jpg"})
+    await settle(executor)
+    assert executor.pending == 0
+
+
+async def test_expired_and_unknown_jobs_are_not_found(executor, db):
+    job = await executor.add_completed({"text": "cached"}, context={"filename": "e.jpg"})
+    assert (await executor.get(db, str(job.id))).result == {"text": "cached"}
+    expired = OCRExecutor(max_workers=1, max_pending=1, job_ttl=-1)
+    assert await expired.get(db, str(job.id)) is None
+    assert await executor.get(db, "not-an-id") is None
+    assert await executor.get(db, "999999") is None
+
+
+async def test_job_left_running_by_a_dead_worker_fails_when_polled(executor, db):
+    job = await executor._record(RUNNING, None, {"filename": "f.jpg"})
+    assert (await executor.get(db, str(job.id))).status == RUNNING
+
+    before = OCR_JOB_FAILURES.labels("lost").value
+    await db.execute(update(Job).where(Job.id == job.id).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    await db.commit()
+    found = await executor.get(db, str(job.id))
+    assert found.status == FAILED
+    assert "stopped" in found.error
+    assert OCR_JOB_FAILURES.labels("lost").value == before + 1
+    # The original worker can no longer record a result
+    assert not await complete(db, job, job.worker_id, {"text": "late"})
@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import date, datetime
+import pytest
+from sqlalchemy import delete, select, text
+from app.models.models import Patient
+from app.utils.pagination import Cursor, InvalidCursor, decode_cursor, encode_cursor, paginate, resolve_cursor
+
+
+def raw_token(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    cursor = Cursor(datetime(2024, 5, 1, 12, 30, 15), 42, "prev", {"status": "in_progress"})
+    token = encode_cursor(cursor)
+    assert "=" not in token
+    assert decode_cursor(token) == cursor
+
+
+@pytest.mark.parametrize("token", [
+    "not a cursor",
+    raw_token("just a string"),
+    raw_token({"k": ["2024-05-01T12:30:15"]}),
+    raw_token({"k": ["yesterday", 1]}),
+    raw_token({"k": ["2024-05-01T12:30:15", "one"]}),
+    raw_token({"k": ["2024-05-01T12:30:15", 1], "d": "sideways"}),
+    raw_token({"k": ["2024-05-01T12:30:15", 1], "f": ["status"]}),
+])
+def test_tampered_cursors_are_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_cursor_filters_must_match_the_request():
+    token = encode_cursor(Cursor(datetime(2024, 5, 1), 1, filters={"status": "completed"}))
+    assert resolve_cursor(token, {"status": None}) == (decode_cursor(token), {"status": "completed"})
+    assert resolve_cursor(token, {"status": "completed"})[1] == {"status": "completed"}
+    with pytest.raises(InvalidCursor):
+        resolve_cursor(token, {"status": "in_progress"})
+    assert resolve_cursor(None, {"status": None, "patient_id": 3}) == (None, {"patient_id": 3})
+
+
+@pytest.fixture
+async def same_second_patients(db):
+    patients = [
+        Patient(first_name=f"Keyset{i}", last_name="Keyset", date_of_birth=date(1960, 1, 1))
+        for i in range(9)
+    ]
+    db.add_all(patients)
+    await db.commit()
+    ids = sorted(patient.id for patient in patients)
+    # Stored the way the server default writes them; seven share a second
+    for patient_id in ids:
+        stamp = "2024-01-01 09:00:00" if patient_id in ids[:7] else "2024-01-01 09:00:01"
+        await db.execute(text("UPDATE patients SET created_at = :stamp WHERE id = :id"), {"stamp": stamp, "id": patient_id})
+    await db.commit()
+    db.expunge_all()
+    yield ids
+    await db.execute(delete(Patient).where(Patient.last_name == "Keyset"))
+    await db.commit()
+
+
+async def test_keyset_pages_across_equal_timestamps(db, same_second_patients):
+    query = select(Patient).where(Patient.last_name == "Keyset")
+    pages, cursor = [], None
+    while True:
+        page = await paginate(db, query, Patient, 3, cursor=cursor)
+        pages.append(page)
+        if page.next_cursor is None:
+            break
+        cursor = decode_cursor(page.next_cursor)
+
+    seen = [patient.id for page in pages for patient in page.items]
+    assert seen == same_second_patients
+    assert [len(page.items) for page in pages] == [3, 3, 3]
+    assert pages[0].prev_cursor is None
+
+    # And back again from the last page
+    back, cursor = [], decode_cursor(pages[-1].prev_cursor)
+    while cursor is not None:
+        page = await paginate(db, query, Patient, 3, cursor=cursor)
+        back.insert(0, [patient.id for patient in page.items])
+        cursor = decode_cursor(page.prev_cursor) if page.prev_cursor else None
+    assert back == [[patient.id for patient in page.items] for page in pages[:-1]]
+
+
+async def test_total_counts_the_filtered_query(db, same_second_patients):
+    query = select(Patient).where(Patient.last_name == "Keyset")
+    page = await paginate(db, query, Patient, 2, filters={"last_name": "Keyset"}, include_total=True)
+    assert page.total == len(same_second_patients)
+    assert not page.total_is_estimate
+
+
+async def test_bad_cursor_is_a_400(client, auth_headers):
+    response = await client.get("/api/v1/patients/", params={"cursor": "garbage"}, headers=auth_headers)
+    assert response.status_code == 400
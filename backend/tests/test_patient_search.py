@@ -0,0 +1,57 @@
+from datetime import date
+import pytest
+from sqlalchemy import delete
+from app.models.models import Patient
+
+# (first, last, mrn)
+PATIENTS = [
+    ("Rowan", "Quillfeather", "QX100"),
+    ("Ada", "Quill", "QX200"),
+    ("Quilla", "Stone", None),
+    ("Ben", "Quilm", None),  # Just past the "quill" prefix
+    ("Cy", "Ames", "QUILL"),
+]
+
+
+@pytest.fixture
+async def patients(db):
+    created = [
+        Patient(first_name=first, last_name=last, mrn=mrn, date_of_birth=date(1970, 1, 1 + i))
+        for i, (first, last, mrn) in enumerate(PATIENTS)
+    ]
+    db.add_all(created)
+    await db.commit()
+    yield
+    await db.execute(delete(Patient).where(Patient.id.in_([patient.id for patient in created])))
+    await db.commit()
+
+
+async def search(client, auth_headers, q: str, **params) -> list:
+    response = await client.get("/api/v1/patients/search", headers=auth_headers, params={"q": q, **params})
+    assert response.status_code == 200
+    return [f"{row['first_name']} {row['last_name']}" for row in response.json()]
+
+
+async def test_exact_mrn_outranks_name_matches(client, auth_headers, patients):
+    assert await search(client, auth_headers, "QUILL") == [
+        "Cy Ames",  # MRN
+        "Ada Quill",  # Exact last name
+        "Rowan Quillfeather",  # Last name prefix
+        "Quilla Stone",  # First name prefix
+    ]
+    # MRNs match exactly, not by prefix
+    assert await search(client, auth_headers, "QX1") == []
+    assert await search(client, auth_headers, "QX100") == ["Rowan Quillfeather"]
+
+
+async def test_name_prefixes(client, auth_headers, patients):
+    # Case-insensitive, and the range stops before the next prefix
+    assert await search(client, auth_headers, "qUiLl") == ["Ada Quill", "Rowan Quillfeather", "Quilla Stone"]
+    assert "Ben Quilm" in await search(client, auth_headers, "quil")
+
+    # Both name orders, with or without a comma
+    assert (await search(client, auth_headers, "ro quill"))[0] == "Rowan Quillfeather"
+    assert (await search(client, auth_headers, "Quill, Ad"))[0] == "Ada Quill"
+    assert (await search(client, auth_headers, "quill ada"))[0] == "Ada Quill"
+    # A date of birth narrows the prefix match
+    assert await search(client, auth_headers, "quill", dob="1970-01-01") == ["Rowan Quillfeather"]
@@ -0,0 +1,42 @@
+"""Statements per request for the hot endpoints.
+
+List endpoints are counted at two page sizes: more statements than the
+budget, or a count that grows with the page size (an N+1), fails.
+Each endpoint is called once first, so the caches it relies on (the
+auth principal, a patient's conflicts) are warm, as in steady state.
+"""
+import pytest
+from app.services.analytics import analytics_cache
+
+# (path, params, max statements); "{limit}" is filled with each page size,
+# "{patient}" and "{reconciliation}" with seeded rows
+QUERY_BUDGETS = [
+    ("/reconciliations/", {"include_names": "true", "limit": "{limit}"}, 1),
+    ("/reconciliations/", {"status": "in_progress", "include_names": "true", "limit": "{limit}"}, 1),
+    ("/reconciliations/{reconciliation}", {}, 1),
+    ("/reconciliations/{reconciliation}/conflicts", {}, 2),
+    ("/analytics/summary", {"days": "{limit}"}, 3),
+    ("/patients/", {"limit": "{limit}"}, 1),
+    ("/medications/", {"patient_id": "{patient}", "limit": "{limit}"}, 2),
+]
+PAGE_SIZES = (2, 20)
+
+
+@pytest.mark.parametrize("path, params, budget", QUERY_BUDGETS)
+async def test_query_budget(path, params, budget, client, auth_headers, seeded, count_queries):
+    ids = {"patient": seeded.patients[2], "reconciliation": seeded.reconciliations[2]}
+    path = path.format(**ids)
+    paged = "{limit}" in params.values()
+
+    async def count(page_size: int) -> int:
+        filled = {key: value.format(limit=page_size, **ids) for key, value in params.items()}
+        analytics_cache.clear()
+        with count_queries() as statements:
+            response = await client.get(f"/api/v1{path}", params=filled, headers=auth_headers)
+        response.raise_for_status()
+        return len(statements)
+
+    await count(PAGE_SIZES[0])
+    counts = [await count(page_size) for page_size in (PAGE_SIZES if paged else PAGE_SIZES[:1])]
+    assert counts[0] == counts[-1], f"N+1: {counts[0]} statements at limit={PAGE_SIZES[0]}, {counts[-1]} at limit={PAGE_SIZES[-1]}"
+    assert counts[0] <= budget
@@ -0,0 +1,111 @@
+"""Every SELECT behind the hot endpoints must be answered from an index.
+
+The endpoints are called the way the frontend calls them, each SELECT
+they issue is recorded, and SQLite is asked for its plan. A statement
+that reads a whole table (``SCAN <table>`` without an index) or sorts
+rows in a temp b-tree fails the test, so a missing or unusable index
+shows up before it reaches a large database.
+"""
+import re
+from datetime import date
+from typing import List
+from sqlalchemy import event
+
+# A plan line that reads every row of a table
+FULL_SCAN = re.compile(r"^SCAN \w+$")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)")
+
+
+def plan_problems(plan: List[str]) -> List[str]:
+    problems = []
+    for line in plan:
+        if FULL_SCAN.search(line):
+            problems.append(f"full table scan: {line}")
+        elif TEMP_SORT.search(line):
+            problems.append(f"unindexed sort: {line}")
+    return problems
+
+
+async def exercise_endpoints(client, headers, seeded):
+    """Call each hot endpoint the way the frontend does, following cursors"""
+    api = "/api/v1"
+    patient, other_patient = seeded.patients[2], seeded.patients[3]
+    reconciliation = seeded.reconciliations[2]
+
+    async def get(path, **params):
+        response = await client.get(f"{api}{path}", params=params, headers=headers)
+        response.raise_for_status()
+        return response
+
+    await get("/auth/me")
+    for path, params in [
+        ("/reconciliations/", {"include_names": "true", "limit": 5}),
+        ("/patients/", {"limit": 5, "include_total": "true"}),
+        ("/medications/", {"limit": 5}),
+        ("/medications/", {"patient_id": patient, "limit": 2, "include_total": "true"}),
+        ("/reconciliations/", {"limit": 5}),
+        ("/reconciliations/", {"status": "in_progress", "limit": 5}),
+        ("/reconciliations/", {"patient_id": patient, "limit": 5}),
+    ]:
+        page = await get(path, **params)
+        next_cursor = page.headers.get("X-Next-Cursor")
+        if next_cursor:
+            page = await get(path, cursor=next_cursor, limit=params["limit"])
+            if page.headers.get("X-Prev-Cursor"):
+                await get(path, cursor=page.headers["X-Prev-Cursor"], limit=params["limit"])
+
+    for q in ["smi", "first1 smith1", "Smith1, First1", "MRN0007", "p7@example", "smith2 1950-01-03"]:
+        await get("/patients/search", q=q)
+    await get("/patients/search", dob="1950-01-05")
+    await get(f"/patients/{patient}")
+    await get(f"/reconciliations/{reconciliation}")
+    await get(f"/reconciliations/{seeded.reconciliations[4]}/conflicts")
+    for days in (None, 30):
+        await get("/analytics/summary", **({"days": days} if days else {}))
+    # Revalidation: a version lookup, then 304
+    for path, params in [
+        (f"/patients/{patient}", {}), (f"/medications/{seeded.medications[3]}", {}),
+        ("/medications/", {"patient_id": patient}), (f"/reconciliations/{reconciliation}", {}),
+    ]:
+        etag = (await get(path, **params)).headers["ETag"]
+        response = await client.get(f"{api}{path}", params=params, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304, f"{path}: expected 304, got {response.status_code}"
+    for dataset in ("patients", "medications", "reconciliations"):
+        await get(f"/export/{dataset}")
+        await get(f"/export/{dataset}", format="ndjson", patient_id=patient, start=date.today().isoformat())
+        await get(f"/export/{dataset}", reconciliation_status="in_progress", end=date.today().isoformat())
+    created = await client.post(f"{api}/reconciliations/", json={"patient_id": other_patient}, headers=headers)
+    created.raise_for_status()
+    # Background import: queue it, claim and run it as a worker would, poll it
+    from app.worker import Worker
+    queued = await client.post(
+        f"{api}/medications/import", params={"background": "true"}, headers=headers,
+        files={"file": ("feed.csv", "mrn,name,ndc,last_filled\nMRN0003,Drug9,123,2024-01-01\n", "text/csv")}
+    )
+    queued.raise_for_status()
+    assert await Worker("plans").run_once(), "queued import was not claimed"
+    await get(f"/jobs/{queued.json()['id']}")
+
+
+async def test_hot_queries_use_indexes(client, auth_headers, seeded, database):
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.setdefault(statement, parameters)
+
+    event.listen(database.sync_engine, "before_cursor_execute", record)
+    try:
+        await exercise_endpoints(client, auth_headers, seeded)
+    finally:
+        event.remove(database.sync_engine, "before_cursor_execute", record)
+
+    failures = []
+    async with database.connect() as conn:
+        for statement, parameters in statements.items():
+            rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            problems = plan_problems([row[-1] for row in rows])
+            if problems:
+                failures.append(" ".join(statement.split()) + "".join(f"\n  -> {problem}" for problem in problems))
+    assert len(statements) > 40
+    assert not failures, "\n\n".join(failures)
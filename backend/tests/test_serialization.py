@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse as FastAPIORJSONResponse
+from app.main import app
+from app.utils.serialization import ORJSONResponse, rows_response, select_fields
+
+COLUMNS = {"id": "id_column", "name": "name_column", "status": "status_column"}
+
+
+def test_response_writes_utc_with_z():
+    response = ORJSONResponse({"at": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc), 1: "one"})
+    assert isinstance(response, FastAPIORJSONResponse)
+    assert response.body == b'{"at":"2024-05-01T12:00:00Z","1":"one"}'
+    assert response.media_type == "application/json"
+
+
+def test_select_fields():
+    assert select_fields(COLUMNS, None) == (["id", "name", "status"], ["id_column", "name_column", "status_column"])
+    assert select_fields(COLUMNS, " status, id,status ", keys=["key"]) == (
+        ["status", "id"], ["status_column", "id_column", "key"]
+    )
+
+
+@pytest.mark.parametrize("fields", ["", " , ", "id,secret"])
+def test_select_fields_rejects_unknown_names(fields):
+    with pytest.raises(HTTPException) as raised:
+        select_fields(COLUMNS, fields)
+    assert raised.value.status_code == 400
+
+
+def test_rows_response_drops_paging_keys():
+    response = rows_response(["id", "name"], [(1, "a", "cursor key"), (2, "b", "cursor key")])
+    assert response.body == b'[{"id":1,"name":"a"},{"id":2,"name":"b"}]'
+
+
+def test_fields_parameter_documents_the_schema_mismatch():
+    parameters = app.openapi()["paths"]["/api/v1/patients/"]["get"]["parameters"]
+    fields = next(parameter for parameter in parameters if parameter["name"] == "fields")
+    assert "do not match the documented response schema" in fields["description"]
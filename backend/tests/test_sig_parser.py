@@ -0,0 +1,96 @@
+import pytest
+from app.services.sig_parser import extract_drug_name, parse_medication_lines, parse_sig
+
+
+@pytest.mark.parametrize("text, frequency, per_day", [
+    ("Metoprolol 25 mg tab take 1 tablet by mouth BID", "Twice daily", 2),
+    ("metoprolol 25mg b.i.d.", "Twice daily", 2),
+    ("Trazodone 50 mg QHS", "At bedtime", 1),
+    ("Trazodone 50 mg at bedtime", "At bedtime", 1),
+    ("Furosemide 20mg qod", "Every other day", 0.5),
+    ("Furosemide 20mg every other day", "Every other day", 0.5),
+    ("Amoxicillin 500 mg q8h", "Every 8 hours", 3),
+    ("Vitamin D 50000 IU once a week", "Once weekly", 0.1429),
+])
+def test_frequency(text, frequency, per_day):
+    sig = parse_sig(text)
+    assert sig.frequency == frequency
+    assert sig.frequency_per_day == per_day
+
+
+def test_bid_with_quantity_form_and_route():
+    sig = parse_sig("Metoprolol 25 mg tab take 1 tablet by mouth BID")
+    assert (sig.dose_value, sig.dose_unit, sig.dosage) == (25.0, "mg", "25 mg")
+    assert sig.quantity == 1.0
+    assert sig.form == "tablet"
+    assert sig.route == "oral"
+    assert not sig.prn
+
+
+def test_ranged_interval_as_needed():
+    sig = parse_sig("Oxycodone 5 mg 1 tab po q4-6h prn pain")
+    assert sig.frequency == "Every 4-6 hours"
+    # Per day is the most the range allows
+    assert sig.frequency_per_day == 6.0
+    assert sig.prn
+    assert sig.dosage == "5 mg"
+    assert parse_sig("take 1 every 4 to 6 hours").frequency == "Every 4-6 hours"
+
+
+def test_prn_without_interval():
+    sig = parse_sig("Albuterol inhaler 2 puffs as needed")
+    assert sig.prn
+    assert sig.frequency == "As needed"
+
+
+def test_weekly_international_units():
+    sig = parse_sig("Vitamin D3 50,000 IU weekly")
+    assert (sig.dose_value, sig.dose_unit, sig.dosage) == (50000.0, "units", "50000 units")
+    assert sig.frequency == "Once weekly"
+    assert sig.frequency_per_day == pytest.approx(1 / 7, abs=1e-4)
+
+
+@pytest.mark.parametrize("text, value, dosage", [
+    ("Levothyroxine 1,25 mcg daily", 1.25, "1.25 mcg"),
+    ("Warfarin 2,5 mg daily", 2.5, "2.5 mg"),
+    ("Metformin 1,000 mg BID", 1000.0, "1000 mg"),
+    # Neither a decimal nor thousands; not read as 2345 mg either
+    ("Drug 1,2345 mg daily", None, ""),
+])
+def test_comma_in_strength(text, value, dosage):
+    sig = parse_sig(text)
+    assert (sig.dose_value, sig.dosage) == (value, dosage)
+
+
+def test_first_strength_and_frequency_win():
+    sig = parse_sig("Lisinopril 10 mg daily, may increase to 20 mg BID")
+    assert sig.dosage == "10 mg"
+    assert sig.frequency == "Once daily"
+
+
+def test_text_without_sig_tokens():
+    sig = parse_sig("Dr. Smith Pharmacy")
+    assert sig.is_empty
+    assert sig.frequency == ""
+
+
+def test_drug_name_is_the_text_before_the_sig():
+    line = "Take Lisinopril 10 mg by mouth daily"
+    assert extract_drug_name(line, parse_sig(line)) == "Lisinopril"
+
+
+def test_direction_lines_fill_in_the_previous_medication():
+    medications = parse_medication_lines([
+        {"text": "LISINOPRIL 10 MG TABLET", "confidence": 91},
+        {"text": "Take 1 tablet by mouth daily", "confidence": 80},
+        {"text": "Qty: 30 tablets", "confidence": 88},
+        {"text": "Refills: 2", "confidence": 88},
+    ])
+    assert len(medications) == 1
+    medication = medications[0]
+    assert medication["name"] == "LISINOPRIL"
+    assert medication["dosage"] == "10 mg"
+    assert medication["frequency"] == "Once daily"
+    assert medication["route"] == "oral"
+    assert medication["confidence"] == 91
+    assert medication["raw_text"] == "LISINOPRIL 10 MG TABLET / Take 1 tablet by mouth daily"
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import io
+import os
+import pytest
+from PIL import Image
+from sqlalchemy import delete
+from app.core.config import settings
+from app.models.models import OCRCacheEntry
+from app.services.blob_store import blob_store
+from app.services.ocr_cache import ocr_cache
+from app.services.ocr_executor import ocr_executor
+
+RESULT = {"text": "Lisinopril 10 mg once daily", "confidence": 91, "suggested_medications": [], "lines": []}
+
+
+def png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def stored(image: bytes) -> str:
+    key = f"{hashlib.sha256(image).hexdigest()}.png"
+    path = os.path.join(blob_store.staging_dir, f".{key}.part")
+    with open(path, "wb") as staged:
+        staged.write(image)
+    await blob_store.put_file(path, key)
+    return key
+
+
+async def test_batch_over_free_capacity_is_rejected(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(ocr_executor, "max_pending", 1)
+    images = [png(color) for color in ("red", "blue")]
+    files = [("files", (f"{index}.png", image, "image/png")) for index, image in enumerate(images)]
+    # An earlier upload already holds the red image's key
+    shared = await stored(images[0])
+
+    response = await client.post("/api/v1/upload/images", files=files, headers=auth_headers)
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert ocr_executor.pending == 0
+    # Blobs are left for GC rather than deleted from under other uploads
+    assert await blob_store.exists(shared)
+
+
+@pytest.fixture
+async def ocr_runs(db, monkeypatch):
+    """Stand in for the OCR process pool; yields the paths it was asked to read"""
+    runs = []
+
+    async def run_in_pool(fn, path):
+        runs.append(path)
+        return RESULT
+
+    monkeypatch.setattr(ocr_executor, "_run_in_pool", run_in_pool)
+    yield runs
+    ocr_cache.clear()
+    await db.execute(delete(OCRCacheEntry))
+    await db.commit()
+
+
+async def upload(client, auth_headers, image: bytes):
+    return await client.post(
+        "/api/v1/upload/image", files={"file": ("label.png", image, "image/png")}, headers=auth_headers
+    )
+
+
+async def test_identical_upload_is_answered_from_the_ocr_cache(client, auth_headers, ocr_runs):
+    image = png("purple")
+    first = await upload(client, auth_headers, image)
+    assert first.status_code == 202
+    job_url = f"/api/v1/upload/jobs/{first.json()['job_id']}"
+    for _ in range(50):
+        job = (await client.get(job_url, headers=auth_headers)).json()
+        if job["status"] != "pending":
+            break
+        await asyncio.sleep(0.01)
+    assert job["status"] == "completed"
+    assert len(ocr_runs) == 1
+
+    again = await upload(client, auth_headers, image)
+    assert again.status_code == 200
+    assert (again.json()["status"], again.json()["ocr_result"]) == ("completed", RESULT)
+    assert again.json()["filename"] == first.json()["filename"]
+    # From the table too, as after a restart
+    ocr_cache.clear()
+    assert (await upload(client, auth_headers, image)).status_code == 200
+    assert len(ocr_runs) == 1
+
+
+async def test_rejected_upload_is_not_staged(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    staged = set(os.listdir(blob_store.staging_dir))
+    not_an_image = await client.post(
+        "/api/v1/upload/image", files={"file": ("label.png", b"plain text", "image/png")}, headers=auth_headers
+    )
+    assert not_an_image.status_code == 400
+    too_large = await upload(client, auth_headers, png("white") + bytes(2048))
+    assert (too_large.status_code, too_large.json()["detail"]) == (400, "File too large")
+    assert set(os.listdir(blob_store.staging_dir)) == staged
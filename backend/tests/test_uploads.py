@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import io
+import os
+from datetime import timedelta
+from email.utils import format_datetime
+import pytest
+from fastapi import UploadFile
+from starlette.requests import Request
+from app.utils.uploads import (
+    UnsatisfiableRange, UnsupportedImageType, UploadTooLarge, immutable_file_validators, parse_range, serve_file,
+    stream_upload_to_disk
+)
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("BYTES = 5-5", (5, 5)),
+    # Sent whole: several ranges, other units, bad syntax
+    ("bytes=0-9,20-29", None),
+    ("items=0-9", None),
+    ("bytes=9-0", None),
+    ("bytes=abc-", None),
+    ("bytes=10", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1024-", 1024),
+    ("bytes=2000-3000", 1024),
+    ("bytes=-0", 1024),
+    ("bytes=-10", 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(UnsatisfiableRange):
+        parse_range(header, size)
+
+
+@pytest.fixture
+def stored(tmp_path):
+    path = tmp_path / "abc123.png"
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+def request_with(**headers) -> Request:
+    raw = [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+async def send(response):
+    """Run ``response`` as ASGI; (status, headers, body)"""
+    messages = []
+
+    async def receive():
+        # The client stays connected; StreamingResponse stops on a disconnect
+        await asyncio.Event().wait()
+
+    async def collect(message):
+        messages.append(message)
+
+    await response({"type": "http", "method": "GET", "headers": []}, receive, collect)
+    start = messages[0]
+    headers = {key.decode(): value.decode() for key, value in start["headers"]}
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], headers, body
+
+
+async def test_serve_whole_file(stored):
+    validators = immutable_file_validators(stored, 60)
+    status, headers, body = await send(serve_file(request_with(), stored, "image/png", validators))
+    assert (status, body) == (200, CONTENT)
+    assert headers["etag"] == '"abc123"'
+    assert headers["accept-ranges"] == "bytes"
+    assert headers["cache-control"] == "private, max-age=60, immutable"
+
+
+async def test_serve_byte_ranges(stored):
+    validators = immutable_file_validators(stored, 60)
+    status, headers, body = await send(serve_file(request_with(range="bytes=10-19"), stored, "image/png", validators))
+    assert (status, body) == (206, CONTENT[10:20])
+    assert headers["content-range"] == "bytes 10-19/1024"
+    assert headers["content-length"] == "10"
+
+    status, headers, body = await send(serve_file(request_with(range="bytes=-24"), stored, "image/png", validators, chunk_size=7))
+    assert (status, body) == (206, CONTENT[-24:])
+    assert headers["content-range"] == "bytes 1000-1023/1024"
+
+
+async def test_serve_unsatisfiable_range(stored):
+    validators = immutable_file_validators(stored, 60)
+    status, headers, body = await send(serve_file(request_with(range="bytes=1024-"), stored, "image/png", validators))
+    assert (status, body) == (416, b"")
+    assert headers["content-range"] == "bytes */1024"
+
+
+async def test_serve_multiple_ranges_as_whole_file(stored):
+    validators = immutable_file_validators(stored, 60)
+    status, _, body = await send(serve_file(request_with(range="bytes=0-9,20-29"), stored, "image/png", validators))
+    assert (status, body) == (200, CONTENT)
+
+
+async def test_serve_if_range(stored):
+    validators = immutable_file_validators(stored, 60)
+    modified = format_datetime(validators.last_modified, usegmt=True)
+    earlier = format_datetime(validators.last_modified - timedelta(seconds=1), usegmt=True)
+    cases = [
+        ('"abc123"', 206),
+        ('"older"', 200),
+        ('W/"abc123"', 200),  # Weak tags never match
+        (modified, 206),
+        (earlier, 200),
+        ("not a date", 200),
+    ]
+    for if_range, expected in cases:
+        request = request_with(range="bytes=0-9", if_range=if_range)
+        status, _, _ = await send(serve_file(request, stored, "image/png", validators))
+        assert status == expected, if_range
+
+
+async def test_serve_not_modified(stored):
+    validators = immutable_file_validators(stored, 60)
+    request = request_with(if_none_match='"abc123"', range="bytes=0-9")
+    status, headers, body = await send(serve_file(request, stored, "image/png", validators))
+    assert (status, body) == (304, b"")
+    assert headers["etag"] == '"abc123"'
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8  # 2056 bytes
+
+
+async def stream(staging, content: bytes, max_size: int = 4096):
+    return await stream_upload_to_disk(
+        UploadFile(io.BytesIO(content), filename="upload.png"), str(staging),
+        max_size=max_size, allowed_types=["image/png"], chunk_size=512
+    )
+
+
+async def test_stream_upload_to_disk(tmp_path):
+    upload = await stream(tmp_path, PNG)
+    assert (upload.content_type, upload.extension, upload.size) == ("image/png", ".png", len(PNG))
+    assert upload.content_hash == hashlib.sha256(PNG).hexdigest()
+    with open(upload.temp_path, "rb") as staged:
+        assert staged.read() == PNG
+
+
+@pytest.mark.parametrize("content, max_size, error", [
+    (PNG, 2000, UploadTooLarge),  # Crosses the limit after a few chunks
+    (b"GIF89a" + bytes(600), 4096, UnsupportedImageType),  # An image, but not an allowed one
+    (b"%PDF-1.7 " + bytes(600), 4096, UnsupportedImageType),
+    (b"", 4096, UnsupportedImageType),
+])
+async def test_rejected_upload_leaves_no_partial_file(tmp_path, content, max_size, error):
+    with pytest.raises(error):
+        await stream(tmp_path, content, max_size)
+    assert os.listdir(tmp_path) == []
@@ -16,55 +16,44 @@ import {
   AreaChart
 } from 'recharts';
 import { TrendingUp, Pill, Clock, AlertTriangle } from 'lucide-react';
-import type { Reconciliation, Medication } from '../types/api';
+import type { AnalyticsSummary } from '../types/api';
 
 interface DashboardChartsProps {
-  reconciliations?: Reconciliation[];
-  medications?: Medication[];
+  summary?: AnalyticsSummary;
 }
 
-const DashboardCharts: React.FC<DashboardChartsProps> = ({ 
-  reconciliations = [], 
-  medications = [] 
-}) => {
+// Rollup days are UTC dates (YYYY-MM-DD)
+const dayKey = (date: Date) => date.toISOString().slice(0, 10);
+
+const DashboardCharts: React.FC<DashboardChartsProps> = ({ summary }) => {
   // Generate reconciliation trend data (last 7 days)
   const reconciliationTrendData = React.useMemo(() => {
     const last7Days = [];
     const today = new Date();
+    const daily = summary?.reconciliations_daily || [];
     
     for (let i = 6; i >= 0; i--) {
       const date = new Date(today);
       date.setDate(date.getDate() - i);
       
-      const dayReconciliations = reconciliations.filter(r => {
-        const reconciliationDate = new Date(r.created_at);
-        return reconciliationDate.toDateString() === date.toDateString();
-      });
-      
-      const completed = dayReconciliations.filter(r => r.status === 'completed').length;
-      const inProgress = dayReconciliations.filter(r => r.status === 'in_progress').length;
-      const pending = dayReconciliations.filter(r => r.status === 'pending').length;
+      const dayRows = daily.filter(r => r.day === dayKey(date));
+      const countFor = (status: string) =>
+        dayRows.filter(r => r.status === status).reduce((sum, r) => sum + r.count, 0);
       
       last7Days.push({
         date: date.toLocaleDateString('en-US', { weekday: 'short' }),
-        completed,
-        inProgress,
-        pending,
-        total: dayReconciliations.length
+        completed: countFor('completed'),
+        inProgress: countFor('in_progress'),
+        pending: countFor('pending'),
+        total: dayRows.reduce((sum, r) => sum + r.count, 0)
       });
     }
     
     return last7Days;
-  }, [reconciliations]);
+  }, [summary]);
 
   // Medication source distribution
   const medicationSourceData = React.useMemo(() => {
-    const sources = medications.reduce((acc, med) => {
-      const source = med.source || 'unknown';
-      acc[source] = (acc[source] || 0) + 1;
-      return acc;
-    }, {} as Record<string, number>);
-
     const sourceLabels: Record<string, string> = {
       manual: 'Manual Entry',
       photo: 'Photo OCR',
@@ -72,31 +61,27 @@ const DashboardCharts: React.FC<DashboardChartsProps> = ({
       emr: 'EMR System'
     };
 
-    return Object.entries(sources).map(([source, count]) => ({
-      name: sourceLabels[source] || source,
+    return (summary?.medications_by_source || []).map(({ source, count }) => ({
+      name: sourceLabels[source] || source || 'unknown',
       value: count,
       source
     }));
-  }, [medications]);
+  }, [summary]);
 
   // Status distribution for pie chart
   const statusDistribution = React.useMemo(() => {
-    const statusCounts = reconciliations.reduce((acc, rec) => {
-      acc[rec.status] = (acc[rec.status] || 0) + 1;
-      return acc;
-    }, {} as Record<string, number>);
-
-    return Object.entries(statusCounts).map(([status, count]) => ({
+    return (summary?.reconciliations_by_status || []).map(({ status, count }) => ({
       name: status.replace('_', ' ').toLowerCase(),
       value: count,
       status
     }));
-  }, [reconciliations]);
+  }, [summary]);
 
   // Performance metrics over time
   const performanceData = React.useMemo(() => {
     const weeklyData = [];
     const weeksBack = 4;
+    const daily = summary?.reconciliations_daily || [];
     
     for (let i = weeksBack - 1; i >= 0; i--) {
       const weekStart = new Date();
@@ -104,13 +89,10 @@ const DashboardCharts: React.FC<DashboardChartsProps> = ({
       const weekEnd = new Date(weekStart);
       weekEnd.setDate(weekEnd.getDate() + 7);
       
-      const weekReconciliations = reconciliations.filter(r => {
-        const date = new Date(r.created_at);
-        return date >= weekStart && date < weekEnd;
-      });
+      const weekRows = daily.filter(r => r.day >= dayKey(weekStart) && r.day < dayKey(weekEnd));
       
-      const completed = weekReconciliations.filter(r => r.status === 'completed').length;
-      const conflicts = weekReconciliations.reduce((sum, r) => sum + (r.conflicts_found || 0), 0);
+      const completed = weekRows.filter(r => r.status === 'completed').reduce((sum, r) => sum + r.count, 0);
+      const conflicts = weekRows.reduce((sum, r) => sum + r.conflicts, 0);
       const avgTime = 45; // Mock average time - would be calculated from real data
       
       weeklyData.push({
@@ -123,7 +105,7 @@ const DashboardCharts: React.FC<DashboardChartsProps> = ({
     }
     
     return weeklyData;
-  }, [reconciliations]);
+  }, [summary]);
 
   // Colors for charts
   const CHART_COLORS = {
@@ -11,31 +11,22 @@ import {
 import { apiClient } from '../services/api';
 import DashboardCharts from '../components/DashboardCharts';
 
+const DATE_RANGE_DAYS: Record<string, number> = { '7d': 7, '30d': 30, '90d': 90, '1y': 365 };
+
 const Analytics: React.FC = () => {
   const [dateRange, setDateRange] = useState('7d');
   const [selectedMetrics, setSelectedMetrics] = useState(['reconciliations', 'medications', 'performance']);
 
-  const { data: reconciliations, isLoading: reconciliationsLoading, refetch: refetchReconciliations } = useQuery({
-    queryKey: ['reconciliations'],
-    queryFn: () => apiClient.getReconciliations(),
-  });
-
-  const { data: medications, isLoading: medicationsLoading, refetch: refetchMedications } = useQuery({
-    queryKey: ['medications'],
-    queryFn: () => apiClient.getMedications(),
-  });
+  const days = DATE_RANGE_DAYS[dateRange];
 
-  const { data: patients, isLoading: patientsLoading, refetch: refetchPatients } = useQuery({
-    queryKey: ['patients'],
-    queryFn: () => apiClient.getPatients(),
+  // One request: counts come from server-side rollups, not from list pages
+  const { data: summary, isLoading, refetch } = useQuery({
+    queryKey: ['analytics-summary', days],
+    queryFn: () => apiClient.getAnalyticsSummary(days),
   });
 
-  const isLoading = reconciliationsLoading || medicationsLoading || patientsLoading;
-
   const handleRefreshData = () => {
-    refetchReconciliations();
-    refetchMedications();
-    refetchPatients();
+    refetch();
   };
 
   const handleExportData = () => {
@@ -45,33 +36,37 @@ const Analytics: React.FC = () => {
 
   // Calculate summary statistics
   const summaryStats = React.useMemo(() => {
-    if (!reconciliations || !medications || !patients) return null;
+    if (!summary) return null;
 
-    const completedReconciliations = reconciliations.filter(r => r.status === 'completed');
-    const totalConflicts = reconciliations.reduce((sum, r) => sum + (r.conflicts_found || 0), 0);
+    const completedReconciliations = summary.reconciliations_by_status
+      .filter(r => r.status === 'completed')
+      .reduce((sum, r) => sum + r.count, 0);
+    const totalConflicts = summary.reconciliations_by_status.reduce((sum, r) => sum + r.conflicts, 0);
     const avgReconciliationTime = 45; // Mock - would calculate from real data
     
-    const photoMedications = medications.filter(m => m.source === 'photo').length;
-    const manualMedications = medications.filter(m => m.source === 'manual').length;
+    const sourceCount = (source: string) =>
+      summary.medications_by_source.find(m => m.source === source)?.count || 0;
+    const photoMedications = sourceCount('photo');
+    const manualMedications = sourceCount('manual');
     
     return {
-      totalReconciliations: reconciliations.length,
-      completedReconciliations: completedReconciliations.length,
-      completionRate: reconciliations.length > 0 
-        ? Math.round((completedReconciliations.length / reconciliations.length) * 100)
+      totalReconciliations: summary.reconciliations,
+      completedReconciliations,
+      completionRate: summary.reconciliations > 0 
+        ? Math.round((completedReconciliations / summary.reconciliations) * 100)
         : 0,
-      totalPatients: patients.length,
-      totalMedications: medications.length,
+      totalPatients: summary.patients,
+      totalMedications: summary.medications,
       totalConflicts,
       avgReconciliationTime,
-      ocrUsageRate: medications.length > 0 
-        ? Math.round((photoMedications / medications.length) * 100)
+      ocrUsageRate: summary.medications > 0 
+        ? Math.round((photoMedications / summary.medications) * 100)
         : 0,
-      manualEntryRate: medications.length > 0 
-        ? Math.round((manualMedications / medications.length) * 100)
+      manualEntryRate: summary.medications > 0 
+        ? Math.round((manualMedications / summary.medications) * 100)
         : 0
     };
-  }, [reconciliations, medications, patients]);
+  }, [summary]);
 
   if (isLoading) {
     return (
@@ -194,10 +189,7 @@ const Analytics: React.FC = () => {
             </p>
           </div>
           
-          <DashboardCharts 
-            reconciliations={reconciliations || []}
-            medications={medications || []}
-          />
+          <DashboardCharts summary={summary} />
         </div>
       )}
 
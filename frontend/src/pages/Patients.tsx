@@ -39,11 +39,16 @@ const Patients: React.FC = () => {
     },
   });
 
-  const filteredPatients = patients?.filter(patient =>
-    `${patient.first_name} ${patient.last_name}`.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    patient.mrn?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    patient.email?.toLowerCase().includes(searchTerm.toLowerCase())
-  ) || [];
+  // Search runs on the server so the page doesn't need every patient loaded
+  const trimmedSearch = searchTerm.trim();
+  const { data: searchResults } = useQuery({
+    queryKey: ['patients', 'search', trimmedSearch],
+    queryFn: () => apiClient.searchPatients(trimmedSearch),
+    enabled: trimmedSearch.length > 0,
+    placeholderData: (previous) => previous,
+  });
+
+  const filteredPatients = (trimmedSearch ? searchResults : patients) || [];
 
   const formatDate = (dateString: string) => {
     return new Date(dateString).toLocaleDateString();
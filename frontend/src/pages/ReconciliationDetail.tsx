@@ -50,16 +50,23 @@ const ReconciliationDetail: React.FC = () => {
     enabled: !!reconciliationData?.patient_id,
   });
 
+  const { data: serverConflicts } = useQuery({
+    queryKey: ['reconciliation-conflicts', reconciliationId],
+    queryFn: () => apiClient.getReconciliationConflicts(reconciliationId),
+    enabled: !!reconciliationId,
+  });
+
   const updateMedicationMutation = useMutation({
     mutationFn: ({ medicationId, data }: { medicationId: number; data: Partial<MedicationCreate> }) =>
       apiClient.updateMedication(medicationId, data),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['medications'] });
+      queryClient.invalidateQueries({ queryKey: ['reconciliation-conflicts', reconciliationId] });
     },
   });
 
   const updateReconciliationMutation = useMutation({
-    mutationFn: (data: { approved_medications: number; conflicts_found: number; notes?: string }) =>
+    mutationFn: (data: { approved_medications: number; notes?: string }) =>
       apiClient.updateReconciliation(reconciliationId, data),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['reconciliation', reconciliationId] });
@@ -98,15 +105,10 @@ const ReconciliationDetail: React.FC = () => {
       conflicts.push('No last filled date available');
     }
     
-    // Check for duplicate medications (same name)
-    const duplicates = medications?.filter(med => 
-      med.id !== medication.id && 
-      med.name.toLowerCase() === medication.name.toLowerCase()
-    );
-    
-    if (duplicates && duplicates.length > 0) {
-      conflicts.push('Potential duplicate medication detected');
-    }
+    // Duplicates, dose/frequency discrepancies and stale fills come from the server
+    serverConflicts
+      ?.filter(conflict => conflict.medication_ids.includes(medication.id))
+      .forEach(conflict => conflicts.push(`${conflict.drug}: ${conflict.detail}`));
     
     return conflicts;
   };
@@ -145,17 +147,16 @@ const ReconciliationDetail: React.FC = () => {
 
   const handleCompleteReconciliation = () => {
     const approvedCount = Object.values(reviewState).filter(state => state.approved).length;
-    const totalConflicts = Object.values(reviewState).reduce((sum, state) => sum + state.conflicts.length, 0);
-    
-    // Update reconciliation statistics
-    updateReconciliationMutation.mutate({
-      approved_medications: approvedCount,
-      conflicts_found: totalConflicts,
-      notes: reconciliationNotes,
-    });
-    
-    // Complete the reconciliation
-    completeReconciliationMutation.mutate();
+
+    // The server records conflicts_found itself when the reconciliation is written.
+    // Complete only once the review is saved, so the two requests cannot race.
+    updateReconciliationMutation.mutate(
+      {
+        approved_medications: approvedCount,
+        notes: reconciliationNotes,
+      },
+      { onSuccess: () => completeReconciliationMutation.mutate() }
+    );
   };
 
   const getStatusBadge = (status: string) => {
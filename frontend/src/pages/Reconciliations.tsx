@@ -14,7 +14,7 @@ import {
   Play
 } from 'lucide-react';
 import { apiClient } from '../services/api';
-import type { ReconciliationCreate, Patient } from '../types/api';
+import type { Reconciliation, ReconciliationCreate, Patient } from '../types/api';
 
 const Reconciliations: React.FC = () => {
   const [searchTerm, setSearchTerm] = useState('');
@@ -42,8 +42,7 @@ const Reconciliations: React.FC = () => {
   });
 
   const filteredReconciliations = reconciliations?.filter(reconciliation => {
-    const patient = patients?.find(p => p.id === reconciliation.patient_id);
-    const patientName = patient ? `${patient.first_name} ${patient.last_name}` : '';
+    const patientName = reconciliation.patient_name ?? '';
     
     const matchesSearch = patientName.toLowerCase().includes(searchTerm.toLowerCase()) ||
                          reconciliation.id.toString().includes(searchTerm);
@@ -73,10 +72,8 @@ const Reconciliations: React.FC = () => {
     }
   };
 
-  const getPatientName = (patientId: number) => {
-    const patient = patients?.find(p => p.id === patientId);
-    return patient ? `${patient.first_name} ${patient.last_name}` : `Patient #${patientId}`;
-  };
+  const getPatientName = (reconciliation: Reconciliation) =>
+    reconciliation.patient_name || `Patient #${reconciliation.patient_id}`;
 
   const formatDate = (dateString: string) => {
     return new Date(dateString).toLocaleDateString('en-US', {
@@ -235,7 +232,7 @@ const Reconciliations: React.FC = () => {
                       <div className="flex items-center">
                         <User className="w-4 h-4 text-gray-400 mr-2" />
                         <span className="text-sm text-gray-900">
-                          {getPatientName(reconciliation.patient_id)}
+                          {getPatientName(reconciliation)}
                         </span>
                       </div>
                     </td>
@@ -7,16 +7,29 @@ import type {
   User,
   Patient,
   PatientCreate,
+  PatientSearchResult,
   Medication,
   MedicationCreate,
   Reconciliation,
   ReconciliationCreate,
+  MedicationConflict,
+  AnalyticsSummary,
   ImageUploadResponse,
+  OCRJobResponse,
+  FormularyMatch,
+  BatchUploadLine,
+  BatchUploadSummary,
 } from '../types/api';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 const API_VERSION = '/api/v1';
 
+// OCR job polling: back off from the first delay up to the longest, and give
+// up a little after the server's OCR_JOB_TIMEOUT_SECONDS (600) fails the job
+const OCR_POLL_FIRST_DELAY_MS = 500;
+const OCR_POLL_MAX_DELAY_MS = 5000;
+const OCR_POLL_MAX_WAIT_MS = 11 * 60 * 1000;
+
 // Debug logging - remove after fixing
 console.log('API_BASE_URL:', API_BASE_URL);
 console.log('VITE_API_URL from env:', import.meta.env.VITE_API_URL);
@@ -99,6 +112,13 @@ class ApiClient {
     return response.data;
   }
 
+  async searchPatients(query: string, limit = 20): Promise<PatientSearchResult[]> {
+    const response: AxiosResponse<PatientSearchResult[]> = await this.client.get('/patients/search', {
+      params: { q: query, limit },
+    });
+    return response.data;
+  }
+
   async getPatient(id: number): Promise<Patient> {
     const response: AxiosResponse<Patient> = await this.client.get(`/patients/${id}`);
     return response.data;
@@ -144,9 +164,18 @@ class ApiClient {
     await this.client.delete(`/medications/${id}`);
   }
 
+  async lookupMedications(query: string, limit = 10): Promise<FormularyMatch[]> {
+    const response: AxiosResponse<FormularyMatch[]> = await this.client.get('/medications/lookup', {
+      params: { q: query, limit },
+    });
+    return response.data;
+  }
+
   // Reconciliation Methods
   async getReconciliations(): Promise<Reconciliation[]> {
-    const response: AxiosResponse<Reconciliation[]> = await this.client.get('/reconciliations/');
+    const response: AxiosResponse<Reconciliation[]> = await this.client.get('/reconciliations/', {
+      params: { include_names: true },
+    });
     return response.data;
   }
 
@@ -155,6 +184,11 @@ class ApiClient {
     return response.data;
   }
 
+  async getReconciliationConflicts(id: number): Promise<MedicationConflict[]> {
+    const response: AxiosResponse<MedicationConflict[]> = await this.client.get(`/reconciliations/${id}/conflicts`);
+    return response.data;
+  }
+
   async createReconciliation(reconciliationData: ReconciliationCreate): Promise<Reconciliation> {
     const response: AxiosResponse<Reconciliation> = await this.client.post('/reconciliations/', reconciliationData);
     return response.data;
@@ -170,16 +204,87 @@ class ApiClient {
     return response.data;
   }
 
+  // Analytics Methods
+  async getAnalyticsSummary(days?: number): Promise<AnalyticsSummary> {
+    const response: AxiosResponse<AnalyticsSummary> = await this.client.get('/analytics/summary', {
+      params: days ? { days } : {},
+    });
+    return response.data;
+  }
+
   // File Upload Methods
   async uploadImage(file: File): Promise<ImageUploadResponse> {
     const formData = new FormData();
     formData.append('file', file);
 
-    const response: AxiosResponse<ImageUploadResponse> = await this.client.post('/upload/image', formData, {
+    const response: AxiosResponse<OCRJobResponse> = await this.client.post('/upload/image', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
     });
+
+    // OCR runs in the background; poll until the job settles
+    let job = response.data;
+    const deadline = Date.now() + OCR_POLL_MAX_WAIT_MS;
+    let delay = OCR_POLL_FIRST_DELAY_MS;
+    while (job.status === 'pending') {
+      if (Date.now() + delay > deadline) {
+        throw new Error(`OCR for ${job.filename} did not finish in time; try uploading again`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      delay = Math.min(delay * 2, OCR_POLL_MAX_DELAY_MS);
+      job = await this.getOCRJob(job.job_id);
+    }
+    return job;
+  }
+
+  // Upload many images in one request; results stream back as NDJSON
+  async uploadImages(
+    files: File[],
+    patientId?: number,
+    onResult?: (line: BatchUploadLine) => void
+  ): Promise<BatchUploadSummary> {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+
+    const query = patientId ? `?patient_id=${patientId}` : '';
+    const response = await fetch(`${API_BASE_URL}${API_VERSION}/upload/images${query}`, {
+      method: 'POST',
+      headers: { Authorization: `Bearer ${localStorage.getItem('access_token') ?? ''}` },
+      body: formData,
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Batch upload failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let summary: BatchUploadSummary | undefined;
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop() ?? '';
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const parsed = JSON.parse(line);
+        if (parsed.summary) {
+          summary = parsed;
+        } else {
+          onResult?.(parsed);
+        }
+      }
+    }
+    if (!summary) {
+      throw new Error('Batch upload ended without a summary');
+    }
+    return summary;
+  }
+
+  async getOCRJob(jobId: string): Promise<OCRJobResponse> {
+    const response: AxiosResponse<OCRJobResponse> = await this.client.get(`/upload/jobs/${jobId}`);
     return response.data;
   }
 
@@ -49,6 +49,10 @@ export interface Patient {
   updated_at?: string;
 }
 
+export interface PatientSearchResult extends Patient {
+  score: number;
+}
+
 export interface PatientCreate {
   first_name: string;
   last_name: string;
@@ -105,11 +109,42 @@ export interface Reconciliation {
   patient?: Patient;
 }
 
+export interface MedicationConflict {
+  type: 'duplicate' | 'dose_discrepancy' | 'frequency_discrepancy' | 'stale_fill';
+  drug: string;
+  medication_ids: number[];
+  sources: string[];
+  detail: string;
+}
+
+// Analytics Types
+export interface AnalyticsSummary {
+  days: number | null;
+  start: string | null;
+  patients: number;
+  medications: number;
+  reconciliations: number;
+  reconciliations_by_status: Array<{ status: string; count: number; conflicts: number }>;
+  reconciliations_daily: Array<{ day: string; status: string; count: number; conflicts: number }>;
+  reconciliations_by_provider: Array<{ day: string; provider_id: number; provider_name: string | null; count: number }>;
+  medications_by_source: Array<{ source: string; count: number }>;
+  ocr: { medications: number; average_confidence: number | null };
+  ocr_daily: Array<{ day: string; medications: number; average_confidence: number | null }>;
+}
+
 export interface ReconciliationCreate {
   patient_id: number;
   notes?: string;
 }
 
+export interface FormularyMatch {
+  name: string;
+  generic_name?: string | null;
+  ndc_number?: string | null;
+  strength?: string | null;
+  score: number;
+}
+
 // Upload Types
 export interface OCRResult {
   text: string;
@@ -118,11 +153,46 @@ export interface OCRResult {
     name: string;
     dosage?: string;
     frequency?: string;
+    confidence?: number | null;
+  }>;
+  lines?: Array<{
+    text: string;
+    confidence: number;
+    left: number;
+    top: number;
+    width: number;
+    height: number;
   }>;
 }
 
 export interface ImageUploadResponse {
   filename: string;
   file_path: string;
+  thumbnail_path: string;
+  preview_path: string;
   ocr_result?: OCRResult;
+}
+
+export interface BatchUploadLine {
+  index: number;
+  filename: string;
+  file_path: string | null;
+  thumbnail_path: string | null;
+  preview_path: string | null;
+  status: 'completed' | 'failed';
+  ocr_result: OCRResult | null;
+  error: string | null;
+}
+
+export interface BatchUploadSummary {
+  summary: true;
+  total: number;
+  completed: number;
+  medications_created: number;
+}
+
+export interface OCRJobResponse extends ImageUploadResponse {
+  job_id: string;
+  status: 'pending' | 'completed' | 'failed';
+  error?: string;
 }
\ No newline at end of file